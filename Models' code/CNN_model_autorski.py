@@ -10,19 +10,21 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE" # Rozwiązanie problemu z biblioteka
 # --- Ładowanie pakietów ---
 import tensorflow as tf
 from tensorflow.keras import layers, models, callbacks
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.utils import to_categorical
 
 import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix
+
+# Wspólny potok danych tf.data i ewaluacja (data_pipeline.py, evaluation.py w tym samym katalogu)
+from data_pipeline import RandomImageAugmentation, make_dataset
+from evaluation import predict_logits, print_summary, write_report
+# Wznawianie treningu, zapis najlepszego modelu w tle i podział czasu kroku (training_callbacks.py)
+from training_callbacks import AsyncModelCheckpoint, StepTimer, TrainingCheckpoint
 
 # --- AUGMENTACJE DANYCH ---
-# Tworzenie generatora danych treningowych z różnymi augmentacjami,
+# Augmentacje wykonywane wektorowo na całym batchu w potoku tf.data,
 # aby zwiększyć różnorodność obrazów i zmniejszyć overfitting.
-train_datagen = ImageDataGenerator(
-    rescale=1./255,           # skalowanie pikseli do zakresu [0,1]
+augmentation = RandomImageAugmentation(
     shear_range=0.2,          # losowe ścinanie obrazu (shear)
     zoom_range=0.2,           # losowe przybliżanie
     horizontal_flip=True,     # losowe odbicie poziome
@@ -33,28 +35,28 @@ train_datagen = ImageDataGenerator(
     channel_shift_range=10.0     # losowa zmiana wartości kanałów RGB
 )
 
-# Generator dla zbioru testowego
-test_datagen = ImageDataGenerator(rescale=1./255)
-
 # --- Ścieżki do danych treningowych i testowych ---
 train_path = 'C:/Users/pgryg/Desktop/CNN_project/Species'
 test_path = 'C:/Users/pgryg/Desktop/CNN_project/test'
+output_dir = 'C:/Users/pgryg/Desktop/CNN_project'  # modele, wykres i raporty
 
-# --- Generatory danych ---
-# flow_from_directory pozwala wczytać obrazy posegregowane w foldery nazwane zgodnie z klasami.
-train_generator = train_datagen.flow_from_directory(
+# --- Zbiory danych ---
+# Obrazy posegregowane w foldery nazwane zgodnie z klasami, etykiety w formie one-hot.
+train_dataset, train_info = make_dataset(
     train_path,
     target_size=(224, 224),    # skalowanie obrazów do 224x224 (wymiar wejściowy modelu)
-    batch_size=32,             # liczba batchy
-    class_mode='categorical'   # klasyfikacja wieloklasowa, etykiety będą w formie one-hot
+    batch_size=32,             # liczba obrazów w batchu
+    training=True,             # tasowanie co epokę + augmentacje
+    preprocessing='scratch',   # skalowanie pikseli do zakresu [0,1]
+    augmentation=augmentation
 )
 
-test_generator = test_datagen.flow_from_directory(
+test_dataset, test_info = make_dataset(
     test_path,
     target_size=(224, 224),
     batch_size=32,
-    class_mode='categorical',
-    shuffle=False  # shuffle False ważne do późniejszej analizy błędów
+    training=False,            # bez tasowania - ważne do późniejszej analizy błędów
+    preprocessing='scratch'
 )
 
 # --- Definicja modelu CNN od podstaw ---
@@ -110,10 +112,9 @@ early_stop = callbacks.EarlyStopping(
     restore_best_weights=True  # po zatrzymaniu przywracane są najlepsze wagi z treningu
 )
 
-model_checkpoint = callbacks.ModelCheckpoint(
-    'C:/Users/pgryg/Desktop/CNN_project/best_model.h5',
-    monitor='val_loss',
-    save_best_only=True,  # zapis najlepszego modelu (z najmniejszym validation loss)
+model_checkpoint = AsyncModelCheckpoint(
+    os.path.join(output_dir, 'best_model.h5'),
+    monitor='val_loss',   # zapis najlepszego modelu (z najmniejszym validation loss) w wątku w tle
     verbose=1             # przy zapisie najlepszego modelu wyświetla komunikat
 )
 
@@ -125,14 +126,27 @@ reduce_lr = callbacks.ReduceLROnPlateau(
     verbose=1      # przy zmianie Learning Rate wyświetla komunikat
 )
 
+# Co 10. krok: czas oczekiwania na dane vs obliczenia, podsumowanie po każdej epoce
+step_timer = StepTimer(every=10, csv_path=os.path.join(output_dir, 'step_timing_autorski.csv'))
+
+# Model, optymalizator i stan callbacków po każdej epoce - po przerwaniu skrypt wznawia trening
+# od ostatniej zapisanej epoki, a po ukończonym treningu tylko wczytuje wagi
+tracked = [early_stop, model_checkpoint, reduce_lr]
+training_checkpoint = TrainingCheckpoint(os.path.join(output_dir, 'checkpoints'), 'autorski', tracked=tracked)
+
 # --- Trenowanie modelu ---
 epochs = 150            # 150 epok - maksymalnie tyle razy sieć przejdzie przez dane treningowe
-history = model.fit(
-    train_generator,
-    epochs=epochs,
-    validation_data=test_generator,
-    callbacks=[early_stop, model_checkpoint, reduce_lr]
-)
+if training_checkpoint.completed:
+    training_checkpoint.restore_weights(model)
+else:
+    model.fit(
+        train_dataset,
+        epochs=epochs,
+        initial_epoch=training_checkpoint.initial_epoch,
+        validation_data=test_dataset,
+        callbacks=tracked + [step_timer, training_checkpoint]  # TrainingCheckpoint musi być ostatni
+    )
+history = training_checkpoint.history_callback()  # wszystkie epoki, także sprzed wznowienia
 
 # --- Wizualizacja wyników treningu ---
 plt.figure(figsize=(12,5))
@@ -154,56 +168,24 @@ plt.ylabel('Loss')
 plt.legend()
 
 plt.tight_layout()
-plt.savefig('C:/Users/pgryg/Desktop/CNN_project/training_plot.png')
+plt.savefig(os.path.join(output_dir, 'training_plot.png'))
 plt.show()
 
 # --- Ewaluacja modelu na zbiorze testowym ---
-test_loss, test_acc = model.evaluate(test_generator)
-print(f'Test accuracy: {test_acc:.4f}')
-
-# --- Predykcje na zbiorze testowym ---
-predictions = model.predict(test_generator)
-labels = list(test_generator.class_indices.keys())
-
-# Wybór klasy o największym prawdopodobieństwie
-pred_classes = np.argmax(predictions, axis=1)
-true_classes = test_generator.classes
+# Jeden przebieg predict; logity trafiają do logits_autorski.npz, więc porównanie z innymi
+# modelami nie wymaga ponownej inferencji:
+#     python evaluation.py --logits .../logits_autorski.npz .../logits_inception_finetuned.npz
+results = predict_logits(model, test_dataset, test_info, os.path.join(output_dir, 'logits_autorski.npz'), refresh=True)
 
-# Macierz pomyłek: ile razy model pomylił którą klasę z którą
-cm = confusion_matrix(true_classes, pred_classes)
-
-# Liczenie błędów na klasę: suma wiersza (wszystkie predykcje tej klasy)
-# minus te poprawne
-errors_per_class = cm.sum(axis=1) - np.diag(cm)
-
-# Tworzenie DataFrame z gatunkami i liczbą błędów, sortowanie malejąco
-df_errors = pd.DataFrame({
-    'species': labels,
-    'errors': errors_per_class
-}).sort_values(by='errors', ascending=False)
+# Accuracy, top-k, precision/recall na klasę, kalibracja oraz CSV:
+# errors_per_class_autorski.csv (błędy na gatunek) i test_errors_only_autorski.csv (błędne predykcje)
+metrics = write_report(results, output_dir, 'autorski')
+print_summary(metrics, 'autorski')
 
 print("\nSpecies with the most prediction errors:")
-print(df_errors.head(10))
-
-# Zapis wyników błędów do pliku CSV
-df_errors.to_csv('C:/Users/pgryg/Desktop/CNN_project/errors_per_class.csv', index=False)
+errors = metrics['per_class']['errors']
+for i in np.argsort(-errors, kind='stable')[:10]:
+    print(f"{results.labels[i]:<45} {errors[i]}")
 
 # --- Zapis finalnego modelu ---
-model.save('C:/Users/pgryg/Desktop/CNN_project/model_final.h5')
-
-# --- Tworzenie pliku CSV tylko z błędnymi predykcjami ---
-filenames = test_generator.filenames
-filepaths = [os.path.join(test_path, fname) for fname in filenames]
-
-df_all = pd.DataFrame({
-    'file_path': filepaths,
-    'true_class': true_classes,
-    'pred_class': pred_classes,
-    'true_label': [labels[i] for i in true_classes],
-    'pred_label': [labels[i] for i in pred_classes],
-})
-
-df_mistakes = df_all[df_all['true_class'] != df_all['pred_class']]
-df_mistakes.to_csv('C:/Users/pgryg/Desktop/CNN_project/test_errors_only.csv', index=False)
-
-print("\n❌ Błędy predykcji zapisane do: test_errors_only.csv")
+model.save(os.path.join(output_dir, 'model_final.h5'))
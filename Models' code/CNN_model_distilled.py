@@ -0,0 +1,205 @@
+"""
+CNN DO ROZPOZNAWANIA GATUNKÓW THERAPHOSIDAE
+        Paweł Grygielski(121678)
+     MAŁY MODEL (STUDENT) DESTYLOWANY Z INCEPTIONV3
+
+Student uczy się jednocześnie z etykiet i z miękkich predykcji nauczyciela
+(model_final_inception_finetuned.h5) na tych samych, augmentowanych batchach:
+    strata = alpha * CE(etykieta, student) + (1 - alpha) * T^2 * KL(nauczyciel_T || student_T)
+
+Student ma to samo wejście co InceptionV3 (299x299, piksele w [-1, 1]) - zmiana rozmiaru
+do 224x224 jest pierwszą warstwą modelu, więc app.py, TTA i export_model.py obsługują go
+bez zmian (MODEL_NAME=distilled).
+
+    python CNN_model_distilled.py --teacher .../model_final_inception_finetuned.h5 --student mobilenetv3-large
+"""
+
+import os
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import argparse
+
+import tensorflow as tf
+from tensorflow.keras import layers, models, callbacks
+
+# Wspólny potok danych i raporty z CNN_model_inception.py (ten sam katalog)
+from data_pipeline import make_dataset
+from CNN_model_inception import (
+    DEFAULT_OUTPUT_DIR, DEFAULT_TEST_PATH, DEFAULT_TRAIN_PATH, NUM_CLASSES, evaluate_and_report, plot_history,
+)
+
+STUDENT_SIZE = (224, 224)
+
+
+# --- Modele studenta ---
+# Wejście: 299x299x3 w zakresie [-1, 1] (jak preprocess_input InceptionV3)
+
+def build_mobilenet_v3(variant="large"):
+    """MobileNetV3 (ImageNet) - oczekuje pikseli w [-1, 1], więc bez własnego preprocessingu."""
+    backbone_cls = tf.keras.applications.MobileNetV3Large if variant == "large" else tf.keras.applications.MobileNetV3Small
+    backbone = backbone_cls(
+        input_shape=STUDENT_SIZE + (3,), include_top=False, weights='imagenet',
+        pooling='avg', include_preprocessing=False,
+    )
+    return models.Sequential([
+        layers.Input(shape=(299, 299, 3)),
+        layers.Resizing(*STUDENT_SIZE),
+        backbone,
+        layers.Dropout(0.3),
+        layers.Dense(NUM_CLASSES, activation='softmax', dtype='float32'),
+    ], name=f"student_mobilenetv3_{variant}")
+
+
+def build_scratch_wide(width=2):
+    """Architektura z CNN_model_autorski.py z width razy większą liczbą filtrów."""
+    model = models.Sequential(name=f"student_scratch_x{width}")
+    model.add(layers.Input(shape=(299, 299, 3)))
+    model.add(layers.Resizing(*STUDENT_SIZE))
+    model.add(layers.Rescaling(0.5, offset=0.5))  # [-1, 1] -> [0, 1], jak rescale=1./255 w modelu autorskim
+    for filters in (32, 64, 128, 256):
+        model.add(layers.Conv2D(filters * width, (3,3), activation='relu', padding='same'))
+        model.add(layers.BatchNormalization())
+        model.add(layers.MaxPooling2D((2,2)))
+    model.add(layers.GlobalAveragePooling2D())
+    model.add(layers.Dense(512, activation='relu'))
+    model.add(layers.BatchNormalization())
+    model.add(layers.Dropout(0.5))
+    model.add(layers.Dense(NUM_CLASSES, activation='softmax', dtype='float32'))
+    return model
+
+
+STUDENTS = {
+    "mobilenetv3-large": lambda: build_mobilenet_v3("large"),
+    "mobilenetv3-small": lambda: build_mobilenet_v3("small"),
+    "scratch-wide": build_scratch_wide,
+}
+
+
+# --- Destylacja ---
+
+def log_probs(probs):
+    """Modele kończą się softmaxem - logarytm prawdopodobieństw pełni rolę logitów."""
+    return tf.math.log(tf.clip_by_value(tf.cast(probs, tf.float32), 1e-7, 1.0))
+
+
+class Distiller(models.Model):
+    """Model treningowy: zamrożony nauczyciel + trenowany student; zapisywany jest tylko student."""
+
+    def __init__(self, student, teacher, alpha=0.3, temperature=4.0):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.alpha = alpha
+        self.temperature = temperature
+        self.hard_loss = tf.keras.losses.CategoricalCrossentropy()
+        self.soft_loss = tf.keras.losses.KLDivergence()
+        self.loss_tracker = tf.keras.metrics.Mean(name="loss")
+        self.accuracy = tf.keras.metrics.CategoricalAccuracy(name="accuracy")
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.accuracy]
+
+    def _loss(self, x, y, training):
+        teacher_probs = self.teacher(x, training=False)
+        student_probs = self.student(x, training=training)
+        t = self.temperature
+        soft_teacher = tf.nn.softmax(log_probs(teacher_probs) / t)
+        soft_student = tf.nn.softmax(log_probs(student_probs) / t)
+        loss = (self.alpha * self.hard_loss(y, student_probs)
+                + (1 - self.alpha) * t ** 2 * self.soft_loss(soft_teacher, soft_student))
+        return loss, student_probs
+
+    def train_step(self, data):
+        x, y = data
+        with tf.GradientTape() as tape:
+            loss, student_probs = self._loss(x, y, training=True)
+        grads = tape.gradient(loss, self.student.trainable_variables)
+        self.optimizer.apply_gradients(zip(grads, self.student.trainable_variables))
+        self.loss_tracker.update_state(loss)
+        self.accuracy.update_state(y, student_probs)
+        return {m.name: m.result() for m in self.metrics}
+
+    def test_step(self, data):
+        x, y = data
+        loss, student_probs = self._loss(x, y, training=False)
+        self.loss_tracker.update_state(loss)
+        self.accuracy.update_state(y, student_probs)
+        return {m.name: m.result() for m in self.metrics}
+
+    def call(self, x, training=False):
+        return self.student(x, training=training)
+
+
+class StudentCheckpoint(callbacks.Callback):
+    """Odpowiednik ModelCheckpoint(save_best_only=True) zapisujący samego studenta."""
+
+    def __init__(self, path, monitor='val_loss'):
+        super().__init__()
+        self.path = path
+        self.monitor = monitor
+        self.best = float('inf')
+
+    def on_epoch_end(self, epoch, logs=None):
+        current = (logs or {}).get(self.monitor)
+        if current is not None and current < self.best:
+            print(f"\nEpoch {epoch + 1}: {self.monitor} improved from {self.best:.5f} to {current:.5f}, saving student to {self.path}")
+            self.best = current
+            self.model.student.save(self.path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distil the fine-tuned InceptionV3 into a compact student")
+    parser.add_argument("--train-path", default=DEFAULT_TRAIN_PATH)
+    parser.add_argument("--test-path", default=DEFAULT_TEST_PATH)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--teacher", default=None,
+                        help="teacher .h5 (default: <output-dir>/model_final_inception_finetuned.h5)")
+    parser.add_argument("--student", choices=sorted(STUDENTS), default="mobilenetv3-large")
+    parser.add_argument("--alpha", type=float, default=0.3, help="weight of the hard-label loss")
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--epochs", type=int, default=150)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    teacher_path = args.teacher or os.path.join(args.output_dir, 'model_final_inception_finetuned.h5')
+
+    # Te same zbiory, augmentacje i preprocessing co przy treningu nauczyciela
+    train_dataset, _ = make_dataset(args.train_path, target_size=(299, 299), batch_size=args.batch_size,
+                                    training=True, preprocessing='inception')
+    test_dataset, test_info = make_dataset(args.test_path, target_size=(299, 299), batch_size=args.batch_size,
+                                           training=False, preprocessing='inception')
+
+    teacher = tf.keras.models.load_model(teacher_path)
+    student = STUDENTS[args.student]()
+    student.summary()
+
+    distiller = Distiller(student, teacher, alpha=args.alpha, temperature=args.temperature)
+    distiller.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=args.learning_rate))
+
+    # Te same callbacki co w CNN_model_inception.py; checkpoint zapisuje samego studenta
+    history = distiller.fit(
+        train_dataset,
+        epochs=args.epochs,
+        validation_data=test_dataset,
+        callbacks=[
+            callbacks.EarlyStopping(monitor='val_loss', patience=20, restore_best_weights=True),
+            StudentCheckpoint(os.path.join(args.output_dir, 'best_model_distilled.h5')),
+            callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=5, min_lr=1e-6, verbose=1),
+        ]
+    )
+
+    plot_history(history, f' ({args.student}, distilled)', os.path.join(args.output_dir, 'training_plot_distilled.png'))
+
+    # Ewaluacja i raporty błędów dla samego studenta (jeden przebieg predict, evaluation.py)
+    evaluate_and_report(student, test_dataset, test_info, args.output_dir, name='distilled')
+    student.save(os.path.join(args.output_dir, 'model_final_distilled.h5'))
+
+
+if __name__ == "__main__":
+    main()
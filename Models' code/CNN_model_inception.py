@@ -2,240 +2,412 @@
 CNN DO ROZPOZNAWANIA GATUNKÓW THERAPHOSIDAE
         Paweł Grygielski(121678)
      MODEL PRETRENOWANY Z INCEPTIONV3
+
+Konfigurowalny punkt wejścia treningu:
+    python CNN_model_inception.py --train-path .../Species --test-path .../test
+
+Po przerwaniu ten sam przebieg wznawia trening od ostatniej epoki (model, optymalizator i stan
+callbacków w <output-dir>/checkpoints, training_callbacks.py); ukończona faza jest pomijana:
+    python CNN_model_inception.py --train-path .../Species --test-path .../test
+
+Trening rozproszony (tf.distribute) i mixed precision:
+    python CNN_model_inception.py --strategy mirrored --mixed-precision
+    TF_CONFIG='{"cluster": {"worker": ["host1:12345", "host2:12345"]}, "task": {"type": "worker", "index": 0}}' \\
+        python CNN_model_inception.py --strategy multiworker --mixed-precision
 """
 
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+import argparse
+import json
+import tempfile
+
 import tensorflow as tf
 from tensorflow.keras import layers, models, callbacks
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import InceptionV3
-from tensorflow.keras.applications.inception_v3 import preprocess_input
 
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix
-
-# --- Ścieżki do zbiorów treningowego i testowego ---
-train_path = 'C:/Users/pgryg/Desktop/CNN_project/Species'
-test_path = 'C:/Users/pgryg/Desktop/CNN_project/test'
-
-# --- Generatory obrazów ---
-# Dla InceptionV3 wymagane jest preprocessing_function=preprocess_input,
-# które normalizuje obrazy tak jak podczas treningu InceptionV3 na ImageNet.
-
-train_datagen_inception = ImageDataGenerator(
-    preprocessing_function=preprocess_input,  # preprocessowanie pod InceptionV3
-    shear_range=0.2,                         # losowe przesunięcie obrazu wzdłuż osi X
-    zoom_range=0.2,                          # losowe przybliżanie obrazu
-    horizontal_flip=True,                    # losowe odbicia lustrzane poziome
-    rotation_range=30,                       # losowe rotacje do ±30 stopni
-    width_shift_range=0.2,                   # losowe przesunięcia w osi X (20% szerokości)
-    height_shift_range=0.2,                  # losowe przesunięcia w osi Y (20% wysokości)
-    brightness_range=[0.8, 1.2],             # losowa zmiana jasności obrazu
-    channel_shift_range=10.0                  # losowe przesunięcie wartości kanałów RGB
-)
-
-test_datagen_inception = ImageDataGenerator(
-    preprocessing_function=preprocess_input
-)
-
-# Tworzenie generatora danych treningowych
-train_generator_inception = train_datagen_inception.flow_from_directory(
-    train_path,
-    target_size=(299, 299),  # InceptionV3 wymaga wejścia 299x299
-    batch_size=32,
-    class_mode='categorical' # klasyfikacja wieloklasowa - one-hot encoding etykiet
-)
-
-# Tworzenie generatora danych testowych - bez shuffle, aby zachować kolejność
-test_generator_inception = test_datagen_inception.flow_from_directory(
-    test_path,
-    target_size=(299, 299),
-    batch_size=32,
-    class_mode='categorical',
-    shuffle=False
-)
+
+# Wspólny potok danych tf.data (data_pipeline.py w tym samym katalogu)
+from data_pipeline import make_dataset, split_info, steps_for
+from bottleneck import BottleneckSequence, build_head, extract_features, transfer_head_weights
+from evaluation import predict_logits, print_summary, write_report
+from training_callbacks import AsyncModelCheckpoint, StepTimer, TrainingCheckpoint
+
+# --- Domyślne ścieżki do zbiorów treningowego i testowego oraz wyników ---
+DEFAULT_TRAIN_PATH = 'C:/Users/pgryg/Desktop/CNN_project/Species'
+DEFAULT_TEST_PATH = 'C:/Users/pgryg/Desktop/CNN_project/test'
+DEFAULT_OUTPUT_DIR = 'C:/Users/pgryg/Desktop/CNN_project'
+
+NUM_CLASSES = 101
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="InceptionV3 transfer learning + fine-tuning")
+    parser.add_argument("--train-path", default=DEFAULT_TRAIN_PATH)
+    parser.add_argument("--test-path", default=DEFAULT_TEST_PATH)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--epochs", type=int, default=150, help="epochs with the frozen InceptionV3")
+    parser.add_argument("--fine-tune-epochs", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=32, help="batch size per replica")
+    parser.add_argument("--strategy", choices=["default", "mirrored", "multiworker"], default="default",
+                        help="tf.distribute strategy (multiworker reads the cluster from TF_CONFIG)")
+    parser.add_argument("--mixed-precision", action="store_true",
+                        help="mixed_float16 policy with a float32 softmax head and loss scaling")
+    parser.add_argument("--bottleneck", action="store_true",
+                        help="train the frozen phase on cached InceptionV3 features")
+    parser.add_argument("--bottleneck-views", type=int, default=5,
+                        help="augmented views per image for the cached features")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="resumable training state (default: <output-dir>/checkpoints)")
+    parser.add_argument("--step-timing-every", type=int, default=10,
+                        help="time every N-th training step (input wait vs compute); 0 = off")
+    return parser.parse_args(argv)
+
+
+# --- Strategia rozproszona ---
+
+def make_strategy(name):
+    """default - jedno urządzenie, mirrored - wiele GPU/CPU jednej maszyny,
+    multiworker - wiele procesów/maszyn opisanych w TF_CONFIG."""
+    if name == "mirrored":
+        return tf.distribute.MirroredStrategy()
+    if name == "multiworker":
+        return tf.distribute.MultiWorkerMirroredStrategy()
+    return tf.distribute.get_strategy()
+
+
+def is_chief():
+    """Zadanie 'chief', jeśli klaster je ma, w przeciwnym razie worker 0 (albo brak TF_CONFIG)
+    zapisuje modele, wykresy, checkpointy i raporty."""
+    tf_config = json.loads(os.environ.get("TF_CONFIG", "{}"))
+    task = tf_config.get("task", {})
+    task_type = task.get("type", "worker")
+    if "chief" in tf_config.get("cluster", {}):
+        return task_type == "chief"
+    return task_type == "worker" and task.get("index", 0) == 0
+
+
+def writable_path(path):
+    """Przy MultiWorkerMirroredStrategy wszystkie workery muszą zapisywać model,
+    ale tylko chief zapisuje do docelowej ścieżki - pozostałe do katalogu tymczasowego."""
+    if is_chief():
+        return path
+    return os.path.join(tempfile.mkdtemp(), os.path.basename(path))
+
+
+def distribute_options(dataset, policy=tf.data.experimental.AutoShardPolicy.DATA):
+    """Dzielenie zbioru między workery po elementach (pliki są listą ścieżek, nie plikami TFRecord).
+
+    Dla zbioru testowego (bez tasowania) - zbiór treningowy dzieli make_dataset(input_context=...).
+    AutoShardPolicy.OFF - każdy worker widzi cały zbiór (np. dane syntetyczne w benchmarku).
+    model.predict przy wielu workerach i tak dzieli zbiór po elementach (DATA) i składa wyniki
+    w kolejności zbioru, więc raport używa tego samego zbioru testowego co walidacja.
+    """
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = policy
+    return dataset.with_options(options)
+
 
 # --- Budowa modelu ---
-# Wykorzystuje gotowy model InceptionV3 jako ekstraktor cech (base_model),
-# wczytując wagi wytrenowane na ImageNet.
-# include_top=False oznacza, że nie używa domyślnej gęstej warstwy klasyfikacyjnej InceptionV3.
-
-base_model = InceptionV3(weights='imagenet', include_top=False, input_shape=(299,299,3))
-base_model.trainable = False  # zamrażenie warstw bazowych - nie będą trenowane
-
-# Tworzenie modelu sekwencyjnego na bazie ekstraktora cech
-model_inception = models.Sequential([
-    base_model,  # ekstrakcja cech z InceptionV3
-
-    # GlobalAveragePooling2D - zamiast spłaszczać feature mapy, 
-    # uśrednia wartości cech w każdej mapie, zmniejszając liczbę parametrów i przeciwdziałając przeuczeniu.
-    layers.GlobalAveragePooling2D(),
-
-    # Gęsta warstwa ukryta z 512 neuronami i aktywacją ReLU,
-    # pozwalająca modelowi uczyć się bardziej złożonych reprezentacji.
-    layers.Dense(512, activation='relu'),
-
-    # Normalizacja batchy - pomaga stabilizować i przyspieszać trening
-    layers.BatchNormalization(),
-
-    # Dropout 0.5 - zapobiega przeuczeniu przez losowe "wyłączanie" połowy neuronów podczas treningu
-    layers.Dropout(0.5),
-
-    # Ostatnia warstwa gęsta z 101 neuronami (liczba klas),
-    # aktywacja softmax zapewnia, że wyjścia to prawdopodobieństwa klas.
-    layers.Dense(101, activation='softmax')
-])
-
-# --- Kompilacja modelu ---
-# Używacie optymalizatora Adam, który adaptuje współczynnik uczenia.
-# Funkcja straty categorical_crossentropy jest standardowa dla klasyfikacji wieloklasowej.
-model_inception.compile(
-    optimizer='adam',
-    loss='categorical_crossentropy',
-    metrics=['accuracy']  # podczas treningu monitorujemy dokładność
-)
-
-# --- Definicja callbacków ---
-# EarlyStopping - zatrzymuje trening jeśli przez 20 epok nie poprawi się 'val_loss'
-early_stop_inception = callbacks.EarlyStopping(
-    monitor='val_loss',
-    patience=20,
-    restore_best_weights=True
-)
-
-# ModelCheckpoint - zapisuje najlepszy model na dysku, monitorując 'val_loss'
-model_checkpoint_inception = callbacks.ModelCheckpoint(
-    'C:/Users/pgryg/Desktop/CNN_project/best_model_inception.h5',
-    monitor='val_loss',
-    save_best_only=True,
-    verbose=1
-)
-
-# ReduceLROnPlateau - zmniejsza LR jeśli 'val_loss' przestaje się poprawiać przez 5 epok
-reduce_lr_inception = callbacks.ReduceLROnPlateau(
-    monitor='val_loss',
-    factor=0.5,
-    patience=5,
-    min_lr=1e-6,
-    verbose=1
-)
-
-# --- Trenowanie modelu ---
-epochs = 150
-history_inception = model_inception.fit(
-    train_generator_inception,
-    epochs=epochs,
-    validation_data=test_generator_inception,
-    callbacks=[early_stop_inception, model_checkpoint_inception, reduce_lr_inception]
-)
-
-# --- FINE-TUNING INCEPTIONV3 ---
-# Odblokowujemy część warstw modelu bazowego w celu dalszego dopasowania do konkretnego zbioru danych.
-# To tzw. fine-tuning – dalsze dostrajanie wag wcześniej wytrenowanego modelu.
-# Te warstwy na wcześniejszych etapach treningu były zamrożone w 68 linijce poprzez base_model.trainable = False 
-
-base_model.trainable = True  # Odblokowuje wszystkie warstwy bazowe
-
-# Sprawdzenie ile warstw ma model bazowy
-print(f"\n➡️ Liczba warstw w modelu bazowym InceptionV3: {len(base_model.layers)}")
-
-# Zamraża pierwsze 250 warstw – nie będą trenowane.
-# Pozwala to zachować ogólne cechy wyuczone na ImageNet, 
-# jednocześnie umożliwiając naukę bardziej specyficznych cech dla nowego zbioru danych w dalszych warstwach.
-for layer in base_model.layers[:250]:
-    layer.trainable = False
-
-# Ponowna kompilacja modelu z mniejszym learning rate
-# (ważne przy fine-tuningu, aby nie "zepsuć" wcześniej wyuczonych wag dużymi zmianami).
-model_inception.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5),
-    loss='categorical_crossentropy',
-    metrics=['accuracy']
-)
-
-# Callback do zapisywania najlepszego modelu podczas fine-tuningu
-model_checkpoint_finetune = callbacks.ModelCheckpoint(
-    'C:/Users/pgryg/Desktop/CNN_project/best_model_inception_finetuned.h5',
-    monitor='val_loss',
-    save_best_only=True,
-    verbose=1
-)
-
-# --- Trening modelu z odblokowanymi warstwami (fine-tuning) ---
-# Kontynuujemy trenowanie przez dodatkowe 150 epok, teraz ucząc model bazowy InceptionV3.
-fine_tune_epochs = 150
-history_finetune = model_inception.fit(
-    train_generator_inception,
-    epochs=fine_tune_epochs,
-    validation_data=test_generator_inception,
-    callbacks=[early_stop_inception, model_checkpoint_finetune, reduce_lr_inception]
-)
-
-# --- Wizualizacja wyników po fine-tuningu ---
-plt.figure(figsize=(12,5))
-
-# Dokładność
-plt.subplot(1,2,1)
-plt.plot(history_finetune.history['accuracy'], label='Train Accuracy')
-plt.plot(history_finetune.history['val_accuracy'], label='Val Accuracy')
-plt.title('Model Accuracy after Fine-tuning (InceptionV3)')
-plt.xlabel('Epoch')
-plt.ylabel('Accuracy')
-plt.legend()
-
-# Strata
-plt.subplot(1,2,2)
-plt.plot(history_finetune.history['loss'], label='Train Loss')
-plt.plot(history_finetune.history['val_loss'], label='Val Loss')
-plt.title('Model Loss after Fine-tuning (InceptionV3)')
-plt.xlabel('Epoch')
-plt.ylabel('Loss')
-plt.legend()
-
-plt.tight_layout()
-plt.savefig('C:/Users/pgryg/Desktop/CNN_project/training_plot_inception_finetuned.png')
-plt.show()
-
-# --- Ewaluacja po fine-tuningu ---
-test_loss_ft, test_acc_ft = model_inception.evaluate(test_generator_inception)
-print(f'\n✅ Test accuracy after fine-tuning: {test_acc_ft:.4f}')
-
-# --- Predykcje i macierz pomyłek ---
-predictions_ft = model_inception.predict(test_generator_inception)
-pred_classes_ft = np.argmax(predictions_ft, axis=1)
-true_classes = test_generator_inception.classes
-
-labels = list(test_generator_inception.class_indices.keys())
-cm_ft = confusion_matrix(true_classes, pred_classes_ft)
-errors_ft = cm_ft.sum(axis=1) - np.diag(cm_ft)
-
-df_errors_ft = pd.DataFrame({
-    'species': labels,
-    'errors': errors_ft
-}).sort_values(by='errors', ascending=False)
-
-df_errors_ft.to_csv('C:/Users/pgryg/Desktop/CNN_project/errors_per_class_inception_finetuned.csv', index=False)
-print("\n📊 Zapisano tabelę błędów po fine-tuningu.")
-
-# --- Zapis błędnych predykcji po fine-tuningu ---
-filenames = test_generator_inception.filenames
-filepaths = [os.path.join(test_path, fname) for fname in filenames]
-
-df_all_ft = pd.DataFrame({
-    'file_path': filepaths,
-    'true_class': true_classes,
-    'pred_class': pred_classes_ft,
-    'true_label': [labels[i] for i in true_classes],
-    'pred_label': [labels[i] for i in pred_classes_ft],
-})
-
-df_mistakes_ft = df_all_ft[df_all_ft['true_class'] != df_all_ft['pred_class']]
-df_mistakes_ft.to_csv('C:/Users/pgryg/Desktop/CNN_project/test_errors_only_inception_finetuned.csv', index=False)
-print("❌ Błędy predykcji (fine-tuning) zapisane do: test_errors_only_inception_finetuned.csv")
-
-# --- Zapis ostatecznego modelu ---
-model_inception.save('C:/Users/pgryg/Desktop/CNN_project/model_final_inception_finetuned.h5')
\ No newline at end of file
+
+def build_model(mixed_precision=False, input_shape=(299, 299, 3), weights='imagenet'):
+    """InceptionV3 (ImageNet, zamrożony) + GlobalAveragePooling -> Dense(512) -> BN -> Dropout -> Dense(101).
+
+    input_shape - wejście 299x299 jak w treningu; mniejsze (min. 75x75) np. w benchmarku skalowania,
+    weights=None - losowa inicjalizacja (pomiary czasu bez pobierania wag ImageNet).
+    Przy mixed_float16 ostatnia warstwa (softmax) liczy w float32 - stabilna numerycznie strata.
+    Zwraca (model, base_model).
+    """
+    # Wykorzystuje gotowy model InceptionV3 jako ekstraktor cech (base_model),
+    # wczytując wagi wytrenowane na ImageNet.
+    # include_top=False oznacza, że nie używa domyślnej gęstej warstwy klasyfikacyjnej InceptionV3.
+    base_model = InceptionV3(weights=weights, include_top=False, input_shape=input_shape)
+    base_model.trainable = False  # zamrażenie warstw bazowych - nie będą trenowane
+
+    # Tworzenie modelu sekwencyjnego na bazie ekstraktora cech
+    model = models.Sequential([
+        base_model,  # ekstrakcja cech z InceptionV3
+
+        # GlobalAveragePooling2D - zamiast spłaszczać feature mapy,
+        # uśrednia wartości cech w każdej mapie, zmniejszając liczbę parametrów i przeciwdziałając przeuczeniu.
+        layers.GlobalAveragePooling2D(),
+
+        # Gęsta warstwa ukryta z 512 neuronami i aktywacją ReLU,
+        # pozwalająca modelowi uczyć się bardziej złożonych reprezentacji.
+        layers.Dense(512, activation='relu'),
+
+        # Normalizacja batchy - pomaga stabilizować i przyspieszać trening
+        layers.BatchNormalization(),
+
+        # Dropout 0.5 - zapobiega przeuczeniu przez losowe "wyłączanie" połowy neuronów podczas treningu
+        layers.Dropout(0.5),
+
+        # Ostatnia warstwa gęsta z 101 neuronami (liczba klas),
+        # aktywacja softmax zapewnia, że wyjścia to prawdopodobieństwa klas.
+        layers.Dense(NUM_CLASSES, activation='softmax', dtype='float32' if mixed_precision else None)
+    ])
+    return model, base_model
+
+
+def compile_model(model, learning_rate=None, mixed_precision=False):
+    """Adam + categorical_crossentropy; przy mixed precision z dynamicznym skalowaniem straty."""
+    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate or 1e-3)
+    if mixed_precision:
+        optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+    model.compile(
+        optimizer=optimizer,
+        loss='categorical_crossentropy',
+        metrics=['accuracy']  # podczas treningu monitorujemy dokładność
+    )
+
+
+def unfreeze_top(base_model, first_trainable=250):
+    """Fine-tuning: odblokowuje warstwy InceptionV3 od indeksu first_trainable."""
+    base_model.trainable = True  # Odblokowuje wszystkie warstwy bazowe
+
+    # Sprawdzenie ile warstw ma model bazowy
+    print(f"\n➡️ Liczba warstw w modelu bazowym InceptionV3: {len(base_model.layers)}")
+
+    # Zamraża pierwsze 250 warstw – nie będą trenowane.
+    # Pozwala to zachować ogólne cechy wyuczone na ImageNet,
+    # jednocześnie umożliwiając naukę bardziej specyficznych cech dla nowego zbioru danych w dalszych warstwach.
+    for layer in base_model.layers[:first_trainable]:
+        layer.trainable = False
+
+
+def make_callbacks(checkpoint_path, async_save=False):
+    """EarlyStopping (20 epok), ModelCheckpoint najlepszego val_loss i ReduceLROnPlateau (5 epok).
+
+    async_save - zapis najlepszego modelu w wątku w tle (AsyncModelCheckpoint); modele owinięte
+    przez tfmot (compress_model.py) zostają przy synchronicznym ModelCheckpoint.
+    """
+    # EarlyStopping - zatrzymuje trening jeśli przez 20 epok nie poprawi się 'val_loss'
+    early_stop = callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=20,
+        restore_best_weights=True
+    )
+
+    # ModelCheckpoint - zapisuje najlepszy model na dysku, monitorując 'val_loss'
+    if async_save:
+        model_checkpoint = AsyncModelCheckpoint(writable_path(checkpoint_path), monitor='val_loss', verbose=1)
+    else:
+        model_checkpoint = callbacks.ModelCheckpoint(
+            writable_path(checkpoint_path),
+            monitor='val_loss',
+            save_best_only=True,
+            verbose=1
+        )
+
+    # ReduceLROnPlateau - zmniejsza LR jeśli 'val_loss' przestaje się poprawiać przez 5 epok
+    reduce_lr = callbacks.ReduceLROnPlateau(
+        monitor='val_loss',
+        factor=0.5,
+        patience=5,
+        min_lr=1e-6,
+        verbose=1
+    )
+    return [early_stop, model_checkpoint, reduce_lr]
+
+
+# --- Raporty ---
+
+def plot_history(history, title_suffix, out_path):
+    plt.figure(figsize=(12,5))
+
+    # Dokładność
+    plt.subplot(1,2,1)
+    plt.plot(history.history['accuracy'], label='Train Accuracy')
+    plt.plot(history.history['val_accuracy'], label='Val Accuracy')
+    plt.title(f'Model Accuracy{title_suffix}')
+    plt.xlabel('Epoch')
+    plt.ylabel('Accuracy')
+    plt.legend()
+
+    # Strata
+    plt.subplot(1,2,2)
+    plt.plot(history.history['loss'], label='Train Loss')
+    plt.plot(history.history['val_loss'], label='Val Loss')
+    plt.title(f'Model Loss{title_suffix}')
+    plt.xlabel('Epoch')
+    plt.ylabel('Loss')
+    plt.legend()
+
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.show()
+
+
+def evaluate_and_report(model, test_dataset, test_info, output_dir, name='inception_finetuned'):
+    """Jeden przebieg predykcji (logity zapisane do logits_<name>.npz), metryki i CSV z błędami - evaluation.py.
+
+    predict jest operacją kolektywną - wywołują ją wszystkie workery,
+    pliki trafiają do output_dir tylko u chiefa. Zwraca słownik metryk.
+    """
+    output_dir = writable_path(output_dir)
+    results = predict_logits(model, test_dataset, test_info, os.path.join(output_dir, f'logits_{name}.npz'),
+                             refresh=True)
+    metrics = write_report(results, output_dir, name)
+    print_summary(metrics, name)
+    print(f"📊 Zapisano raporty błędów ({name}): errors_per_class_{name}.csv, test_errors_only_{name}.csv")
+    return metrics
+
+
+# --- Fazy treningu ---
+
+def make_phase_checkpoint(args, phase, tracked):
+    """Checkpoint fazy w --checkpoint-dir; workery inne niż chief wznawiają z niego, a zapisują do katalogu tymczasowego."""
+    directory = args.checkpoint_dir or os.path.join(args.output_dir, 'checkpoints')
+    return TrainingCheckpoint(directory, phase, tracked=tracked, save_directory=writable_path(directory))
+
+
+def fit_phase(args, model, phase, checkpoint_path, data, validation_data, epochs, steps_per_epoch=None):
+    """model.fit fazy z wznawianiem: ukończona faza tylko wczytuje swoje końcowe wagi.
+
+    steps_per_epoch - wymagane dla zbioru z distribute_datasets_from_function (powtarzanego bez końca).
+
+    Zwraca History ze wszystkimi epokami fazy (także sprzed wznowienia).
+    """
+    phase_callbacks = make_callbacks(checkpoint_path, async_save=True)
+    checkpoint = make_phase_checkpoint(args, phase, phase_callbacks)
+    if checkpoint.completed:
+        print(f"⏭️ Faza '{phase}' ukończona wcześniej - wczytuję wagi z checkpointu")
+        checkpoint.restore_weights(model)
+        return checkpoint.history_callback()
+
+    if args.step_timing_every > 0:
+        step_csv = os.path.join(writable_path(args.output_dir), f'step_timing_{phase}.csv')
+        phase_callbacks.append(StepTimer(every=args.step_timing_every, csv_path=step_csv))
+    # TrainingCheckpoint ostatni - przywraca stan callbacków po ich on_train_begin
+    model.fit(
+        data,
+        epochs=epochs,
+        steps_per_epoch=steps_per_epoch,
+        initial_epoch=checkpoint.initial_epoch,
+        validation_data=validation_data,
+        callbacks=phase_callbacks + [checkpoint]
+    )
+    return checkpoint.history_callback()
+
+
+def train_head_on_bottleneck(args, model, base_model):
+    """Faza z zamrożonym InceptionV3 na raz policzonych cechach 2048-d (--bottleneck)."""
+    head = build_head(num_classes=NUM_CLASSES)
+    compile_model(head)
+    checkpoint = make_phase_checkpoint(args, 'head', ())
+    if checkpoint.completed:
+        # Głowa już wytrenowana - bez wczytywania cech
+        print("⏭️ Faza 'head' ukończona wcześniej - wczytuję wagi z checkpointu")
+        checkpoint.restore_weights(head)
+        transfer_head_weights(head, model)
+        return checkpoint.history_callback()
+
+    bottleneck_dir = os.path.join(args.output_dir, 'bottleneck')
+    # Cechy liczone raz: zbiór treningowy z augmentowanymi widokami, testowy bez augmentacji
+    train_features, train_labels = extract_features(
+        base_model, args.train_path, bottleneck_dir, 'train', views=args.bottleneck_views
+    )
+    test_features, test_labels = extract_features(base_model, args.test_path, bottleneck_dir, 'test')
+
+    # Najlepsza głowa zapisywana osobno - pełny model powstaje po przeniesieniu wag
+    history = fit_phase(
+        args, head, 'head', os.path.join(args.output_dir, 'best_head_inception.h5'),
+        BottleneckSequence(train_features, train_labels, NUM_CLASSES, batch_size=args.batch_size, training=True),
+        BottleneckSequence(test_features, test_labels, NUM_CLASSES, batch_size=args.batch_size),
+        args.epochs
+    )
+
+    # Przeniesienie wytrenowanej głowy do pełnego modelu przed fine-tuningiem
+    transfer_head_weights(head, model)
+    model.save(os.path.join(args.output_dir, 'best_model_inception.h5'))
+    return history
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.bottleneck and args.strategy == "multiworker":
+        raise SystemExit("--bottleneck trains the head on one worker; use it without --strategy multiworker")
+
+    # Polityka mixed_float16 musi być ustawiona przed budową modelu
+    if args.mixed_precision:
+        tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
+    strategy = make_strategy(args.strategy)
+    global_batch_size = args.batch_size * strategy.num_replicas_in_sync
+    print(f"➡️ Strategia: {args.strategy}, repliki: {strategy.num_replicas_in_sync}, batch globalny: {global_batch_size}")
+
+    # --- Potok danych tf.data ---
+    # Równoległe dekodowanie, wektorowe augmentacje (te same ustawienia co wcześniej w ImageDataGenerator:
+    # shear 0.2, zoom 0.2, odbicia poziome, rotacje ±30°, przesunięcia 20%, jasność 0.8-1.2,
+    # przesunięcie kanałów 10), cache zdekodowanych obrazów i prefetch.
+    # Preprocessing jak preprocess_input InceptionV3 (piksele do zakresu [-1, 1]).
+
+    # Zbiór treningowy - tasowany co epokę, z augmentacjami. Każdy worker buduje potok tylko ze swojej
+    # części listy plików (podział przed tasowaniem i dekodowaniem), batch na replikę = globalny / repliki.
+    # Części workerów mogą różnić się o plik, więc zbiór jest powtarzany, a epoka to stała liczba kroków
+    train_steps = steps_for(split_info(args.train_path), global_batch_size)
+
+    def train_dataset_fn(input_context):
+        dataset, _ = make_dataset(
+            args.train_path,
+            target_size=(299, 299),  # InceptionV3 wymaga wejścia 299x299
+            batch_size=global_batch_size,
+            training=True,
+            preprocessing='inception',
+            input_context=input_context
+        )
+        return dataset.repeat()
+
+    train_dataset = strategy.distribute_datasets_from_function(train_dataset_fn)
+
+    # Zbiór testowy - bez tasowania, kolejność jak w flow_from_directory (ważne do analizy błędów)
+    test_dataset, test_info = make_dataset(
+        args.test_path,
+        target_size=(299, 299),
+        batch_size=global_batch_size,
+        training=False,
+        preprocessing='inception'
+    )
+    test_dataset = distribute_options(test_dataset)
+
+    # Model, optymalizator i zmienne muszą powstać w zasięgu strategii
+    with strategy.scope():
+        model, base_model = build_model(args.mixed_precision)
+        compile_model(model, mixed_precision=args.mixed_precision)
+
+    # --- Trenowanie modelu z zamrożonym InceptionV3 ---
+    if args.bottleneck:
+        history = train_head_on_bottleneck(args, model, base_model)
+    else:
+        history = fit_phase(args, model, 'frozen', os.path.join(args.output_dir, 'best_model_inception.h5'),
+                            train_dataset, test_dataset, args.epochs, train_steps)
+
+    # --- FINE-TUNING INCEPTIONV3 ---
+    # Odblokowujemy część warstw modelu bazowego w celu dalszego dopasowania do konkretnego zbioru danych.
+    # To tzw. fine-tuning – dalsze dostrajanie wag wcześniej wytrenowanego modelu.
+    # Ponowna kompilacja modelu z mniejszym learning rate
+    # (ważne przy fine-tuningu, aby nie "zepsuć" wcześniej wyuczonych wag dużymi zmianami).
+    with strategy.scope():
+        unfreeze_top(base_model, 250)
+        compile_model(model, learning_rate=1e-5, mixed_precision=args.mixed_precision)
+
+    # --- Trening modelu z odblokowanymi warstwami (fine-tuning) ---
+    # Kontynuujemy trenowanie przez dodatkowe epoki, teraz ucząc model bazowy InceptionV3.
+    # Wznowiony fine-tuning nadpisuje wagi z checkpointu fazy zamrożonej swoim stanem (on_train_begin)
+    history_finetune = fit_phase(args, model, 'finetune',
+                                 os.path.join(args.output_dir, 'best_model_inception_finetuned.h5'),
+                                 train_dataset, test_dataset, args.fine_tune_epochs, train_steps)
+
+    # --- Wykres, ewaluacja i zapis modelu ---
+    # Zapis modelu wykonują wszystkie workery (operacje kolektywne), ale tylko chief zapisuje do katalogu wyników
+    if is_chief():
+        plot_history(history_finetune, ' after Fine-tuning (InceptionV3)',
+                     os.path.join(args.output_dir, 'training_plot_inception_finetuned.png'))
+    evaluate_and_report(model, test_dataset, test_info, args.output_dir)
+    model.save(writable_path(os.path.join(args.output_dir, 'model_final_inception_finetuned.h5')))
+
+
+if __name__ == "__main__":
+    main()
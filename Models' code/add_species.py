@@ -0,0 +1,260 @@
+"""
+DODAWANIE NOWYCH GATUNKÓW BEZ PEŁNEGO TRENINGU
+        Paweł Grygielski(121678)
+
+Ostatnia warstwa Dense(101) wytrenowanego modelu jest rozszerzana o nowe klasy. InceptionV3
+zostaje bez zmian, więc trening idzie na cechach 2048-d po poolingu liczonych raz (bottleneck.py):
+- cechy zbioru treningowego starych klas (cache zależny od pliku modelu) - z nich losowana jest
+  próbka replay (--replay-per-class zdjęć na klasę) chroniąca przed zapominaniem starych klas,
+- cechy zdjęć nowych gatunków (podfoldery = nazwy gatunków) z --views augmentowanymi widokami,
+- wagi nowych klas startują od średniej aktywacji warstwy ukrytej ich zdjęć (imprinting),
+- trenowana jest tylko ostatnia warstwa, z --train-hidden także Dense(512) + BN głowy,
+- epokę wybiera EarlyStopping na części (--val-fraction) zdjęć replay i nowych gatunków
+  wyłączonej z treningu - zbiory testowe służą tylko do raportu.
+
+Wynik w <out>/<wersja>/: model.h5, species_list.txt (stare etykiety, nowe na końcu - kolejność
+wyjść modelu) i update.json z raportem: dokładność starych klas na zbiorze testowym przed i po
+aktualizacji (retencja), odsetek starych zdjęć przejętych przez nowe klasy, dokładność nowych klas.
+
+    python add_species.py --model .../model_final_inception_finetuned.h5 --train-path .../Species \\
+        --test-path .../test --new-species .../new_species --new-test .../new_species_test --version species-2
+    SPECIES_UPDATE=model/updates/species-2 streamlit run app.py
+"""
+
+import os
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import argparse
+import hashlib
+import json
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import callbacks, layers, models
+
+from bottleneck import FEATURE_DIM, BottleneckSequence, build_head, extract_features
+from CNN_model_inception import DEFAULT_OUTPUT_DIR, DEFAULT_TEST_PATH, DEFAULT_TRAIN_PATH, compile_model
+from shards import list_split_files
+from species_index import SPECIES_LIST_PATH
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_UPDATES_DIR = os.path.join(ROOT, "model", "updates")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add species to a trained model by retraining its head on cached features")
+    parser.add_argument("--model", required=True, help="trained full model (.h5), e.g. model_final_inception_finetuned.h5")
+    parser.add_argument("--species-list", help="labels of --model (default: species_list.txt next to it, else the repo list)")
+    parser.add_argument("--new-species", required=True, help="training images of the new species (one subfolder each)")
+    parser.add_argument("--new-test", help="test images of the new species (same subfolders)")
+    parser.add_argument("--train-path", default=DEFAULT_TRAIN_PATH, help="training split of the existing classes (replay)")
+    parser.add_argument("--test-path", default=DEFAULT_TEST_PATH, help="test split of the existing classes (retention)")
+    parser.add_argument("--version", required=True, help="MODEL_VERSION of the updated model")
+    parser.add_argument("--out", default=DEFAULT_UPDATES_DIR, help="the update goes to <out>/<version>")
+    parser.add_argument("--features-dir", default=os.path.join(DEFAULT_OUTPUT_DIR, "species_features"))
+    parser.add_argument("--replay-per-class", type=int, default=20, help="cached images per existing class")
+    parser.add_argument("--views", type=int, default=5, help="augmented views per new-species image")
+    parser.add_argument("--val-fraction", type=float, default=0.2,
+                        help="share of the replay and new-species images held out for early stopping")
+    parser.add_argument("--train-hidden", action="store_true", help="also retrain the head's Dense(512) + BN")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def read_labels(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def model_features_dir(model_path, features_dir):
+    """Katalog cechy zależny od pliku modelu (rozmiar, czas modyfikacji) - po fine-tuningu cechy są inne."""
+    stat = os.stat(model_path)
+    digest = hashlib.sha256(f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(features_dir, f"{name}_{digest.hexdigest()[:12]}")
+
+
+def map_classes(split_dir, classes, labels):
+    """Indeksy klas zbioru (kolejność jego podfolderów) -> indeksy wyjść modelu według nazw gatunków.
+
+    Gdy nazwy folderów nie są etykietami, a liczba klas się zgadza (zbiór użyty do treningu modelu),
+    kolejność folderów jest kolejnością wyjść - jak w flow_from_directory.
+    """
+    _, _, class_names = list_split_files(split_dir)
+    positions = {label: idx for idx, label in enumerate(labels)}
+    if all(name in positions for name in class_names):
+        return np.array([positions[name] for name in class_names])[classes]
+    if len(class_names) == len(labels):
+        return np.asarray(classes)
+    missing = [name for name in class_names if name not in positions]
+    raise SystemExit(f"{split_dir}: classes not in the model's species list: {', '.join(missing[:5])}")
+
+
+def replay_rows(labels, per_class, rng):
+    """Najwyżej per_class losowych zdjęć z każdej klasy."""
+    rows = [rng.permutation(np.flatnonzero(labels == cls))[:per_class] for cls in np.unique(labels)]
+    return np.sort(np.concatenate(rows))
+
+
+def holdout(labels, fraction, rng):
+    """(indeksy treningowe, indeksy walidacyjne): z każdej klasy ok. fraction zdjęć, co najmniej jedno zostaje w treningu."""
+    train, val = [], []
+    for cls in np.unique(labels):
+        idx = rng.permutation(np.flatnonzero(labels == cls))
+        n_val = min(int(round(len(idx) * fraction)), len(idx) - 1)
+        val.append(idx[:n_val])
+        train.append(idx[n_val:])
+    return np.sort(np.concatenate(train)), np.sort(np.concatenate(val))
+
+
+def extend_head(model, new_features, num_new):
+    """Głowa z ostatnią warstwą na num_old + num_new klas; stare wagi skopiowane, nowe z imprintingu."""
+    hidden_layers = model.layers[2:5]  # Dense(512), BN, Dropout
+    old_out = model.layers[5]
+    kernel, bias = old_out.get_weights()
+    head = build_head(num_classes=kernel.shape[1] + num_new)
+    for head_layer, model_layer in zip(head.layers[:3], hidden_layers):
+        head_layer.set_weights(model_layer.get_weights())
+
+    # Imprinting: kierunek nowej klasy = średnia aktywacja przed ostatnią warstwą, norma jak u starych klas
+    hidden = models.Model(head.inputs, head.layers[2].output)
+    new_kernel = np.empty((kernel.shape[0], num_new), dtype=kernel.dtype)
+    for cls, feats in enumerate(new_features):
+        mean = hidden.predict(feats, verbose=0).mean(axis=0)
+        new_kernel[:, cls] = mean / max(np.linalg.norm(mean), 1e-12) * np.linalg.norm(kernel, axis=0).mean()
+    head.layers[3].set_weights([
+        np.concatenate([kernel, new_kernel], axis=1),
+        np.concatenate([bias, np.full(num_new, bias.mean(), dtype=bias.dtype)]),
+    ])
+    return head
+
+
+def accuracy(probs, labels):
+    return float(np.mean(np.argmax(probs, axis=1) == labels)) if len(labels) else None
+
+
+def percent(value, spec=".2%"):
+    """Wartość raportu do wypisania; None (pusty zbiór, nieokreślona retencja) jako '-'."""
+    return "-" if value is None else format(value, spec)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+
+    species_list = args.species_list or os.path.join(os.path.dirname(os.path.abspath(args.model)), "species_list.txt")
+    if not os.path.exists(species_list):
+        species_list = SPECIES_LIST_PATH
+    old_labels = read_labels(species_list)
+    model = tf.keras.models.load_model(args.model)
+    num_old = model.output_shape[-1]
+    if num_old != len(old_labels):
+        raise SystemExit(f"{args.model} has {num_old} outputs but {species_list} lists {len(old_labels)} species")
+
+    _, _, new_names = list_split_files(args.new_species)
+    clashes = sorted(set(new_names) & set(old_labels))
+    if clashes:
+        raise SystemExit(f"Already in the model: {', '.join(clashes)}")
+    labels = old_labels + list(new_names)
+    print(f"➡️ {num_old} gatunków + {len(new_names)} nowych: {', '.join(new_names)}")
+
+    # --- Cechy 2048-d: liczone raz dla danego modelu, potem z cache ---
+    base_model = model.layers[0]
+    features_dir = model_features_dir(args.model, args.features_dir)
+    train_features, train_classes = extract_features(base_model, args.train_path, features_dir, 'train')
+    test_features, test_classes = extract_features(base_model, args.test_path, features_dir, 'test')
+    new_features, new_classes = extract_features(base_model, args.new_species, features_dir, 'new', views=args.views)
+    train_classes = map_classes(args.train_path, train_classes, old_labels)
+    test_classes = map_classes(args.test_path, test_classes, old_labels)
+    new_classes = np.asarray(new_classes) + num_old
+    features_seconds = time.perf_counter() - start
+
+    # --- Zbiór treningowy: próbka replay starych klas (widok bez augmentacji) + nowe gatunki (wszystkie widoki) ---
+    # Walidacja (wybór epoki przez EarlyStopping) to wydzielona część tych samych zdjęć treningowych;
+    # zbiory testowe służą wyłącznie do raportu, więc retencja nie jest zawyżona wyborem epoki
+    rows = replay_rows(train_classes, args.replay_per_class, rng)
+    replay_train, replay_val = holdout(train_classes[rows], args.val_fraction, rng)
+    new_train, new_val = holdout(new_classes, args.val_fraction, rng)
+    views = new_features.shape[0]
+    replay = np.broadcast_to(np.asarray(train_features[0, rows[replay_train]]), (views, len(replay_train), FEATURE_DIM))
+    x_train = np.concatenate([replay, np.asarray(new_features[:, new_train])], axis=1)
+    y_train = np.concatenate([train_classes[rows[replay_train]], new_classes[new_train]])
+    x_val = np.concatenate([train_features[0, rows[replay_val]], new_features[0, new_val]])[np.newaxis]
+    y_val = np.concatenate([train_classes[rows[replay_val]], new_classes[new_val]])
+
+    # --- Rozszerzona głowa: trenowana ostatnia warstwa (opcjonalnie także Dense(512) + BN) ---
+    new_by_class = [new_features[0, new_train[new_classes[new_train] == num_old + i]] for i in range(len(new_names))]
+    head = extend_head(model, new_by_class, len(new_names))
+    for layer in head.layers[:2]:
+        layer.trainable = args.train_hidden
+    compile_model(head, learning_rate=args.learning_rate)
+
+    train_start = time.perf_counter()
+    validation = BottleneckSequence(x_val, y_val, len(labels), batch_size=args.batch_size) if len(y_val) else None
+    head.fit(
+        BottleneckSequence(x_train, y_train, len(labels), batch_size=args.batch_size, training=True, seed=args.seed),
+        epochs=args.epochs,
+        validation_data=validation,
+        callbacks=[callbacks.EarlyStopping(monitor='val_loss' if validation else 'loss', patience=5,
+                                           restore_best_weights=True)],
+        verbose=2,
+    )
+    train_seconds = time.perf_counter() - train_start
+
+    # --- Retencja starych klas: ta sama próbka testowa przed i po rozszerzeniu ---
+    old_head = models.Sequential([layers.Input(shape=(FEATURE_DIM,))] + model.layers[2:])
+    before = old_head.predict(test_features[0], batch_size=256, verbose=0)
+    after = head.predict(test_features[0], batch_size=256, verbose=0)
+    report = {
+        "version": args.version,
+        "base_model": os.path.abspath(args.model),
+        "base_classes": num_old,
+        "new_species": list(new_names),
+        "num_classes": len(labels),
+        "replay_images": int(len(replay_train)),
+        "new_images": int(len(new_train)),
+        "val_images": int(len(y_val)),
+        "train_hidden": args.train_hidden,
+        "old_accuracy_before": accuracy(before, test_classes),
+        "old_accuracy_after": accuracy(after, test_classes),
+        "old_predicted_as_new": float(np.mean(np.argmax(after, axis=1) >= num_old)) if len(test_classes) else None,
+        "features_seconds": features_seconds,
+        "train_seconds": train_seconds,
+    }
+    # Retencja nieokreślona, gdy stary model nie trafia żadnego zdjęcia testowego albo zbiór jest pusty
+    before_accuracy = report["old_accuracy_before"]
+    report["retention"] = report["old_accuracy_after"] / before_accuracy if before_accuracy else None
+    if args.new_test:
+        new_test_features, new_test_classes = extract_features(base_model, args.new_test, features_dir, 'new_test')
+        new_test_classes = map_classes(args.new_test, new_test_classes, labels)
+        new_test_probs = head.predict(new_test_features[0], batch_size=256, verbose=0)
+        report["new_accuracy"] = accuracy(new_test_probs, new_test_classes)
+
+    # --- Publikacja: pełny model (ten sam InceptionV3 + nowa głowa) i lista etykiet ---
+    out_dir = os.path.join(args.out, args.version)
+    os.makedirs(out_dir, exist_ok=True)
+    full_model = models.Sequential([base_model, model.layers[1]] + head.layers)
+    full_model.save(os.path.join(out_dir, "model.h5"))
+    with open(os.path.join(out_dir, "species_list.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"{label}\n" for label in labels)
+    report["total_seconds"] = time.perf_counter() - start
+    # update.json na końcu - po nim app.py rozpoznaje kompletną aktualizację
+    with open(os.path.join(out_dir, "update.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Stare klasy: {percent(report['old_accuracy_before'])} -> {percent(report['old_accuracy_after'])} "
+          f"(retencja {percent(report['retention'], '.1%')}, "
+          f"{percent(report['old_predicted_as_new'])} przejętych przez nowe klasy)")
+    if "new_accuracy" in report:
+        print(f"📊 Nowe gatunki (test): {percent(report['new_accuracy'])}")
+    print(f"✅ {out_dir} w {report['total_seconds']:.0f} s (cechy {features_seconds:.0f} s, trening {train_seconds:.0f} s)")
+    print(f"   SPECIES_UPDATE={out_dir} streamlit run app.py")
+
+
+if __name__ == "__main__":
+    main()
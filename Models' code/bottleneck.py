@@ -0,0 +1,127 @@
+"""
+TRENING GŁOWY NA ZAPISANYCH CECHACH (BOTTLENECK) DLA ZAMROŻONEGO INCEPTIONV3
+        Paweł Grygielski(121678)
+
+Przy base_model.trainable = False każda epoka liczyłaby od nowa pełny forward pass
+InceptionV3 dla każdego zdjęcia, choć trenowana jest tylko głowa
+GlobalAveragePooling -> Dense(512) -> Dense(101). Tutaj cechy 2048-d po poolingu
+są liczone raz (opcjonalnie dla N augmentowanych widoków każdego zdjęcia),
+zapisywane w pliku .npy mapowanym w pamięci, a głowa trenuje się na nich w minuty.
+Wytrenowane wagi głowy są potem przenoszone do pełnego modelu przed fine-tuningiem.
+"""
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, models
+
+from data_pipeline import make_dataset, steps_for
+
+FEATURE_DIM = 2048
+
+
+def extract_features(base_model, split_dir, out_dir, name, views=0, batch_size=32, target_size=(299, 299),
+                     dtype=np.float16):
+    """Liczy cechy 2048-d dla widoku bez augmentacji i `views` widoków augmentowanych.
+
+    Zapisuje {name}_features.npy o kształcie (1 + views, liczba zdjęć, 2048) i {name}_labels.npy.
+    Jeśli pliki dla tego samego zbioru i liczby widoków już istnieją, są używane ponownie.
+    Zwraca (cechy jako memmap tylko do odczytu, etykiety).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    features_path = os.path.join(out_dir, f"{name}_features.npy")
+    labels_path = os.path.join(out_dir, f"{name}_labels.npy")
+    meta_path = os.path.join(out_dir, f"{name}_meta.json")
+
+    _, info = make_dataset(split_dir, target_size, batch_size, training=False, cache=False)
+    meta = {"split_dir": split_dir, "samples": info.samples, "views": views, "filenames": info.filenames}
+    if os.path.exists(meta_path) and os.path.exists(features_path):
+        with open(meta_path, encoding="utf-8") as f:
+            if json.load(f) == meta:
+                print(f"♻️ Używam zapisanych cech: {features_path}")
+                return np.load(features_path, mmap_mode="r"), np.load(labels_path)
+
+    # Stary meta.json nie może opisywać pliku, który jest właśnie nadpisywany (przerwany przebieg);
+    # cechy trafiają do pliku tymczasowego i zastępują poprzednie dopiero po policzeniu całości
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    tmp_path = features_path + ".tmp"
+    extractor = models.Sequential([base_model, layers.GlobalAveragePooling2D()])
+    features = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=dtype, shape=(1 + views, info.samples, FEATURE_DIM)
+    )
+
+    steps = steps_for(info, batch_size)
+    for view in range(1 + views):
+        # Widok 0 bez augmentacji, kolejne z augmentacjami - zawsze w stałej kolejności plików
+        dataset, _ = make_dataset(split_dir, target_size, batch_size, training=False,
+                                  augment=view > 0, cache=False)
+        offset = 0
+        for images, _ in dataset:
+            batch_features = extractor(images, training=False).numpy()
+            features[view, offset:offset + len(batch_features)] = batch_features
+            offset += len(batch_features)
+        print(f"📦 {name}: widok {view + 1}/{1 + views} ({steps} batchy)")
+
+    features.flush()
+    del features
+    os.replace(tmp_path, features_path)
+    np.save(labels_path, info.classes)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return np.load(features_path, mmap_mode="r"), info.classes
+
+
+class BottleneckSequence(tf.keras.utils.Sequence):
+    """Batche cech z pliku memmap; w treningu każde zdjęcie dostaje losowy widok co epokę."""
+
+    def __init__(self, features, labels, num_classes, batch_size=32, training=False, seed=None):
+        self.features = features
+        self.labels = labels
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.training = training
+        self.rng = np.random.default_rng(seed)
+        self.order = np.arange(len(labels))
+        self.views = np.zeros(len(labels), dtype=np.int64)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(len(self.labels) / self.batch_size))
+
+    def __getitem__(self, idx):
+        rows = self.order[idx * self.batch_size:(idx + 1) * self.batch_size]
+        # Memmap czyta tylko potrzebne wiersze; sortowanie indeksów daje odczyt sekwencyjny
+        x = np.empty((len(rows), FEATURE_DIM), dtype=np.float32)
+        for view in np.unique(self.views[rows]):
+            mask = self.views[rows] == view
+            sel = rows[mask]
+            sort = np.argsort(sel)
+            x[np.flatnonzero(mask)[sort]] = self.features[view, sel[sort]]
+        y = np.eye(self.num_classes, dtype=np.float32)[self.labels[rows]]
+        return x, y
+
+    def on_epoch_end(self):
+        if self.training:
+            self.rng.shuffle(self.order)
+            self.views = self.rng.integers(0, self.features.shape[0], size=len(self.labels))
+
+
+def build_head(num_classes=101):
+    """Głowa identyczna z warstwami modelu po GlobalAveragePooling2D."""
+    return models.Sequential([
+        layers.Input(shape=(FEATURE_DIM,)),
+        layers.Dense(512, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.5),
+        # float32 także przy polityce mixed_float16 (stabilny softmax i strata)
+        layers.Dense(num_classes, activation='softmax', dtype='float32'),
+    ])
+
+
+def transfer_head_weights(head, full_model):
+    """Kopiuje wagi głowy do warstw pełnego modelu (base_model, GAP, Dense, BN, Dropout, Dense)."""
+    for head_layer, model_layer in zip(head.layers, full_model.layers[2:]):
+        model_layer.set_weights(head_layer.get_weights())
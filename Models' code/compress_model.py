@@ -0,0 +1,207 @@
+"""
+KOMPRESJA WYTRENOWANEGO MODELU: PRUNING I KLASTROWANIE WAG
+        Paweł Grygielski(121678)
+
+Etap po treningu, działający na model_final_inception_finetuned.h5:
+- pruning wag Conv2D/Dense według wartości bezwzględnej (--mode magnitude) albo
+  strukturalny 2:4 (--mode 2by4, dwie niezerowe wagi w każdej czwórce),
+- krótki fine-tuning z maską pruningu (te same EarlyStopping / ModelCheckpoint /
+  ReduceLROnPlateau co w CNN_model_inception.py),
+- opcjonalne klastrowanie wag zachowujące zera (--clusters),
+- usunięcie wrapperów tfmot - wynik to zwykły model Keras .h5 dla load_trained_model().
+
+Zera w .h5 zajmują tyle samo miejsca co inne wagi, dlatego raport podaje też rozmiar
+po kompresji gzip (tak model jest przechowywany / pobierany).
+
+    python compress_model.py --model .../model_final_inception_finetuned.h5 --sparsity 0.3 0.5 0.7
+    MODEL_NAME=pruned streamlit run app.py   # po skopiowaniu wybranego poziomu do model/model_pruned.h5
+"""
+
+import os
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import argparse
+import gzip
+import json
+import shutil
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from data_pipeline import make_dataset
+from CNN_model_inception import DEFAULT_OUTPUT_DIR, DEFAULT_TEST_PATH, DEFAULT_TRAIN_PATH, make_callbacks
+
+# PredictionEngine (engine.py w katalogu nadrzędnym, bez konfiguracji app.py) - pomiar opóźnienia jak przy serwowaniu
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from engine import PredictionEngine
+
+PRUNABLE = (tf.keras.layers.Conv2D, tf.keras.layers.Dense)
+
+
+def import_tfmot():
+    try:
+        import tensorflow_model_optimization as tfmot
+    except ImportError as exc:
+        raise SystemExit("compress_model.py needs tensorflow-model-optimization (pip install tensorflow-model-optimization==0.7.3)") from exc
+    return tfmot
+
+
+def clone_with(model, wrap):
+    """Klonuje model razem z zagnieżdżonymi modelami (InceptionV3 w Sequential), owijając warstwy Conv2D/Dense."""
+    def clone_fn(layer):
+        if isinstance(layer, tf.keras.Model):
+            return clone_with(layer, wrap)
+        if isinstance(layer, PRUNABLE):
+            return wrap(layer)
+        return layer
+    return tf.keras.models.clone_model(model, clone_function=clone_fn)
+
+
+def apply_pruning(model, sparsity, mode, steps):
+    """Owija warstwy pruningiem; sparsity rośnie od 0 do celu w pierwszej połowie fine-tuningu."""
+    tfmot = import_tfmot()
+    if mode == "2by4":
+        params = {"sparsity_m_by_n": (2, 4)}
+    else:
+        params = {"pruning_schedule": tfmot.sparsity.keras.PolynomialDecay(
+            initial_sparsity=0.0, final_sparsity=sparsity, begin_step=0, end_step=max(1, steps // 2), frequency=50,
+        )}
+    return clone_with(model, lambda layer: tfmot.sparsity.keras.prune_low_magnitude(layer, **params))
+
+
+def apply_clustering(model, clusters):
+    """Klastrowanie wag po pruningu - preserve_sparsity nie przywraca wyzerowanych wag."""
+    tfmot = import_tfmot()
+    centroids = tfmot.clustering.keras.CentroidInitialization.KMEANS_PLUS_PLUS
+    return clone_with(model, lambda layer: tfmot.clustering.keras.cluster_weights(
+        layer, number_of_clusters=clusters, cluster_centroids_init=centroids, preserve_sparsity=True,
+    ))
+
+
+def compile_for_finetune(model, learning_rate):
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='categorical_crossentropy', metrics=['accuracy'])
+
+
+def kernel_sparsity(model):
+    """Udział zer we wszystkich jądrach Conv2D/Dense (z zagnieżdżonymi modelami)."""
+    zeros = total = 0
+    for layer in model.submodules:
+        if isinstance(layer, PRUNABLE):
+            kernel = layer.kernel.numpy()
+            zeros += int(np.count_nonzero(kernel == 0))
+            total += kernel.size
+    return zeros / total if total else 0.0
+
+
+def gzip_size(path):
+    tmp = path + ".gz"
+    with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    size = os.path.getsize(tmp)
+    os.remove(tmp)
+    return size
+
+
+def measure(path, test_dataset, repeats=30):
+    """Rozmiar, czas load_model, opóźnienie batcha 1 na CPU i dokładność zapisanego modelu."""
+    tf.keras.backend.clear_session()
+    start = time.perf_counter()
+    model = tf.keras.models.load_model(path)
+    load_seconds = time.perf_counter() - start
+
+    engine = PredictionEngine(model)
+    engine.warmup()
+    image = np.zeros((1, 299, 299, 3), dtype=np.float32)
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        engine.predict(image)
+        times.append(time.perf_counter() - t0)
+
+    model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+    _, accuracy = model.evaluate(test_dataset, verbose=0)
+    return {
+        "sparsity": kernel_sparsity(model),
+        "size_mb": os.path.getsize(path) / 2**20,
+        "gzip_mb": gzip_size(path) / 2**20,
+        "load_seconds": load_seconds,
+        "latency_ms": float(np.median(times) * 1000),
+        "accuracy": float(accuracy),
+    }
+
+
+def compress(args, level, train_dataset, test_dataset, steps_per_epoch):
+    """Jeden poziom kompresji: pruning + fine-tuning (+ klastrowanie), zapis bez wrapperów."""
+    tfmot = import_tfmot()
+    tf.keras.backend.clear_session()
+    model = tf.keras.models.load_model(args.model)
+    tag = "2by4" if args.mode == "2by4" else f"{round(level * 100)}"
+
+    pruned = apply_pruning(model, level, args.mode, args.epochs * steps_per_epoch)
+    compile_for_finetune(pruned, args.learning_rate)
+    pruned.fit(
+        train_dataset,
+        epochs=args.epochs,
+        validation_data=test_dataset,
+        callbacks=make_callbacks(os.path.join(args.output_dir, f'best_model_pruned_{tag}.h5'))
+        + [tfmot.sparsity.keras.UpdatePruningStep()],
+    )
+    # strip_* przechodzi też przez zagnieżdżony InceptionV3
+    model = tfmot.sparsity.keras.strip_pruning(pruned)
+
+    if args.clusters:
+        clustered = apply_clustering(model, args.clusters)
+        compile_for_finetune(clustered, args.learning_rate)
+        clustered.fit(train_dataset, epochs=max(1, args.epochs // 2), validation_data=test_dataset,
+                      callbacks=make_callbacks(os.path.join(args.output_dir, f'best_model_clustered_{tag}.h5')))
+        model = tfmot.clustering.keras.strip_clustering(clustered)
+        tag += f"_c{args.clusters}"
+
+    out_path = os.path.join(args.output_dir, f'model_pruned_{tag}.h5')
+    model.save(out_path, include_optimizer=False)
+    return tag, out_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune (and optionally cluster) the fine-tuned InceptionV3")
+    parser.add_argument("--model", default=os.path.join(DEFAULT_OUTPUT_DIR, 'model_final_inception_finetuned.h5'))
+    parser.add_argument("--train-path", default=DEFAULT_TRAIN_PATH)
+    parser.add_argument("--test-path", default=DEFAULT_TEST_PATH)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--mode", choices=["magnitude", "2by4"], default="magnitude")
+    parser.add_argument("--sparsity", type=float, nargs="+", default=[0.3, 0.5, 0.7, 0.8],
+                        help="target sparsity levels (magnitude mode)")
+    parser.add_argument("--clusters", type=int, default=0, help="weight clusters per layer after pruning (0 = off)")
+    parser.add_argument("--epochs", type=int, default=5, help="fine-tuning epochs per level")
+    parser.add_argument("--learning-rate", type=float, default=1e-5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    train_dataset, train_info = make_dataset(args.train_path, target_size=(299, 299), batch_size=args.batch_size,
+                                             training=True, preprocessing='inception')
+    test_dataset, _ = make_dataset(args.test_path, target_size=(299, 299), batch_size=args.batch_size,
+                                   training=False, preprocessing='inception')
+    steps_per_epoch = int(np.ceil(train_info.samples / args.batch_size))
+
+    results = [("original", measure(args.model, test_dataset))]
+    levels = [None] if args.mode == "2by4" else args.sparsity
+    for level in levels:
+        tag, path = compress(args, level, train_dataset, test_dataset, steps_per_epoch)
+        results.append((tag, measure(path, test_dataset)))
+
+    print(f"\n{'level':<10} {'sparsity':>9} {'h5 MB':>7} {'gzip MB':>8} {'load s':>7} {'CPU ms':>7} {'accuracy':>9}")
+    for tag, r in results:
+        print(f"{tag:<10} {r['sparsity']:>9.1%} {r['size_mb']:>7.1f} {r['gzip_mb']:>8.1f} "
+              f"{r['load_seconds']:>7.2f} {r['latency_ms']:>7.1f} {r['accuracy']:>9.2%}")
+
+    report_path = os.path.join(args.output_dir, 'compression_report.json')
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(dict(results), f, indent=2)
+    print(f"\n📊 Raport kompresji zapisany do: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
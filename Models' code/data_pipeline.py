@@ -0,0 +1,277 @@
+"""
+WSPÓLNY POTOK DANYCH tf.data DLA OBU SKRYPTÓW TRENINGOWYCH
+        Paweł Grygielski(121678)
+
+Zastępuje ImageDataGenerator.flow_from_directory:
+- równoległe dekodowanie JPEG (num_parallel_calls=AUTOTUNE); PPM i TIFF, których tf.io.decode_image
+  nie czyta, dekoduje PIL (preprocessing.load_image - jak flow_from_directory),
+- augmentacje wykonywane wektorowo na całym batchu (jedna transformacja
+  afiniczna na obraz zamiast osobnych operacji w Pythonie),
+- cache() zdekodowanych obrazów i prefetch(AUTOTUNE),
+- deterministyczna kolejność zbioru testowego - taka sama jak w flow_from_directory
+  (klasy alfabetycznie, pliki alfabetycznie), więc macierz pomyłek i pliki CSV z błędami
+  nadal wskazują właściwe zdjęcia.
+
+Zamiast katalogu zdjęć można podać katalog shardów z shards.py (zdekodowane piksele uint8
+czytane przez mmap) - wtedy dekodowanie i cache() są pomijane, reszta potoku jest ta sama.
+
+Przy treningu rozproszonym (strategy.distribute_datasets_from_function) make_dataset dostaje
+input_context: lista plików jest dzielona między workery przed tasowaniem i dekodowaniem,
+więc każdy worker dekoduje, cache'uje i augmentuje tylko swoją, rozłączną część zbioru.
+"""
+
+import math
+import os
+import re
+import sys
+from collections import namedtuple
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+
+from shards import ShardReader, is_shard_dir, list_split_files, load_index
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from preprocessing import IMAGE_EXTENSIONS, load_image
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# tf.io.decode_image czyta BMP, GIF, JPEG i PNG - pozostałe rozszerzenia flow_from_directory idą przez PIL
+PIL_EXTENSIONS = tuple(ext for ext in IMAGE_EXTENSIONS if ext not in (".bmp", ".jpg", ".jpeg", ".png"))
+PIL_PATTERN = ".*(" + "|".join(re.escape(ext) for ext in PIL_EXTENSIONS) + ")"
+
+# Odpowiednik atrybutów generatora używanych przy ewaluacji:
+# filenames (względem katalogu zbioru), classes, class_indices
+SplitInfo = namedtuple("SplitInfo", ["filepaths", "filenames", "classes", "class_indices", "samples"])
+
+
+class RandomImageAugmentation(layers.Layer):
+    """Augmentacje z ImageDataGenerator wykonywane na całym batchu naraz.
+
+    Rotacja, ścinanie (w stopniach, jak shear_range), zoom, przesunięcia i odbicie poziome
+    są składane w jedną macierz na obraz i wykonywane jednym ImageProjectiveTransformV3
+    (interpolacja dwuliniowa, wypełnianie 'nearest' - jak w ImageDataGenerator).
+    Potem przesunięcie kanałów i jasność. Wejście: piksele w zakresie [0, 255].
+    """
+
+    def __init__(self, rotation_range=30, shear_range=0.2, zoom_range=0.2, width_shift_range=0.2,
+                 height_shift_range=0.2, horizontal_flip=True, brightness_range=(0.8, 1.2),
+                 channel_shift_range=10.0, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.rotation_range = rotation_range
+        self.shear_range = shear_range
+        self.zoom_range = zoom_range
+        self.width_shift_range = width_shift_range
+        self.height_shift_range = height_shift_range
+        self.horizontal_flip = horizontal_flip
+        self.brightness_range = brightness_range
+        self.channel_shift_range = channel_shift_range
+        self.seed = seed
+
+    def _uniform(self, batch, low, high, op):
+        # Każdy parametr ma własny seed operacji - ten sam seed dałby identyczne losowania
+        seed = None if self.seed is None else self.seed + op
+        return tf.random.uniform([batch], low, high, seed=seed)
+
+    def call(self, images):
+        images = tf.cast(images, tf.float32)
+        shape = tf.shape(images)
+        batch = shape[0]
+        height = tf.cast(shape[1], tf.float32)
+        width = tf.cast(shape[2], tf.float32)
+
+        theta = self._uniform(batch, -self.rotation_range, self.rotation_range, 0) * (math.pi / 180)
+        shear = self._uniform(batch, -self.shear_range, self.shear_range, 1) * (math.pi / 180)
+        zx = self._uniform(batch, 1 - self.zoom_range, 1 + self.zoom_range, 2)
+        zy = self._uniform(batch, 1 - self.zoom_range, 1 + self.zoom_range, 3)
+        tx = self._uniform(batch, -self.width_shift_range, self.width_shift_range, 4) * width
+        ty = self._uniform(batch, -self.height_shift_range, self.height_shift_range, 5) * height
+        if self.horizontal_flip:
+            flip = tf.where(self._uniform(batch, 0.0, 1.0, 6) < 0.5, -1.0, 1.0)
+        else:
+            flip = tf.ones([batch])
+
+        # Macierz A = R(theta) @ S(shear) @ diag(zx * flip, zy) mapuje współrzędne wyjścia
+        # (względem środka obrazu) na współrzędne wejścia
+        cos_t, sin_t = tf.cos(theta), tf.sin(theta)
+        sx = zx * flip
+        a00 = cos_t * sx
+        a01 = (-cos_t * tf.sin(shear) - sin_t * tf.cos(shear)) * zy
+        a10 = sin_t * sx
+        a11 = (-sin_t * tf.sin(shear) + cos_t * tf.cos(shear)) * zy
+
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+        off_x = cx + tx - (a00 * cx + a01 * cy)
+        off_y = cy + ty - (a10 * cx + a11 * cy)
+        zeros = tf.zeros([batch])
+        transforms = tf.stack([a00, a01, off_x, a10, a11, off_y, zeros, zeros], axis=1)
+
+        images = tf.raw_ops.ImageProjectiveTransformV3(
+            images=images,
+            transforms=transforms,
+            output_shape=shape[1:3],
+            fill_value=0.0,
+            interpolation="BILINEAR",
+            fill_mode="NEAREST",
+        )
+
+        # Przesunięcie kanałów: jedna losowa wartość na obraz, przycięta do zakresu obrazu
+        if self.channel_shift_range:
+            intensity = self._uniform(batch, -self.channel_shift_range, self.channel_shift_range, 7)
+            low = tf.reduce_min(images, axis=[1, 2, 3], keepdims=True)
+            high = tf.reduce_max(images, axis=[1, 2, 3], keepdims=True)
+            images = tf.clip_by_value(images + intensity[:, None, None, None], low, high)
+
+        # Jasność: mnożnik z brightness_range, wynik przycięty do [0, 255] (jak PIL ImageEnhance)
+        if self.brightness_range:
+            factor = self._uniform(batch, self.brightness_range[0], self.brightness_range[1], 8)
+            images = tf.clip_by_value(images * factor[:, None, None, None], 0.0, 255.0)
+
+        return images
+
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            "rotation_range": self.rotation_range,
+            "shear_range": self.shear_range,
+            "zoom_range": self.zoom_range,
+            "width_shift_range": self.width_shift_range,
+            "height_shift_range": self.height_shift_range,
+            "horizontal_flip": self.horizontal_flip,
+            "brightness_range": self.brightness_range,
+            "channel_shift_range": self.channel_shift_range,
+            "seed": self.seed,
+        })
+        return config
+
+
+# Odpowiedniki preprocessing.preprocess_inception / preprocess_scratch na tensorach (te same działania
+# float32, wynik identyczny bit w bit) - zgodność sprawdza bench/check_preprocessing.py
+def scale_inception(images):
+    """[0, 255] -> [-1, 1], jak preprocess_input InceptionV3."""
+    return images / 127.5 - 1.0
+
+
+def scale_scratch(images):
+    """[0, 255] -> [0, 1], jak rescale=1./255."""
+    return images * (1.0 / 255)
+
+
+PREPROCESSING = {"inception": scale_inception, "scratch": scale_scratch}
+
+
+def split_info(split_dir):
+    """Pliki i etykiety zbioru w kolejności flow_from_directory (także dla katalogu shardów)."""
+    filepaths, classes, class_names = list_split_files(split_dir)
+    if is_shard_dir(split_dir):
+        filenames = load_index(split_dir)["filenames"]
+    else:
+        filenames = [os.path.relpath(p, split_dir) for p in filepaths]
+    class_indices = {name: idx for idx, name in enumerate(class_names)}
+    return SplitInfo(filepaths, filenames, classes, class_indices, len(filepaths))
+
+
+def decode_image(path, target_size):
+    """Dekodowanie i skalowanie do target_size (nearest - jak flow_from_directory), wynik uint8."""
+    def decode_with_pil():
+        image = tf.numpy_function(
+            lambda p: np.asarray(load_image(p.decode(), target_size, draft=False)), [path], tf.uint8
+        )
+        image.set_shape([None, None, 3])
+        return image
+
+    def decode_with_tf():
+        return tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+
+    image = tf.cond(tf.strings.regex_full_match(tf.strings.lower(path), PIL_PATTERN), decode_with_pil, decode_with_tf)
+    image = tf.image.resize(image, target_size, method="nearest")
+    return tf.cast(image, tf.uint8)
+
+
+def shard_for_worker(dataset, input_context):
+    """Rozłączna część zbioru dla jednego potoku wejścia (co n-ty element - pliki są posortowane
+    klasami, więc każdy worker dostaje wszystkie klasy w tych samych proporcjach)."""
+    if input_context is None or input_context.num_input_pipelines == 1:
+        return dataset
+    return dataset.shard(input_context.num_input_pipelines, input_context.input_pipeline_id)
+
+
+def shard_batches(shard_dir, target_size, batch_size, shuffle, shuffle_seed=None, input_context=None):
+    """Batche (obrazy uint8, etykiety) ze shardów: tasowane są tylko indeksy, piksele czytane przez mmap."""
+    reader = ShardReader(shard_dir)
+    if reader.target_size != tuple(target_size):
+        raise ValueError(f"{shard_dir}: shards are {reader.target_size}, the model needs {tuple(target_size)}")
+    dataset = shard_for_worker(tf.data.Dataset.range(reader.samples), input_context)
+    if shuffle:
+        dataset = dataset.shuffle(reader.samples, seed=shuffle_seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+
+    def gather(indices):
+        images, labels = tf.numpy_function(reader.gather, [indices], [tf.uint8, tf.int32])
+        images.set_shape([None, *target_size, 3])
+        labels.set_shape([None])
+        return images, labels
+
+    return dataset.map(gather, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+
+
+def make_dataset(split_dir, target_size, batch_size=32, training=False, preprocessing="inception",
+                 augmentation=None, cache=True, shuffle_seed=None, shuffle_buffer=2048, shuffle=None, augment=None,
+                 input_context=None):
+    """Tworzy tf.data.Dataset z (obrazy, etykiety one-hot) oraz SplitInfo zbioru.
+
+    training=True: tasowanie co epokę i augmentacje (domyślnie ustawienia z ImageDataGenerator).
+    training=False: stała kolejność zgodna z info.filenames / info.classes.
+    shuffle / augment nadpisują domyślne zachowanie (np. augmentacje w stałej kolejności).
+    cache: True - zdekodowane obrazy w pamięci, str - plik cache na dysku, False - bez cache
+    (ignorowane dla katalogu shardów - piksele są już zdekodowane).
+    input_context: tf.distribute.InputContext z distribute_datasets_from_function - batch_size jest
+    wtedy globalny, a zbiór zawiera tylko część plików tego workera (info opisuje cały zbiór).
+    """
+    info = split_info(split_dir)
+    num_classes = len(info.class_indices)
+    shuffle = training if shuffle is None else shuffle
+    augment = training if augment is None else augment
+    if input_context is not None:
+        batch_size = input_context.get_per_replica_batch_size(batch_size)
+
+    if is_shard_dir(split_dir):
+        dataset = shard_batches(split_dir, target_size, batch_size, shuffle, shuffle_seed, input_context)
+    else:
+        # Podział między workery na liście ścieżek - przed tasowaniem, dekodowaniem i cache
+        dataset = shard_for_worker(tf.data.Dataset.from_tensor_slices((info.filepaths, info.classes)), input_context)
+        if shuffle:
+            # Z cache kolejność po pierwszym przejściu jest zamrożona, więc tasujemy raz globalnie
+            # (pliki są posortowane klasami), a co epokę już w buforze po cache
+            dataset = dataset.shuffle(len(info.filepaths), seed=shuffle_seed, reshuffle_each_iteration=not cache)
+
+        dataset = dataset.map(
+            lambda path, label: (decode_image(path, target_size), label),
+            num_parallel_calls=AUTOTUNE,
+            deterministic=not shuffle,
+        )
+        if cache:
+            # Cache po dekodowaniu, przed augmentacją - każda epoka dostaje nowe losowe augmentacje
+            dataset = dataset.cache(cache if isinstance(cache, str) else "")
+            if shuffle:
+                dataset = dataset.shuffle(min(len(info.filepaths), shuffle_buffer), seed=shuffle_seed)
+
+        dataset = dataset.batch(batch_size)
+
+    if augment:
+        augmentation = augmentation or RandomImageAugmentation(seed=shuffle_seed)
+        dataset = dataset.map(lambda x, y: (augmentation(x), y), num_parallel_calls=AUTOTUNE)
+
+    scale = PREPROCESSING[preprocessing]
+    dataset = dataset.map(
+        lambda x, y: (scale(tf.cast(x, tf.float32)), tf.one_hot(y, num_classes)),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not shuffle,
+    )
+    return dataset.prefetch(AUTOTUNE), info
+
+
+def steps_for(info, batch_size):
+    """Liczba batchy na epokę (jak len(generator))."""
+    return int(np.ceil(info.samples / batch_size))
@@ -0,0 +1,300 @@
+"""
+EWALUACJA MODELI: JEDEN PRZEBIEG INFERENCJI, METRYKI Z ZAPISANYCH LOGITÓW
+        Paweł Grygielski(121678)
+
+- predict_logits: jeden przebieg model.predict po zbiorze testowym, wynik zapisywany do pliku
+  .npz (logity, klasy, ścieżki plików, nazwy klas) - kolejne raporty i porównania nie uruchamiają modelu,
+- compute_metrics: accuracy, top-k, precision/recall/F1 na klasę, macierz pomyłek,
+  kalibracja (ECE, MCE, Brier, NLL) - wektorowo w NumPy, bez sklearn i pandas,
+- write_report: errors_per_class_<nazwa>.csv, test_errors_only_<nazwa>.csv, metrics_<nazwa>.json,
+- compare_models: metryki kilku modeli obok siebie oraz zgodność ich predykcji.
+
+Modele kończą się softmaxem, więc zapisywane logity to log(prawdopodobieństwa) - różnią się od
+logitów sprzed softmaxu stałą w wierszu, co nie zmienia softmaxu ani żadnej z metryk.
+
+    python evaluation.py --models .../model_final.h5 .../model_final_inception_finetuned.h5 --test-path .../test
+    python evaluation.py --logits .../logits_autorski.npz .../logits_inception_finetuned.npz   # bez TensorFlow
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+# Lista plików wspólna z aplikacją (katalog nadrzędny)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Wynik jednego przebiegu inferencji: logity N x C, klasy N, ścieżki N, nazwy klas C
+EvalResults = namedtuple("EvalResults", ["logits", "classes", "filepaths", "labels"])
+
+TOP_K = (1, 3, 5)
+CALIBRATION_BINS = 15
+
+
+# --- Jeden przebieg inferencji z cache ---
+
+def to_logits(outputs):
+    """Wyjścia modelu -> logity; prawdopodobieństwa (wiersze >= 0 sumujące się do 1) przez log."""
+    outputs = np.asarray(outputs, dtype=np.float32)
+    if outputs.min() >= 0 and np.allclose(outputs.sum(axis=1), 1.0, atol=1e-3):
+        return np.log(np.maximum(outputs, np.finfo(np.float32).tiny))
+    return outputs
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, logits=results.logits, classes=results.classes,
+             filepaths=np.asarray(results.filepaths, dtype=str), labels=np.asarray(results.labels, dtype=str))
+
+
+def load_results(path):
+    with np.load(path) as data:
+        return EvalResults(data["logits"], data["classes"], data["filepaths"].tolist(), data["labels"].tolist())
+
+
+def predict_logits(model, dataset, info, cache_path=None, refresh=False):
+    """Logity modelu dla zbioru (dataset bez tasowania, kolejność info.filepaths).
+
+    Gdy cache_path istnieje i dotyczy tych samych plików, model nie jest uruchamiany.
+    """
+    if cache_path and os.path.exists(cache_path) and not refresh:
+        cached = load_results(cache_path)
+        if cached.filepaths == list(info.filepaths):
+            return cached
+    labels = sorted(info.class_indices, key=info.class_indices.get)
+    results = EvalResults(to_logits(model.predict(dataset)), np.asarray(info.classes), list(info.filepaths), labels)
+    if cache_path:
+        save_results(results, cache_path)
+    return results
+
+
+def cache_path_for(model_path, filepaths, cache_dir):
+    """Plik cache zależny od pliku modelu (rozmiar, czas modyfikacji) i listy plików testowych."""
+    stat = os.stat(model_path)
+    digest = hashlib.sha256(f"{os.path.abspath(model_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    for path in filepaths:
+        digest.update(path.encode())
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"logits_{name}_{digest.hexdigest()[:12]}.npz")
+
+
+# --- Metryki ---
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def top_k_accuracy(logits, classes, k):
+    k = min(k, logits.shape[1])
+    top = np.argpartition(-logits, k - 1, axis=1)[:, :k]
+    return float(np.mean((top == classes[:, None]).any(axis=1)))
+
+
+def confusion(classes, predicted, num_classes):
+    """Macierz pomyłek: wiersz - prawdziwa klasa, kolumna - przewidziana."""
+    return np.bincount(classes * num_classes + predicted, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+
+
+def calibration(probs, classes, bins=CALIBRATION_BINS):
+    """ECE / MCE na pewności top-1 oraz dane wykresu niezawodności (dokładność i pewność w przedziałach)."""
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == classes
+    idx = np.minimum((confidence * bins).astype(int), bins - 1)
+    counts = np.bincount(idx, minlength=bins)
+    nonempty = counts > 0
+    bin_accuracy = np.bincount(idx, weights=correct, minlength=bins)[nonempty] / counts[nonempty]
+    bin_confidence = np.bincount(idx, weights=confidence, minlength=bins)[nonempty] / counts[nonempty]
+    gaps = np.abs(bin_accuracy - bin_confidence)
+    return {
+        "ece": float(np.sum(gaps * counts[nonempty]) / len(probs)),
+        "mce": float(gaps.max()) if len(gaps) else 0.0,
+        "reliability": {"bin_upper": (np.flatnonzero(nonempty) + 1) / bins, "accuracy": bin_accuracy,
+                        "confidence": bin_confidence, "count": counts[nonempty]},
+    }
+
+
+def compute_metrics(results, top_k=TOP_K, bins=CALIBRATION_BINS):
+    """Wszystkie metryki z logitów jednego modelu."""
+    logits, classes = results.logits, np.asarray(results.classes)
+    num_classes = logits.shape[1]
+    probs = softmax(logits)
+    predicted = logits.argmax(axis=1)
+
+    cm = confusion(classes, predicted, num_classes)
+    tp = np.diag(cm)
+    support, predicted_count = cm.sum(axis=1), cm.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted_count > 0, tp / predicted_count, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    true_probs = probs[np.arange(len(classes)), classes]
+    onehot = np.zeros_like(probs)
+    onehot[np.arange(len(classes)), classes] = 1.0
+    metrics = {
+        "samples": int(len(classes)),
+        "accuracy": float(np.mean(predicted == classes)),
+        **{f"top{k}_accuracy": top_k_accuracy(logits, classes, k) for k in top_k},
+        "macro_precision": float(precision[support > 0].mean()),
+        "macro_recall": float(recall[support > 0].mean()),
+        "macro_f1": float(f1[support > 0].mean()),
+        "nll": float(-np.mean(np.log(np.maximum(true_probs, np.finfo(np.float32).tiny)))),
+        "brier": float(np.mean(np.sum((probs - onehot) ** 2, axis=1))),
+    }
+    metrics.update(calibration(probs, classes, bins))
+    metrics["per_class"] = {"precision": precision, "recall": recall, "f1": f1, "support": support,
+                            "errors": support - tp}
+    metrics["confusion_matrix"] = cm
+    return metrics
+
+
+# --- Raporty ---
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {key: _jsonable(v) for key, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def write_report(results, output_dir, name, metrics=None):
+    """CSV błędów na klasę i błędnych predykcji oraz metrics_<nazwa>.json; zwraca metryki."""
+    metrics = metrics or compute_metrics(results)
+    os.makedirs(output_dir, exist_ok=True)
+    per_class = metrics["per_class"]
+    labels = results.labels
+
+    # Gatunki od najczęściej mylonych (kolumny species, errors jak w dotychczasowych raportach)
+    order = np.argsort(-per_class["errors"], kind="stable")
+    with open(os.path.join(output_dir, f'errors_per_class_{name}.csv'), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["species", "errors", "support", "precision", "recall", "f1"])
+        for i in order:
+            writer.writerow([labels[i], int(per_class["errors"][i]), int(per_class["support"][i]),
+                             f"{per_class['precision'][i]:.4f}", f"{per_class['recall'][i]:.4f}", f"{per_class['f1'][i]:.4f}"])
+
+    probs = softmax(results.logits)
+    classes = np.asarray(results.classes)
+    predicted = probs.argmax(axis=1)
+    mistakes = np.flatnonzero(predicted != classes)
+    with open(os.path.join(output_dir, f'test_errors_only_{name}.csv'), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file_path", "true_class", "pred_class", "true_label", "pred_label", "pred_prob", "true_prob"])
+        for i in mistakes:
+            writer.writerow([results.filepaths[i], int(classes[i]), int(predicted[i]), labels[classes[i]],
+                             labels[predicted[i]], f"{probs[i, predicted[i]]:.4f}", f"{probs[i, classes[i]]:.4f}"])
+
+    with open(os.path.join(output_dir, f'metrics_{name}.json'), "w", encoding="utf-8") as f:
+        json.dump(_jsonable({key: value for key, value in metrics.items() if key != "confusion_matrix"}), f, indent=2)
+    np.save(os.path.join(output_dir, f'confusion_matrix_{name}.npy'), metrics["confusion_matrix"])
+    return metrics
+
+
+def print_summary(metrics, name):
+    print(f"\n✅ {name}: accuracy {metrics['accuracy']:.4f}, top-3 {metrics['top3_accuracy']:.4f}, "
+          f"macro F1 {metrics['macro_f1']:.4f}, ECE {metrics['ece']:.4f}")
+
+
+# --- Porównanie modeli ---
+
+def compare_models(named_results):
+    """Metryki wielu modeli (nazwa -> EvalResults na tych samych plikach) i zgodność ich predykcji."""
+    names = list(named_results)
+    reference = named_results[names[0]].filepaths
+    for name in names[1:]:
+        if named_results[name].filepaths != reference:
+            raise ValueError(f"{name} was evaluated on different files than {names[0]}")
+
+    metrics = {name: compute_metrics(results) for name, results in named_results.items()}
+    correct = {name: np.argmax(r.logits, axis=1) == np.asarray(r.classes) for name, r in named_results.items()}
+    pairs = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            pairs.append({
+                "models": (a, b),
+                # Zdjęcia, które rozpoznał tylko jeden z modeli (tabela McNemara) i oba błędnie
+                "only_first_correct": int(np.sum(correct[a] & ~correct[b])),
+                "only_second_correct": int(np.sum(~correct[a] & correct[b])),
+                "both_wrong": int(np.sum(~correct[a] & ~correct[b])),
+                "disagreement": float(np.mean(named_results[a].logits.argmax(1) != named_results[b].logits.argmax(1))),
+            })
+    return metrics, pairs
+
+
+def print_comparison(metrics, pairs):
+    print(f"\n{'model':<28} {'acc':>7} {'top-3':>7} {'top-5':>7} {'macroF1':>8} {'ECE':>7} {'NLL':>7} {'Brier':>7}")
+    for name, m in metrics.items():
+        print(f"{name[:28]:<28} {m['accuracy']:>7.2%} {m['top3_accuracy']:>7.2%} {m['top5_accuracy']:>7.2%} "
+              f"{m['macro_f1']:>8.4f} {m['ece']:>7.4f} {m['nll']:>7.3f} {m['brier']:>7.4f}")
+    for p in pairs:
+        a, b = p["models"]
+        print(f"{a} vs {b}: only {a} correct {p['only_first_correct']}, only {b} correct {p['only_second_correct']}, "
+              f"both wrong {p['both_wrong']}, disagreement {p['disagreement']:.2%}")
+
+
+def evaluate_artifact(model_path, test_path, cache_dir, batch_size=32, preprocessing="auto"):
+    """Logity zapisanego modelu (.h5) - z cache albo z jednego przebiegu po zbiorze testowym."""
+    from shards import list_split_files
+
+    filepaths, _, _ = list_split_files(test_path)
+    cache_path = cache_path_for(model_path, filepaths, cache_dir)
+    if os.path.exists(cache_path):
+        return load_results(cache_path)
+
+    import tensorflow as tf
+    from data_pipeline import make_dataset
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    size = tuple(model.input_shape[1:3])
+    if preprocessing == "auto":
+        # Model autorski: 224x224, piksele [0, 1]; InceptionV3 i student: 299x299, [-1, 1]
+        preprocessing = "inception" if size == (299, 299) else "scratch"
+    dataset, info = make_dataset(test_path, target_size=size, batch_size=batch_size,
+                                 training=False, preprocessing=preprocessing)
+    return predict_logits(model, dataset, info, cache_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate and compare models from one cached inference pass each")
+    parser.add_argument("--models", nargs="*", default=[], help="saved models (.h5) to evaluate")
+    parser.add_argument("--logits", nargs="*", default=[], help="cached logits (.npz) to include without a model")
+    parser.add_argument("--test-path", help="test split (needed with --models)")
+    parser.add_argument("--cache-dir", default="eval_cache")
+    parser.add_argument("--output-dir", help="write per-model CSV/JSON reports here")
+    parser.add_argument("--preprocessing", choices=["auto", "inception", "scratch"], default="auto")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", help="write the comparison as JSON")
+    args = parser.parse_args(argv)
+    if args.models and not args.test_path:
+        parser.error("--models needs --test-path")
+
+    named = {}
+    for path in args.models:
+        named[os.path.splitext(os.path.basename(path))[0]] = evaluate_artifact(
+            path, args.test_path, args.cache_dir, args.batch_size, args.preprocessing)
+    for path in args.logits:
+        named[os.path.splitext(os.path.basename(path))[0]] = load_results(path)
+    if not named:
+        parser.error("nothing to evaluate - pass --models and/or --logits")
+
+    metrics, pairs = compare_models(named)
+    print_comparison(metrics, pairs)
+    if args.output_dir:
+        for name, results in named.items():
+            write_report(results, args.output_dir, name, metrics[name])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(_jsonable({"metrics": {name: {k: v for k, v in m.items() if k != "confusion_matrix"}
+                                             for name, m in metrics.items()}, "pairs": pairs}), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+SPAKOWANE ZBIORY ZDJĘĆ: ZDEKODOWANE I PRZESKALOWANE PIKSELE uint8 W SHARDACH .npy
+        Paweł Grygielski(121678)
+
+Bez shardów każda epoka (do 300) dekoduje i skaluje od nowa każdy JPEG zbioru.
+Tutaj zbiór jest dekodowany raz - tym samym decode_image co w data_pipeline.py (resize
+'nearest', jak flow_from_directory) - do plików images-00000.npy (shard_size x H x W x 3, uint8),
+czytanych potem przez mmap. Katalog shardów:
+- images-*.npy - piksele w kolejności flow_from_directory,
+- labels.npy - indeks klasy każdego zdjęcia (int32),
+- index.json - rozdzielczość, nazwy klas (kolejność class_indices), ścieżki względne
+  i katalog źródłowy (raporty CSV nadal wskazują oryginalne zdjęcia); zapisywany na końcu.
+
+Katalog shardów podaje się zamiast katalogu zbioru (--train-path / --test-path),
+make_dataset w data_pipeline.py rozpoznaje go po index.json.
+
+    python shards.py --split-dir /data/CNN_project/Species --out /data/shards --target-sizes 299 224
+    python CNN_model_inception.py --train-path /data/shards/Species_299 --test-path /data/shards/test_299
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Wspólna lista plików z aplikacją (katalog nadrzędny)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from preprocessing import list_image_files
+
+FORMAT_VERSION = 1
+INDEX_FILE = "index.json"
+# Pliki, które zapisuje build_shards - tylko katalog złożony z nich może zostać nadpisany
+SHARD_FILE = re.compile(r"^(images-\d{5}\.npy|labels\.npy|index\.json)$")
+
+
+def is_shard_dir(path):
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+def load_index(shard_dir):
+    with open(os.path.join(shard_dir, INDEX_FILE), encoding="utf-8") as f:
+        index = json.load(f)
+    if index.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{shard_dir}: unsupported shard format {index.get('format_version')}")
+    return index
+
+
+def list_split_files(split_dir):
+    """(ścieżki, indeksy klas, nazwy klas) z katalogu zdjęć albo z katalogu shardów.
+
+    Dla shardów ścieżki wskazują oryginalne zdjęcia, więc są takie same jak przy czytaniu JPEG-ów.
+    """
+    if not is_shard_dir(split_dir):
+        return list_image_files(split_dir)
+    index = load_index(split_dir)
+    filepaths = [os.path.join(index["source_dir"], name) for name in index["filenames"]]
+    classes = np.load(os.path.join(split_dir, "labels.npy")).astype(np.int64)
+    return filepaths, classes, index["class_names"]
+
+
+class ShardReader:
+    """Shardy zbioru mapowane w pamięci; gather() składa batch z dowolnych indeksów zdjęć."""
+
+    def __init__(self, shard_dir):
+        self.index = load_index(shard_dir)
+        self.shard_size = self.index["shard_size"]
+        self.target_size = tuple(self.index["target_size"])
+        self.shards = [np.load(os.path.join(shard_dir, name), mmap_mode="r") for name in self.index["shards"]]
+        self.labels = np.load(os.path.join(shard_dir, "labels.npy"))
+        self.samples = len(self.labels)
+
+    def gather(self, indices):
+        """(obrazy uint8 N x H x W x 3, etykiety int32) dla indeksów zdjęć w kolejności indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        images = np.empty((len(indices), *self.target_size, 3), dtype=np.uint8)
+        shard_ids, rows = np.divmod(indices, self.shard_size)
+        for shard in np.unique(shard_ids):
+            mask = shard_ids == shard
+            images[mask] = self.shards[shard][rows[mask]]
+        return images, self.labels[indices]
+
+
+def prepare_out_dir(out_dir):
+    """Pusty katalog wyjściowy; usuwa tylko poprzednie shardy (także niedokończone), nie inne katalogi."""
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+        return
+    names = os.listdir(out_dir)
+    if not names:
+        return
+    if not all(SHARD_FILE.match(name) and os.path.isfile(os.path.join(out_dir, name)) for name in names):
+        raise ValueError(f"{out_dir} is not empty and does not look like a shard directory - refusing to overwrite it")
+    shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+
+def build_shards(split_dir, out_dir, target_size, shard_size=1024, batch_size=64):
+    """Dekoduje zbiór raz i zapisuje shardy; zwraca (liczba zdjęć, rozmiar na dysku w bajtach)."""
+    import tensorflow as tf
+    from data_pipeline import AUTOTUNE, decode_image
+
+    filepaths, classes, class_names = list_image_files(split_dir)
+    prepare_out_dir(out_dir)
+
+    dataset = tf.data.Dataset.from_tensor_slices(filepaths)
+    dataset = dataset.map(lambda path: decode_image(path, target_size), num_parallel_calls=AUTOTUNE)
+    dataset = dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+    names, shard, offset = [], None, 0
+    for images in dataset:
+        images = images.numpy()
+        while len(images):
+            if shard is None or offset == len(shard):
+                if shard is not None:
+                    shard.flush()
+                count = min(shard_size, len(filepaths) - len(names) * shard_size)
+                names.append(f"images-{len(names):05d}.npy")
+                shard = np.lib.format.open_memmap(os.path.join(out_dir, names[-1]), mode="w+",
+                                                  dtype=np.uint8, shape=(count, *target_size, 3))
+                offset = 0
+            take = min(len(images), len(shard) - offset)
+            shard[offset:offset + take] = images[:take]
+            offset += take
+            images = images[take:]
+    if shard is not None:
+        shard.flush()
+        del shard
+
+    np.save(os.path.join(out_dir, "labels.npy"), classes.astype(np.int32))
+    index = {
+        "format_version": FORMAT_VERSION,
+        "target_size": list(target_size),
+        "shard_size": shard_size,
+        "shards": names,
+        "class_names": class_names,
+        "source_dir": os.path.abspath(split_dir),
+        "filenames": [os.path.relpath(p, split_dir) for p in filepaths],
+    }
+    # index.json na końcu - przerwany build nie jest rozpoznawany jako katalog shardów
+    with open(os.path.join(out_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+    return len(filepaths), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack an image split into pre-decoded uint8 shards")
+    parser.add_argument("--split-dir", required=True, help="split with class subfolders (e.g. Species or test)")
+    parser.add_argument("--out", required=True, help="parent directory; shards go to <out>/<split>_<size>")
+    parser.add_argument("--target-sizes", type=int, nargs="+", default=[299, 224],
+                        help="299 for InceptionV3 and the student, 224 for the scratch model")
+    parser.add_argument("--shard-size", type=int, default=1024, help="images per shard file")
+    args = parser.parse_args()
+
+    split_name = os.path.basename(os.path.normpath(args.split_dir))
+    for size in args.target_sizes:
+        out_dir = os.path.join(args.out, f"{split_name}_{size}")
+        start = time.perf_counter()
+        count, nbytes = build_shards(args.split_dir, out_dir, (size, size), args.shard_size)
+        print(f"✅ {out_dir}: {count} images {size}x{size}, {nbytes / 2**30:.2f} GB, "
+              f"built in {time.perf_counter() - start:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
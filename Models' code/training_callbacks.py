@@ -0,0 +1,318 @@
+"""
+CALLBACKI TRENINGU: WZNAWIANIE, ZAPIS W TLE I PODZIAŁ CZASU KROKU
+        Paweł Grygielski(121678)
+
+- TrainingCheckpoint: co epokę model + optymalizator przez tf.train.CheckpointManager
+  (zapis asynchroniczny, jeśli wersja TF go obsługuje) oraz stan callbacków (liczniki
+  EarlyStopping / ReduceLROnPlateau, najlepszy wynik, najlepsze wagi), numer epoki i historia
+  w pliku state-<epoka>.json zapisywanym w wątku w tle. Po przerwaniu trening wznawia się
+  od ostatniej kompletnej epoki (fit(initial_epoch=...)), a ukończona faza jest pomijana,
+- AsyncModelCheckpoint: ModelCheckpoint(save_best_only=True) - kopia wag brana synchronicznie,
+  zapis .h5 przez osobny model-cień w wątku w tle, więc trening nie czeka na dysk,
+- StepTimer: co every-ty krok czas oczekiwania na batch (od początku kroku do chwili, gdy dane
+  są w grafie - tf.timestamp) i czas obliczeń; podsumowanie po każdej epoce, opcjonalnie do CSV.
+
+TrainingCheckpoint musi być ostatni na liście callbacków: Keras zeruje stan EarlyStopping
+i ReduceLROnPlateau w on_train_begin, a TrainingCheckpoint przywraca go po nich.
+"""
+
+import csv
+import glob
+import json
+import os
+import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import callbacks
+
+# Atrybuty callbacków zapisywane razem z checkpointem (pomijane, jeśli wersja Keras ich nie ma)
+CALLBACK_STATE = {
+    callbacks.EarlyStopping: ("wait", "stopped_epoch", "best", "best_epoch"),
+    callbacks.ReduceLROnPlateau: ("wait", "cooldown_counter", "best"),
+    callbacks.ModelCheckpoint: ("best",),
+}
+
+# Model -> zmienna ze znacznikami czasu kroku (poza atrybutami modelu, żeby nie trafiła do jego wag)
+_STEP_STAMPS = weakref.WeakKeyDictionary()
+
+
+def _state_attrs(callback):
+    if isinstance(callback, AsyncModelCheckpoint):
+        return ("best",)
+    for cls, attrs in CALLBACK_STATE.items():
+        if isinstance(callback, cls):
+            return attrs
+    return ()
+
+
+def _checkpoint_options():
+    """Zapis asynchroniczny (TF >= 2.10); starsze wersje - zwykły zapis."""
+    try:
+        return tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+    except TypeError:
+        return tf.train.CheckpointOptions()
+
+
+def _write_json(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, default=float)
+    os.replace(tmp, path)
+
+
+class TrainingCheckpoint(callbacks.Callback):
+    """Checkpoint fazy treningu (np. 'frozen', 'finetune') w katalogu <directory>/<phase>.
+
+    tracked: callbacki, których stan jest zapisywany i przywracany (ta sama lista co w fit).
+    save_directory: katalog zapisu, jeśli inny niż odczytu (workery inne niż chief przy
+    MultiWorkerMirroredStrategy - wznawiają ze wspólnego checkpointu, zapisują do katalogu tymczasowego).
+    Przed fit: initial_epoch - epoka, od której wznowić; completed - faza ukończona wcześniej
+    (wtedy restore_weights() wczytuje jej końcowe wagi i fit można pominąć).
+    """
+
+    def __init__(self, directory, phase, tracked=(), max_to_keep=2, save_directory=None):
+        super().__init__()
+        self.directory = os.path.join(directory, phase)
+        self.save_directory = os.path.join(save_directory or directory, phase)
+        self.phase = phase
+        self.tracked = list(tracked)
+        self.max_to_keep = max_to_keep
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._checkpoint = None
+        self._manager = None
+        self._best_weights = (None, None)  # (lista wag EarlyStopping, plik .npz)
+        self.state = self._latest_state()
+        self.history = {key: list(values) for key, values in (self.state or {}).get("history", {}).items()}
+
+    # --- Odczyt stanu ---
+
+    def _latest_state(self):
+        """Najnowszy stan, którego checkpoint został zapisany w całości (plik .index powstaje na końcu)."""
+        states = []
+        for path in glob.glob(os.path.join(self.directory, "state-*.json")):
+            epoch = int(re.search(r"state-(\d+)\.json$", path).group(1))
+            if os.path.exists(os.path.join(self.directory, f"ckpt-{epoch}.index")):
+                states.append((epoch, path))
+        if not states:
+            return None
+        with open(max(states)[1], encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def initial_epoch(self):
+        return self.state["epoch"] if self.state else 0
+
+    @property
+    def completed(self):
+        return bool(self.state and self.state.get("completed"))
+
+    def _make_checkpoint(self, model):
+        if self._checkpoint is None:
+            self._checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+            self._manager = tf.train.CheckpointManager(self._checkpoint, self.save_directory, self.max_to_keep)
+        return self._checkpoint
+
+    def restore_weights(self, model):
+        """Wagi modelu z ostatniego checkpointu fazy (bez optymalizatora) - np. dla ukończonej fazy."""
+        checkpoint = tf.train.Checkpoint(model=model)
+        checkpoint.restore(os.path.join(self.directory, f"ckpt-{self.state['epoch']}")).expect_partial()
+
+    # --- Zapis ---
+
+    def _save(self, epoch, completed=False):
+        """Model + optymalizator od razu (kopia zmiennych), pliki stanu w wątku w tle."""
+        os.makedirs(self.save_directory, exist_ok=True)
+        self._manager.save(checkpoint_number=epoch, options=_checkpoint_options())
+        state = {
+            "phase": self.phase,
+            "epoch": epoch,
+            "completed": completed,
+            "callbacks": [{attr: getattr(cb, attr) for attr in _state_attrs(cb) if hasattr(cb, attr)}
+                          for cb in self.tracked],
+            "history": {key: list(values) for key, values in self.history.items()},
+            "time": time.time(),
+        }
+        # Najlepsze wagi EarlyStopping (restore_best_weights) - nowy plik tylko po poprawie
+        best_weights = next((cb.best_weights for cb in self.tracked
+                             if isinstance(cb, callbacks.EarlyStopping) and getattr(cb, "best_weights", None)), None)
+        write_best = best_weights is not None and best_weights is not self._best_weights[0]
+        if write_best:
+            self._best_weights = (best_weights, f"best_weights-{epoch}.npz")
+        state["best_weights"] = self._best_weights[1]
+        self._executor.submit(self._write_state, epoch, state, best_weights if write_best else None)
+
+    def _write_state(self, epoch, state, best_weights):
+        sync = getattr(self._checkpoint, "sync", None)
+        if sync is not None:
+            sync()  # koniec asynchronicznego zapisu zmiennych
+        if best_weights is not None:
+            np.savez(os.path.join(self.save_directory, state["best_weights"]), *best_weights)
+        _write_json(os.path.join(self.save_directory, f"state-{epoch}.json"), state)
+        # Stany i najlepsze wagi bez checkpointu (usuniętego przez max_to_keep)
+        kept = {int(re.search(r"ckpt-(\d+)$", path).group(1)) for path in self._manager.checkpoints}
+        for path in glob.glob(os.path.join(self.save_directory, "state-*.json")):
+            if int(re.search(r"state-(\d+)\.json$", path).group(1)) not in kept:
+                os.remove(path)
+        for path in glob.glob(os.path.join(self.save_directory, "best_weights-*.npz")):
+            if os.path.basename(path) != state["best_weights"]:
+                os.remove(path)
+
+    # --- Callback ---
+
+    def on_train_begin(self, logs=None):
+        checkpoint = self._make_checkpoint(self.model)
+        if not self.state:
+            return
+        checkpoint.restore(os.path.join(self.directory, f"ckpt-{self.state['epoch']}"))
+        for cb, values in zip(self.tracked, self.state["callbacks"]):
+            for attr, value in values.items():
+                setattr(cb, attr, value)
+        if self.state.get("best_weights"):
+            with np.load(os.path.join(self.directory, self.state["best_weights"])) as data:
+                best_weights = [data[f"arr_{i}"] for i in range(len(data.files))]
+            for cb in self.tracked:
+                if isinstance(cb, callbacks.EarlyStopping):
+                    cb.best_weights = best_weights
+            self._best_weights = (best_weights, self.state["best_weights"])
+        print(f"♻️ Wznowienie fazy '{self.phase}' od epoki {self.state['epoch']}")
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        self._save(epoch + 1)
+
+    def on_train_end(self, logs=None):
+        # Po EarlyStopping.on_train_end (przywrócone najlepsze wagi) - końcowy stan fazy
+        epochs = len(next(iter(self.history.values()), []))
+        self._save(epochs, completed=True)
+        self._executor.shutdown(wait=True)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def history_callback(self):
+        """Obiekt History z epokami wszystkich przebiegów tej fazy (także sprzed wznowienia)."""
+        history = callbacks.History()
+        history.history = self.history
+        return history
+
+
+class AsyncModelCheckpoint(callbacks.Callback):
+    """Najlepszy model (najmniejszy monitor) do .h5 bez zatrzymywania treningu na czas zapisu."""
+
+    def __init__(self, filepath, monitor='val_loss', verbose=0):
+        super().__init__()
+        self.filepath = filepath
+        self.monitor = monitor
+        self.verbose = verbose
+        self.best = np.inf
+        self._shadow = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def on_train_begin(self, logs=None):
+        if self._shadow is None:
+            # Model-cień z tą samą architekturą: wątek w tle zapisuje jego wagi, nie trenowane zmienne
+            self._shadow = tf.keras.models.clone_model(self.model)
+
+    def on_epoch_end(self, epoch, logs=None):
+        current = (logs or {}).get(self.monitor)
+        # np.less jak w ModelCheckpoint - NaN nigdy nie jest "lepszy"
+        if current is None or not np.less(current, self.best):
+            return
+        if self.verbose:
+            print(f"\nEpoch {epoch + 1}: {self.monitor} improved from {self.best:.5f} to {current:.5f}, "
+                  f"saving model to {self.filepath} (in background)")
+        self.best = float(current)
+        self._executor.submit(self._write, self.model.get_weights())
+
+    def _write(self, weights):
+        self._shadow.set_weights(weights)
+        self._shadow.save(self.filepath, include_optimizer=False)
+
+    def on_train_end(self, logs=None):
+        self._executor.shutdown(wait=True)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+
+class StepTimer(callbacks.Callback):
+    """Podział czasu kroku treningu: oczekiwanie na dane wejściowe vs obliczenia.
+
+    train_step modelu jest owijany tak, że zapisuje tf.timestamp() po otrzymaniu batcha
+    i po aktualizacji wag; co every-ty krok te znaczniki są porównywane z czasem rozpoczęcia
+    kroku po stronie Pythona. Udział oczekiwania powyżej input_bound oznacza, że model czeka na potok danych.
+    """
+
+    def __init__(self, every=10, csv_path=None, input_bound=0.2):
+        super().__init__()
+        self.every = every
+        self.csv_path = csv_path
+        self.input_bound = input_bound
+        self._stamps = None
+        self._samples = []
+        self._begin = None
+        self._first_step = True
+
+    def set_model(self, model):
+        super().set_model(model)
+        if model not in _STEP_STAMPS:
+            with model.distribute_strategy.scope():
+                # ON_READ: każda replika zapisuje własną kopię, odczyt zwraca kopię pierwszej repliki
+                stamps = tf.Variable(tf.zeros([2], tf.float64), trainable=False,
+                                     synchronization=tf.VariableSynchronization.ON_READ,
+                                     aggregation=tf.VariableAggregation.ONLY_FIRST_REPLICA)
+            original = model.train_step
+
+            def train_step(data):
+                with tf.control_dependencies([t for t in tf.nest.flatten(data) if t is not None]):
+                    ready = tf.timestamp()
+                # Krok zależy od znacznika - inaczej graf może wykonać tf.timestamp() dopiero po obliczeniach
+                with tf.control_dependencies([ready]):
+                    data = tf.nest.map_structure(lambda t: t if t is None else tf.identity(t), data)
+                logs = original(data)
+                with tf.control_dependencies(tf.nest.flatten(logs)):
+                    done = tf.timestamp()
+                stamps.assign(tf.stack([ready, done]))
+                return logs
+
+            model.train_step = train_step
+            model.train_function = None  # fit zbuduje funkcję treningu od nowa, z owiniętym krokiem
+            _STEP_STAMPS[model] = stamps
+        self._stamps = _STEP_STAMPS[model]
+
+    def on_train_begin(self, logs=None):
+        self._first_step = True
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._samples = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        # Pierwszy krok fit zawiera trace funkcji treningu - pomijany
+        sample = batch % self.every == 0 and not self._first_step
+        self._first_step = False
+        self._begin = time.time() if sample else None
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self._begin is None:
+            return
+        end = time.time()
+        ready, done = self._stamps.numpy()
+        self._samples.append((end - self._begin, max(ready - self._begin, 0.0), max(done - ready, 0.0)))
+
+    def on_epoch_end(self, epoch, logs=None):
+        if not self._samples:
+            return
+        step, wait, compute = (np.mean(column) * 1000 for column in zip(*self._samples))
+        fraction = wait / step if step else 0.0
+        note = " - wąskie gardło: potok wejściowy" if fraction > self.input_bound else ""
+        print(f"⏱️ Epoka {epoch + 1}: krok {step:.1f} ms = dane {wait:.1f} ms ({fraction:.0%}) "
+              f"+ obliczenia {compute:.1f} ms ({len(self._samples)} próbek){note}")
+        if self.csv_path:
+            new_file = not os.path.exists(self.csv_path)
+            with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(["epoch", "samples", "step_ms", "input_wait_ms", "compute_ms", "input_fraction"])
+                writer.writerow([epoch + 1, len(self._samples), f"{step:.3f}", f"{wait:.3f}", f"{compute:.3f}",
+                                 f"{fraction:.4f}"])
@@ -1,46 +1,469 @@
 import streamlit as st
+import atexit
+import io
+import json
 import os
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
-from tensorflow.keras.applications.inception_v3 import preprocess_input
+import threading
+import time
 import numpy as np
-import gdown
+from backends import BACKEND_FILES, load_backend
+from cascade import CascadeClassifier
+from embedding_index import EmbeddingIndex
+from engine import PredictionEngine, set_tf_threads
+from metrics import REGISTRY as METRICS, SlowRequestProfiler, start_http_server
+from inference_server import MicroBatcher, RemoteClassifier
+from model_artifacts import ArtifactStore, direct_url
+from prediction_cache import PredictionCache, make_key
+from preprocessing import load_image, load_inception_input, preprocess_inception
+from species_index import SPECIES_UPDATE, get_species_index
+from tta import TTA_PRESETS, TTAViews, average_views
+from worker_pool import WorkerPool
 
 # Ścieżki i link
 MODEL_DIR = "model"
-MODEL_PATH = os.path.join(MODEL_DIR, "model.h5")
-MODEL_URL = "https://drive.google.com/uc?export=download&id=19bxCSLca5ygQxnxHt5lsksQclXZ_Ed-S"  # link gdrive
-
-# Pełna lista etykiet klas
-class_labels = ["Acanthoscurria geniculata", "Amazonius germani", "Aphonopelma seemanni", "Augcephalus", "Avicularia avicularia", "Avicularia juruensis", "Avicularia minatrix", "Avicularia purpurea", 
-                "Birupes simoroxigorum", "Brachypelma albiceps", "Brachypelma auratum", "Brachypelma baumgarteni", "Brachypelma boehmei", "Brachypelma emilia", "Brachypelma hamorii or smithi", 
-                "Brachypelma klaasi", "Bumba horrida or tapajos", "Caribena laeta", "Caribena versicolor", "Ceratogyrus brachycephalus", "Ceratogyrus darlingi", "Ceratogyrus marshalli", 
-                "Ceratogyrus meridionalis", "Ceratogyrus sanderi", "Chilobrachys dyscolus", "Chilobrachys fimbriatus", "Chilobrachys huahini", "Chilobrachys natanicharum", "Chromatopelma cyaneopubescens", 
-                "Cilantica devamatha", "Citharacanthus cyaneus", "Cyriocosmus aueri or bertae", "Cyriocosmus bicolor", "Cyriocosmus elegans", "Cyriocosmus leetzi", "Cyriocosmus perezmilesi", "Cyriocosmus ritae", 
-                "Cyriopagopus albostriatus", "Cyriopagopus hainanus", "Cyriopagopus lividus", "Cyriopagopus schmidti", "Davus pentaloris", "Dolichothele diamantinensis", 
-                "Encyocratella olivacea", "Ephebopus cyanognathus", "Ephebopus murinus", "Eucratoscelus pachypus", "Grammostola iheringi", "Grammostola pulchra", "Grammostola pulchripes", 
-                "Grammostola rosea", "Hapalopus formosus", "Haplocosmia himalayana", "Harpactira cafreriana", "Harpactira pulchripes", "Heteroscodra maculata", "Heterothele gabonensis", "Holothele longipes", 
-                "Homoeomma", "Hysterocrates gigas", "Idiothele mira", "Kochiana brunnipes", "Lampropelma nigerrimum or Phormingochilus arboricola", "Lasiocyano sazimai", "Lasiodora", "Megaphobema robustum", 
-                "Monocentropus balfouri", "Neoholothele incei", "Nhandu coloratovillosus", "Nhandu tripepii", "Omothymus schioedtei", "Omothymus violaceopes", "Ornithoctonus aureotibialis", 
-                "Pamphobeteus antinous", "Pamphobeteus ultramarinus", "Pelinobus muticus", "Phormictopus auratus", "Phormingochilus everetti", "Poecilotheria", "Poecilotheria formosa", 
-                "Poecilotheria metallica", "Poecilotheria ornata", "Poecilotheria rufilata", "Poecilotheria subfusca", "Psalmopoeus cambridgei", "Psalmopoeus irminia", "Psalmopoeus pulcher", 
-                "Psalmopoeus reduncus", "Psalmopoeus victori", "Pterinochilus lugardi", "Pterinochilus murinus", "Selenobrachys philippinus", "Stromatopelma calceatum", "Tapinauchenius plumipes", "Theraphosa", 
-                "Thrixopelma ockerti", "Tliltocatl albopilosus", "Tliltocatl vagans or kahlenbergi", "Typhochlaena seladonia", "Vitalius chromatus", "Xenesthis immanis"]
 
+# Modele do wyboru zmienną MODEL_NAME: plik .h5, link do pobrania (None - plik trzeba dostarczyć)
+# i domyślna wersja. "distilled" to student z Models' code/CNN_model_distilled.py, "pruned" - wynik
+# Models' code/compress_model.py; oba mają to samo wejście 299x299.
+MODELS = {
+    "inception": (os.path.join(MODEL_DIR, "model.h5"),
+                  "https://drive.google.com/uc?export=download&id=19bxCSLca5ygQxnxHt5lsksQclXZ_Ed-S",  # link gdrive
+                  "inception-finetuned-1"),
+    "distilled": (os.path.join(MODEL_DIR, "model_distilled.h5"), None, "distilled-1"),
+    "pruned": (os.path.join(MODEL_DIR, "model_pruned.h5"), None, "pruned-1"),
+}
+MODEL_NAME = os.environ.get("MODEL_NAME", "inception")
+if MODEL_NAME not in MODELS:
+    raise ValueError(f"Unknown MODEL_NAME '{MODEL_NAME}' (available: {', '.join(MODELS)})")
+MODEL_PATH, MODEL_URL, _default_version = MODELS[MODEL_NAME]
+# SPECIES_UPDATE: katalog z Models' code/add_species.py - model z dodanymi gatunkami (model.h5, eksporty
+# export_model.py --out-dir) i jego species_list.txt; zastępuje model wybrany przez MODEL_NAME
+MODEL_FILES_DIR = MODEL_DIR
+if SPECIES_UPDATE:
+    with open(os.path.join(SPECIES_UPDATE, "update.json"), encoding="utf-8") as f:
+        _default_version = json.load(f)["version"]
+    MODEL_PATH, MODEL_URL, MODEL_FILES_DIR = os.path.join(SPECIES_UPDATE, "model.h5"), None, SPECIES_UPDATE
+# Wersja modelu - część klucza cache predykcji; zmiana modelu musi zmienić wersję
+MODEL_VERSION = os.environ.get("MODEL_VERSION", _default_version)
+
+# Cache pobranych modeli: <MODEL_CACHE_DIR>/<MODEL_VERSION>/model.h5, współdzielony przez repliki
+# (np. wolumen montowany w kontenerach); MODEL_SHA256 - oczekiwana suma pobieranego pliku
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.join(MODEL_DIR, "cache"))
+MODEL_SHA256 = os.environ.get("MODEL_SHA256")
+artifact_store = ArtifactStore(MODEL_CACHE_DIR)
+
+# Adres serwera inferencji (inference_server.py); bez niego predykcje batchuje lokalny MicroBatcher
+INFERENCE_SERVER_URL = os.environ.get("INFERENCE_SERVER_URL")
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 32))
+MAX_WAIT_MS = float(os.environ.get("MAX_WAIT_MS", 5))
+
+# INFERENCE_WORKERS=N: model działa w N procesach przypiętych do rozłącznych rdzeni (worker_pool.py),
+# każdy z WORKER_INTRA_OP_THREADS (domyślnie liczba jego rdzeni) i WORKER_INTER_OP_THREADS wątkami
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))
+WORKER_INTRA_OP_THREADS = int(os.environ.get("WORKER_INTRA_OP_THREADS", 0)) or None
+WORKER_INTER_OP_THREADS = int(os.environ.get("WORKER_INTER_OP_THREADS", 1))
+
+# Kompilacja XLA (JIT) ścieżki predykcji - włączana zmienną środowiskową TF_XLA_JIT=1
+XLA_JIT = os.environ.get("TF_XLA_JIT", "0") == "1"
+
+# Backend inferencji: "keras" (model.h5 przez TensorFlow) albo model wyeksportowany przez
+# export_model.py ("tflite-fp16", "tflite-int8", "onnx") - te działają bez importu TensorFlow.
+# "savedmodel" i "keras-mmap" to ten sam model przez TensorFlow, ale bez h5py; przy "keras-mmap"
+# procesy na jednym hoście współdzielą strony wag (flat_weights.py)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "keras")
+
+# Ładowanie modelu w tle już przy starcie aplikacji (PRELOAD_MODEL=0 - dopiero na stronie predykcji)
+PRELOAD_MODEL = os.environ.get("PRELOAD_MODEL", "1") == "1"
+
+# Cache predykcji: liczba wpisów w pamięci i opcjonalny plik SQLite przetrwający restart
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 256))
+PREDICTION_CACHE_DB = os.environ.get("PREDICTION_CACHE_DB")
+
+# Liczba najbardziej prawdopodobnych gatunków pokazywanych pod wynikiem
+TOP_K = int(os.environ.get("TOP_K", 3))
+
+# Test-time augmentation: liczba widoków (tta.TTA_PRESETS) i domyślny stan przełącznika na stronie predykcji
+TTA_VIEWS = int(os.environ.get("TTA_VIEWS", 6))
+if TTA_VIEWS not in TTA_PRESETS:
+    raise ValueError(f"Unsupported TTA_VIEWS={TTA_VIEWS} (available: {', '.join(map(str, sorted(TTA_PRESETS)))})")
+TTA_DEFAULT = os.environ.get("TTA", "0") == "1"
+
+# Kaskada (CASCADE=1): model autorski 224x224 odpowiada sam, gdy jest pewny - progi z calibrate_cascade.py
+CASCADE = os.environ.get("CASCADE", "0") == "1"
+SCRATCH_MODEL_PATH = os.environ.get("SCRATCH_MODEL_PATH", os.path.join(MODEL_DIR, "model_scratch.h5"))
+CASCADE_THRESHOLDS = os.environ.get("CASCADE_THRESHOLDS", os.path.join(MODEL_DIR, "cascade.json"))
+SCRATCH_INPUT_SHAPE = (224, 224, 3)
+
+# Indeks embeddingów zdjęć treningowych (build_embedding_index.py): podobne zdjęcia referencyjne
+# i flaga "spoza listy gatunków"; działa z modelem Keras w tym procesie (keras / keras-mmap)
+EMBEDDING_INDEX = os.environ.get("EMBEDDING_INDEX", os.path.join(MODEL_DIR, "embeddings"))
+NEIGHBOURS_K = int(os.environ.get("NEIGHBOURS_K", 4))
+
+# Metryki etapów predykcji (metrics.py): METRICS_PORT > 0 - endpoint /metrics (Prometheus) i /slow
+# na METRICS_HOST (domyślnie 127.0.0.1; 0.0.0.0 tylko za siecią, do której nie ma dostępu z zewnątrz),
+# PROFILE_SLOW_MS > 0 - próbkowanie stosu żądań i zapis tych dłuższych od progu, ADMIN_PAGE=1 - strona "Metrics"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 10))
+ADMIN_PAGE = os.environ.get("ADMIN_PAGE", "0") == "1"
+
+# Etykiety klas, rodzaje i linki - indeks budowany raz z species_list.txt
+species_index = get_species_index()
+class_labels = species_index.labels.tolist()
+
+@METRICS.timed("model_download")
 def download_model():
-    """Pobiera model, jeśli jeszcze go nie ma."""
-    if not os.path.exists(MODEL_PATH):
-        os.makedirs(MODEL_DIR, exist_ok=True)
-        with st.spinner('📥 Pobieranie modelu...'):
-            gdown.download(MODEL_URL, MODEL_PATH, quiet=True)
-
-@st.cache_resource  # tymczasowo zakomentowane
-def load_trained_model():
-    download_model()
+    """Zwraca ścieżkę modelu - z cache wersji albo pobranego (weryfikacja, wznawianie, blokada replik)."""
+    if MODEL_URL is None:
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"{MODEL_PATH} not found - copy the trained '{MODEL_NAME}' model there")
+        return MODEL_PATH
+    artifact = artifact_store.fetch(direct_url(MODEL_URL), MODEL_VERSION, os.path.basename(MODEL_PATH), MODEL_SHA256)
+    return artifact.path
+
+@METRICS.timed("model_load")
+def load_trained_model(progress=None, num_threads=None, inter_op_threads=None):
+    """Wczytuje wybrany backend; progress(etap) raportuje kolejne etapy ładowania.
+
+    num_threads / inter_op_threads: wątki intra-op / inter-op (backendy bez TF - tylko num_threads).
+    """
+    progress = progress or (lambda stage: None)
+    if MODEL_BACKEND != "keras":
+        if MODEL_BACKEND not in BACKEND_FILES:
+            raise ValueError(f"Unknown MODEL_BACKEND '{MODEL_BACKEND}'")
+        backend_path = os.path.join(MODEL_FILES_DIR, BACKEND_FILES[MODEL_BACKEND])
+        if not os.path.exists(backend_path):
+            raise FileNotFoundError(f"{backend_path} not found - run export_model.py first")
+        progress("loading")
+        if MODEL_BACKEND not in TF_EXPORT_LOADERS:
+            return load_backend(MODEL_BACKEND, backend_path, num_threads)
+        set_tf_threads(num_threads, inter_op_threads)
+        engine = TF_EXPORT_LOADERS[MODEL_BACKEND](backend_path)
+        progress("warming up")
+        engine.warmup()
+        return engine
+
+    progress("downloading")
+    model_path = download_model()
+    progress("loading")
+    set_tf_threads(num_threads, inter_op_threads)
     from tensorflow.keras.models import load_model
-    return load_model(MODEL_PATH)
+    engine = PredictionEngine(load_model(model_path), jit_compile=XLA_JIT)
+    progress("warming up")
+    engine.warmup()
+    return engine
+
+def load_saved_model(path):
+    """SavedModel z export_model.py - sygnatura serving_default bez odtwarzania obiektów Keras."""
+    import tensorflow as tf
+
+    loaded = tf.saved_model.load(path)  # referencja trzyma przy życiu zmienne sygnatury
+    serve = loaded.signatures["serving_default"]
+    return PredictionEngine(lambda x, training=False, _loaded=loaded: serve(input=x)["output"], jit_compile=XLA_JIT)
+
+def load_mmap_model(path):
+    """Płaskie wagi z export_model.py: stałe tensory nad plikiem .bin zmapowanym tylko do odczytu."""
+    from flat_weights import load_flat_model
+
+    model, _ = load_flat_model(path)
+    return PredictionEngine(model, jit_compile=XLA_JIT)
+
+# Eksporty ładowane przez TensorFlow (pozostałe backendy - backends.load_backend)
+TF_EXPORT_LOADERS = {"savedmodel": load_saved_model, "keras-mmap": load_mmap_model}
+
+def load_scratch_model(path=SCRATCH_MODEL_PATH):
+    """Model autorski (CNN_model_autorski.py, wejście 224x224) - pierwszy stopień kaskady."""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"{path} not found - set SCRATCH_MODEL_PATH to model_final.h5 from CNN_model_autorski.py")
+    from tensorflow.keras.models import load_model
+    engine = PredictionEngine(load_model(path), jit_compile=XLA_JIT, input_shape=SCRATCH_INPUT_SHAPE)
+    engine.warmup()
+    return engine
+
+def start_worker_pool(progress=None):
+    """Pula procesów inferencji (INFERENCE_WORKERS) - każdy worker wczytuje model sam."""
+    if progress:
+        progress("loading")
+    pool = WorkerPool(INFERENCE_WORKERS, WORKER_INTRA_OP_THREADS, WORKER_INTER_OP_THREADS, MAX_BATCH_SIZE, MAX_WAIT_MS)
+    atexit.register(pool.close)
+    return pool
+
+class ModelLoader:
+    """Ładuje model w wątku w tle - strony bez predykcji nie czekają na TensorFlow.
+
+    load_fn(progress) zwraca obiekt z metodą predict - silnik modelu albo pulę workerów.
+    """
+
+    # Etap ładowania -> postęp wyświetlany na stronie predykcji
+    STAGES = {"queued": 0.05, "downloading": 0.2, "loading": 0.5, "warming up": 0.8, "ready": 1.0}
+
+    def __init__(self, load_fn=None):
+        self.load_fn = load_fn or load_trained_model
+        self.stage = "queued"
+        self.error = None
+        self.load_seconds = None
+        self._engine = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+                self._thread.start()
+
+    def _set_stage(self, stage):
+        self.stage = stage
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            self._engine = self.load_fn(self._set_stage)
+            self._set_stage("ready")
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def progress(self):
+        return self.STAGES.get(self.stage, 0.0)
+
+    def get(self, timeout=None):
+        """Zwraca silnik predykcji, w razie potrzeby czekając na koniec ładowania."""
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("model is still loading")
+        if self.error is not None:
+            raise self.error
+        return self._engine
 
-model = load_trained_model()
+@st.cache_resource
+def get_model_loader():
+    """Jeden loader na proces - współdzielony przez wszystkie sesje."""
+    return ModelLoader(start_worker_pool if INFERENCE_WORKERS else None)
+
+@st.cache_resource
+def get_classifier():
+    """Zwraca klienta serwera inferencji albo batcher współdzielony przez wszystkie sesje."""
+    if INFERENCE_SERVER_URL:
+        return RemoteClassifier(INFERENCE_SERVER_URL)
+    loader = get_model_loader()
+    if INFERENCE_WORKERS:
+        # Batchują workery - dispatcher rozdziela pojedyncze żądania między procesy
+        return loader.get()
+    return MicroBatcher(lambda batch: loader.get().predict(batch), MAX_BATCH_SIZE, MAX_WAIT_MS)
+
+@st.cache_resource
+def get_prediction_cache():
+    """Cache predykcji współdzielony przez wszystkie sesje."""
+    return PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DB)
+
+@st.cache_resource
+def get_cascade():
+    """Kaskada model autorski -> InceptionV3 (przez ten sam klasyfikator co bez kaskady)."""
+    scratch = load_scratch_model()
+    if scratch.model.output_shape[-1] != len(class_labels):
+        raise ValueError(f"CASCADE: the scratch model has {scratch.model.output_shape[-1]} classes, "
+                         f"the served model {len(class_labels)} - retrain it for the added species")
+    return CascadeClassifier.from_file(scratch.predict, lambda batch: get_classifier().predict(batch),
+                                       CASCADE_THRESHOLDS)
+
+@st.cache_resource
+def get_embedding_index():
+    """Indeks embeddingów albo None (brak indeksu, inny model, model poza tym procesem)."""
+    local_keras = MODEL_BACKEND in ("keras", "keras-mmap") and not (INFERENCE_SERVER_URL or INFERENCE_WORKERS)
+    if not local_keras or not os.path.isdir(EMBEDDING_INDEX):
+        return None
+    index = EmbeddingIndex.load(EMBEDDING_INDEX)
+    if index.meta.get("model_version") != MODEL_VERSION:
+        return None  # embeddingi innego modelu - odległości bez znaczenia
+    return index
+
+@st.cache_resource
+def get_embedding_classifier():
+    """Batcher modelu zwracającego [prawdopodobieństwa | embedding] - wagi wspólne z modelem predykcji."""
+    from embedding_index import embedding_model
+
+    loader = get_model_loader()
+    engines = []
+
+    def predict(batch):
+        if not engines:
+            engines.append(PredictionEngine(embedding_model(loader.get().model, with_probs=True), jit_compile=XLA_JIT))
+        return engines[0].predict(batch)
+
+    return MicroBatcher(predict, MAX_BATCH_SIZE, MAX_WAIT_MS)
+
+@st.cache_resource
+def get_profiler():
+    """Profiler wolnych żądań i (z METRICS_PORT) endpoint metryk - raz na proces."""
+    profiler = SlowRequestProfiler(PROFILE_SLOW_MS, PROFILE_INTERVAL_MS)
+    METRICS.gauge("prediction_cache", "Prediction cache counters and size.",
+                  lambda: {k: v for k, v in get_prediction_cache().stats().items() if isinstance(v, (int, float))},
+                  label="stat")
+    METRICS.gauge("model_ready", "1 when the model has finished loading.", lambda: float(get_model_loader().ready))
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT, METRICS, profiler, host=METRICS_HOST)
+    return profiler
+
+@st.cache_resource
+def get_tta_views(views):
+    """Tablica indeksów widoków TTA liczona raz dla danej liczby widoków."""
+    return TTAViews.from_views(views)
+
+def predict_upload(uploaded_file, lang, tta_views=0):
+    """Wektor prawdopodobieństw dla przesłanego pliku - z cache albo z modelu.
+
+    tta_views > 1: wszystkie widoki TTA idą do modelu jednym batchem, wynik to średnia.
+    """
+    cache = get_prediction_cache()
+    use_cascade = CASCADE and tta_views <= 1
+    version = f"{MODEL_VERSION}/{MODEL_BACKEND}" + (f"/tta{tta_views}" if tta_views > 1 else "")
+    version += "/cascade" if use_cascade else ""
+    with METRICS.stage("upload"):
+        key = make_key(uploaded_file.getvalue(), version)
+        probs = cache.get(key)
+    if probs is None and use_cascade:
+        # InceptionV3 (i oczekiwanie na jego załadowanie) tylko gdy model autorski jest niepewny
+        def full_predict(batch):
+            wait_for_model(lang)
+            return get_classifier().predict(batch)
+
+        with METRICS.stage("cascade"):
+            probs, _ = get_cascade().classify(uploaded_file, full_predict)
+        cache.put(key, probs)
+    elif probs is None:
+        wait_for_model(lang)
+        with METRICS.stage("decode"):
+            image = load_image(uploaded_file)
+        with METRICS.stage("preprocess"):
+            if tta_views > 1:
+                img_array = get_tta_views(tta_views)(image)
+            else:
+                img_array = preprocess_inception(np.asarray(image))[np.newaxis]
+        with METRICS.stage("model"):
+            probs = get_classifier().predict(img_array)
+        probs = average_views(probs, tta_views)[0] if tta_views > 1 else probs[0]
+        cache.put(key, probs)
+    return probs
+
+def embed_upload(uploaded_file, lang):
+    """Embedding przesłanego pliku - z cache albo z modelu.
+
+    Ten sam przebieg modelu daje prawdopodobieństwa, zapisywane pod kluczem predict_upload bez TTA,
+    więc predykcja po embeddingu nie uruchamia modelu drugi raz.
+    """
+    cache = get_prediction_cache()
+    data = uploaded_file.getvalue()
+    key = make_key(data, f"{MODEL_VERSION}/{MODEL_BACKEND}/embedding")
+    embedding = cache.get(key)
+    if embedding is None:
+        wait_for_model(lang)
+        # Osobny strumień - predict_upload czyta jeszcze uploaded_file (np. z TTA)
+        with METRICS.stage("embedding"):
+            output = get_embedding_classifier().predict(load_inception_input(io.BytesIO(data)))[0]
+        probs, embedding = output[:len(class_labels)], output[len(class_labels):]
+        if not CASCADE:
+            cache.put(make_key(data, f"{MODEL_VERSION}/{MODEL_BACKEND}"), probs)
+        cache.put(key, embedding)
+    return embedding
+
+def show_similar_photos(index, embedding, lang):
+    """Najbliższe zdjęcia referencyjne i ostrzeżenie, gdy pająk nie przypomina żadnego z nich."""
+    with METRICS.stage("neighbours"):
+        neighbours = index.search(embedding, k=NEIGHBOURS_K)
+    if index.is_ood(neighbours)[0]:
+        st.warning(
+            "This spider looks unlike any reference photo - it may be a species outside the list."
+            if lang == "English" else
+            "Ten pająk nie przypomina żadnego zdjęcia referencyjnego - może to być gatunek spoza listy."
+        )
+    st.markdown("#### Similar reference photos" if lang == "English" else "#### Podobne zdjęcia referencyjne")
+    found = [(path, f"{class_labels[cls]} ({1 - dist:.0%})")
+             for path, cls, dist in zip(neighbours.paths[0], neighbours.classes[0], neighbours.distances[0])
+             if cls >= 0]
+    on_disk = [(path, caption) for path, caption in found if os.path.isfile(path)]
+    if on_disk:
+        st.image([path for path, _ in on_disk], caption=[caption for _, caption in on_disk], width=150)
+    else:
+        st.markdown("\n".join(f"- {caption}" for _, caption in found))
+
+def show_cache_stats(lang):
+    """Liczniki cache predykcji w panelu bocznym."""
+    stats = get_prediction_cache().stats()
+    with st.sidebar.expander("Prediction cache" if lang == "English" else "Cache predykcji"):
+        st.write(
+            f"hits: {stats['hits']} · disk hits: {stats['disk_hits']} · misses: {stats['misses']}  \n"
+            f"evictions: {stats['evictions']} · entries: {stats['entries']} · hit rate: {stats['hit_rate']:.0%}"
+        )
+        if CASCADE:
+            cascade = get_cascade().stats()
+            st.write(
+                f"cascade: {cascade['requests']} requests · answered by scratch CNN: {cascade['short_circuit_rate']:.0%}"
+                if lang == "English" else
+                f"kaskada: {cascade['requests']} żądań · odpowiedź modelu autorskiego: {cascade['short_circuit_rate']:.0%}"
+            )
+
+def wait_for_model(lang):
+    """Pokazuje postęp ładowania modelu i czeka, aż będzie gotowy."""
+    if INFERENCE_SERVER_URL:
+        return
+    loader = get_model_loader()
+    loader.start()
+    if loader.ready:
+        loader.get()
+        return
+
+    labels = {
+        "queued": ("Preparing model...", "Przygotowywanie modelu..."),
+        "downloading": ("📥 Downloading model...", "📥 Pobieranie modelu..."),
+        "loading": ("Loading model...", "Wczytywanie modelu..."),
+        "warming up": ("Warming up model...", "Rozgrzewanie modelu..."),
+        "ready": ("Model ready", "Model gotowy"),
+    }
+    idx = 0 if lang == "English" else 1
+    bar = st.progress(loader.progress, text=labels[loader.stage][idx])
+    while not loader.ready:
+        time.sleep(0.25)
+        bar.progress(loader.progress, text=labels.get(loader.stage, labels["queued"])[idx])
+    bar.empty()
+    loader.get()
+
+def show_metrics(profiler, lang):
+    """Strona administracyjna (ADMIN_PAGE=1): czasy etapów, model, cache i wolne żądania."""
+    st.title("Metrics" if lang == "English" else "Metryki")
+    stages = METRICS.stages()
+    if stages:
+        st.table([
+            {"stage": stage, "count": row["count"],
+             **{key: f"{row[key] * 1000:.1f} ms" for key in ("p50", "p95", "p99", "max")}}
+            for stage, row in sorted(stages.items(), key=lambda item: -item[1]["count"] * item[1]["mean"])
+        ])
+    else:
+        st.write("No requests yet." if lang == "English" else "Brak żądań.")
+    loader = get_model_loader()
+    if loader.load_seconds is not None:
+        st.write(f"model: {loader.stage}, loaded in {loader.load_seconds:.1f} s")
+    st.write("prediction cache:", get_prediction_cache().stats())
+    if METRICS_PORT:
+        st.write(f"Prometheus: `http://{METRICS_HOST}:{METRICS_PORT}/metrics`")
+
+    st.markdown("#### Slow requests" if lang == "English" else "#### Wolne żądania")
+    if not profiler.enabled:
+        st.write("Set PROFILE_SLOW_MS to capture stacks of slow requests." if lang == "English"
+                 else "Ustaw PROFILE_SLOW_MS, aby zapisywać stosy wolnych żądań.")
+    for slow in reversed(profiler.slow):
+        with st.expander(f"{time.strftime('%H:%M:%S', time.localtime(slow['time']))} · {slow['name']} · "
+                         f"{slow['seconds'] * 1000:.0f} ms · {slow['samples']} samples"):
+            st.code("\n".join(f"{count:>5} {stack}" for stack, count in slow["stacks"]))
 
 def set_bg_hack_url():
     """Ustawia tło z obrazem."""
@@ -58,29 +481,13 @@ def set_bg_hack_url():
          unsafe_allow_html=True
      )
 
-def tarantupedia_link(name):
-    """Generuje link do tarantupedia.com. 
-    Jeśli w nazwie występuje 'or', przekierowuje tylko do rodzaju (genus).
-    """
-    name = name.strip()
-
-    if ' or ' in name.lower():
-        # Zawsze bierzemy tylko pierwszy wyraz jako genus
-        genus = name.split()[0].lower()
-        return f"https://www.tarantupedia.com/theraphosinae/{genus}"
-
-    parts = name.lower().split()
-    if len(parts) == 1:
-        return f"https://www.tarantupedia.com/theraphosinae/{parts[0]}"
-    elif len(parts) == 2:
-        return f"https://www.tarantupedia.com/theraphosinae/{parts[0]}-{parts[1]}"
-    else:
-        return f"https://www.tarantupedia.com/theraphosinae/{parts[0]}"
-
-
 def main():
     set_bg_hack_url()
 
+    if PRELOAD_MODEL and not INFERENCE_SERVER_URL:
+        get_model_loader().start()
+    profiler = get_profiler()
+
     lang = st.sidebar.selectbox("Language / Język", ["English", "Polski"])
 
     page = st.sidebar.radio(
@@ -90,7 +497,7 @@ def main():
             "Species List" if lang == "English" else "Lista gatunków",
             "Usage" if lang == "English" else "Instrukcja",
             "Credits" if lang == "English" else "Podziękowania"
-        ]
+        ] + (["Metrics" if lang == "English" else "Metryki"] if ADMIN_PAGE else [])
     )
 
     if page == ("Prediction" if lang == "English" else "Predykcja"):
@@ -101,22 +508,35 @@ def main():
             type=["jpg", "jpeg", "png"]
         )
 
-        if uploaded_file is not None:
-            img = image.load_img(uploaded_file, target_size=(299, 299))
-            img_array = image.img_to_array(img)
-            img_array = np.expand_dims(img_array, axis=0).astype(np.float32)
-            img_array = preprocess_input(img_array)
+        use_tta = st.sidebar.checkbox(
+            "Test-time augmentation (slower, more robust to unusual poses)" if lang == "English"
+            else "Augmentacja przy predykcji (wolniej, odporniej na nietypowe ujęcia)",
+            value=TTA_DEFAULT,
+        )
 
-            predictions = model.predict(img_array)
-            predicted_index = np.argmax(predictions)
-            predicted_label = class_labels[predicted_index]
+        if uploaded_file is not None:
+            with METRICS.stage("request"), profiler.capture("prediction"):
+                index = get_embedding_index()
+                # Embedding najpierw - jego przebieg modelu zapisuje też predykcję bez TTA do cache
+                embedding = embed_upload(uploaded_file, lang) if index is not None else None
+                predictions = predict_upload(uploaded_file, lang, TTA_VIEWS if use_tta else 0)
+                with METRICS.stage("postprocess"):
+                    top = species_index.top_k(predictions, TOP_K)
+                info_text = "Click to learn more" if lang == "English" else "Kliknij, aby dowiedzieć się więcej"
 
-            url = tarantupedia_link(predicted_label)
-            info_text = "Click to learn more" if lang == "English" else "Kliknij, aby dowiedzieć się więcej"
+                with METRICS.stage("render"):
+                    st.image(uploaded_file, caption="Uploaded Image")
+                    st.markdown(f"### Prediction: [{top.display_names[0]}]({top.links[0]})")
+                    st.markdown(f"*{info_text}*")
+                    if len(top.indices) > 1:
+                        st.markdown("\n".join(
+                            f"{rank}. [{name}]({link}) - {prob:.1%}"
+                            for rank, (name, link, prob) in enumerate(zip(top.display_names, top.links, top.probs), 1)
+                        ))
+                if embedding is not None:
+                    show_similar_photos(index, embedding, lang)
 
-            st.image(uploaded_file, caption="Uploaded Image")
-            st.markdown(f"### Prediction: [{predicted_label}]({url})")
-            st.markdown(f"*{info_text}*")
+        show_cache_stats(lang)
 
     elif page == ("Species List" if lang == "English" else "Lista gatunków"):
         st.title("Recognized Species" if lang == "English" else "Rozpoznawane gatunki")
@@ -133,7 +553,7 @@ def main():
             st.markdown("""
             - Upload a photo of the full spider, taken from above.
             - The app recognizes only the species listed in the Species List tab.
-            - If the species is not in the list but its genus is, the app will likely identify the genus correctly but assign the species to one from the list.
+            - If the species is not in the list but its genus is, the app will likely identify the genus correctly but assign the species to one from the list. When the photo looks unlike every reference photo, the app shows a warning that the spider may be outside the list.
             - App recognizes tarantulas in adult colouration, in cases where sexual dymorphism is very relevant app recognizes only female colouration only. 
             - Unusal poses and colouration change freshly post molt or colouration vanishing long time after molt may impact prediction accuracy.
             - Prediction accuracy is approximately 98%. If you notice above 2/100 missed prediction which is avarage fot this model, let me know.
@@ -143,13 +563,16 @@ def main():
             st.markdown("""
             - Prześlij zdjęcie całego pająka, zrobione z góry.
             - Aplikacja rozpoznaje tylko gatunki wypisane na liście gatunków.
-            - W przypadku gatunków nieobecnych na liście, ale obecnych ich rodzajów, aplikacja najprawdopodobniej prawidłowo rozpozna rodzaj, ale przypisze gatunek do jednego z dostępnych na liście.
+            - W przypadku gatunków nieobecnych na liście, ale obecnych ich rodzajów, aplikacja najprawdopodobniej prawidłowo rozpozna rodzaj, ale przypisze gatunek do jednego z dostępnych na liście. Gdy zdjęcie nie przypomina żadnego zdjęcia referencyjnego, aplikacja ostrzega, że pająk może być spoza listy.
             - Aplikacja służy do rozpoznawaniu ptaszników o ubarwieniu osobnika dorosłego, w przypadkach gdy dymorfizm płciowy jest znaczący aplikacja rozpoznaje tylko samice.
             - Niestandardowe ustawienie pająka, zmiany kolorów ze względu na śiweżo przebytą wylinkę lub zanik kolorów ze względu na długi okres bez procesu przechodzenia wylinki mogą wpłynąć na jakość predykcji
             - Kalkulowana jakość predykcji to około 98%. Jeśli zauważysz, że aplikacja myli się znacząco częściej niż w 2/100 przypadkach, możesz to zgłosić.
             - Wszelkie zgłoszenia i pytania można wysyłać w wiadomości prywatnej na moim prywatnym Facebooku (Paweł Grygielski)
             """)
 
+    elif page == ("Metrics" if lang == "English" else "Metryki"):
+        show_metrics(profiler, lang)
+
     elif page == ("Credits" if lang == "English" else "Podziękowania"):
         st.title("Credits" if lang == "English" else "Podziękowania")
         if lang == "English":
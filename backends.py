@@ -0,0 +1,99 @@
+"""
+Backendy inferencji bez TensorFlow: TFLite (float16 / INT8) i ONNX Runtime.
+
+Każdy backend ma metodę predict(batch) przyjmującą tablicę float32 Nx299x299x3
+po preprocess_input i zwracającą prawdopodobieństwa Nx101, tak jak PredictionEngine.
+Modele tworzy export_model.py.
+"""
+
+import numpy as np
+
+
+def _tflite_interpreter(path, num_threads=None):
+    """Preferuje lekki tflite_runtime, a TensorFlow importuje tylko gdy go brak."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+
+class TFLiteBackend:
+    """Model .tflite; dla modelu INT8 kwantyzuje wejście i dekwantyzuje wyjście."""
+
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.interpreter = _tflite_interpreter(path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+    def _resize(self, batch_size):
+        self.interpreter.resize_tensor_input(self._input["index"], [batch_size, 299, 299, 3])
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = batch_size
+
+    def predict(self, img_array):
+        img_array = np.asarray(img_array, dtype=np.float32)
+        if len(img_array) != self._batch_size:
+            self._resize(len(img_array))
+
+        input_dtype = self._input["dtype"]
+        if input_dtype != np.float32:
+            scale, zero_point = self._input["quantization"]
+            info = np.iinfo(input_dtype)
+            img_array = np.clip(np.round(img_array / scale + zero_point), info.min, info.max).astype(input_dtype)
+
+        self.interpreter.set_tensor(self._input["index"], img_array)
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self._output["index"])
+
+        if output.dtype != np.float32:
+            scale, zero_point = self._output["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+class ONNXBackend:
+    """Model .onnx uruchamiany przez onnxruntime na CPU."""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, img_array):
+        img_array = np.asarray(img_array, dtype=np.float32)
+        return self.session.run(None, {self._input_name: img_array})[0]
+
+
+BACKENDS = {
+    "tflite-fp16": TFLiteBackend,
+    "tflite-int8": TFLiteBackend,
+    "onnx": ONNXBackend,
+}
+
+# Nazwy plików w katalogu modelu tworzonych przez export_model.py; "savedmodel" i "keras-mmap"
+# (flat_weights.py) działają przez TensorFlow - ładuje je app.load_trained_model, nie load_backend
+BACKEND_FILES = {
+    "tflite-fp16": "model_fp16.tflite",
+    "tflite-int8": "model_int8.tflite",
+    "onnx": "model.onnx",
+    "savedmodel": "savedmodel",
+    "keras-mmap": "model_mmap.json",
+}
+
+
+def load_backend(name, path, num_threads=None):
+    """Tworzy backend o podanej nazwie (jeden z BACKENDS)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](path, num_threads)
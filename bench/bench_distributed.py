@@ -0,0 +1,171 @@
+"""
+Skalowanie treningu fine-tuningu InceptionV3 z MultiWorkerMirroredStrategy na jednej maszynie.
+
+Dla każdej liczby workerów (domyślnie 1, 2, 4) uruchamia tyle lokalnych procesów CPU
+z TF_CONFIG wskazującym na porty localhost. Każdy worker buduje model z CNN_model_inception.py
+(te same warstwy, odblokowane warstwy od 250, Adam 1e-5, opcjonalnie mixed_float16) i trenuje
+na syntetycznych danych o stałym batchu na worker (weak scaling). Bez --cores-per-worker workery
+dzielą wszystkie rdzenie, więc wynik pokazuje koszt synchronizacji gradientów i rywalizację o CPU,
+a nie zysk z większej liczby rdzeni. Z --cores-per-worker K każdy worker dostaje własne K rdzeni
+(jak osobna maszyna) - tylko to mierzy skalowanie; wymaga workers x K dostępnych rdzeni.
+
+    python bench/bench_distributed.py --workers 1 2 4 --steps 20 --batch-size 8
+    python bench/bench_distributed.py --workers 1 2 4 --cores-per-worker 4 --random-init
+    python bench/bench_distributed.py --mixed-precision --image-size 150
+    python bench/bench_distributed.py --random-init   # bez pobierania wag ImageNet (czas kroku ten sam)
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Models' code"))
+sys.path.insert(0, ROOT)
+
+
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    for s in sockets:
+        s.bind(("localhost", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def worker(args):
+    """Jeden proces klastra; chief wypisuje wynik jako JSON na stdout."""
+    import numpy as np
+    import tensorflow as tf
+
+    if args.cpus:
+        from worker_pool import parse_cpus, pin_to_cpus
+
+        cpus = parse_cpus(args.cpus)
+        pin_to_cpus(cpus)
+        threads = len(cpus)
+    else:
+        threads = max(1, (os.cpu_count() or 1) // args.num_workers)
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+
+    from CNN_model_inception import NUM_CLASSES, build_model, compile_model, distribute_options, is_chief, make_strategy, unfreeze_top
+
+    if args.mixed_precision:
+        tf.keras.mixed_precision.set_global_policy("mixed_float16")
+    strategy = make_strategy("multiworker")
+    global_batch_size = args.batch_size * strategy.num_replicas_in_sync
+
+    rng = np.random.default_rng(0)
+    size = args.image_size
+    images = rng.uniform(-1, 1, size=(args.batch_size * 4, size, size, 3)).astype(np.float32)
+    labels = np.eye(NUM_CLASSES, dtype=np.float32)[rng.integers(0, NUM_CLASSES, len(images))]
+    # Każdy worker ma własne dane (jak po shardingu), batch globalny dzielony na repliki
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).repeat().batch(global_batch_size)
+    dataset = distribute_options(dataset, tf.data.experimental.AutoShardPolicy.OFF)
+
+    with strategy.scope():
+        model, base_model = build_model(args.mixed_precision, input_shape=(size, size, 3),
+                                        weights=None if args.random_init else 'imagenet')
+        unfreeze_top(base_model, 250)
+        compile_model(model, learning_rate=1e-5, mixed_precision=args.mixed_precision)
+
+    class StepTimer(tf.keras.callbacks.Callback):
+        def on_train_batch_begin(self, batch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.times.append(time.perf_counter() - self.start)
+
+    timer = StepTimer()
+    timer.times = []
+    model.fit(dataset, epochs=1, steps_per_epoch=args.warmup + args.steps, callbacks=[timer], verbose=0)
+
+    if is_chief():
+        step = float(np.median(timer.times[args.warmup:]))
+        print(json.dumps({
+            "workers": args.num_workers,
+            "global_batch": global_batch_size,
+            "step_seconds": step,
+            "images_per_second": global_batch_size / step,
+        }))
+
+
+def run_cluster(num_workers, args):
+    cpu_sets = [None] * num_workers
+    if args.cores_per_worker:
+        from worker_pool import available_cpus
+
+        cpus = available_cpus()
+        cpu_sets = [cpus[i * args.cores_per_worker:(i + 1) * args.cores_per_worker] for i in range(num_workers)]
+    ports = free_ports(num_workers)
+    cluster = {"worker": [f"localhost:{port}" for port in ports]}
+    processes = []
+    for index in range(num_workers):
+        env = dict(os.environ, CUDA_VISIBLE_DEVICES="", TF_CPP_MIN_LOG_LEVEL="2",
+                   TF_CONFIG=json.dumps({"cluster": cluster, "task": {"type": "worker", "index": index}}))
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--num-workers", str(num_workers),
+               "--steps", str(args.steps), "--warmup", str(args.warmup), "--batch-size", str(args.batch_size),
+               "--image-size", str(args.image_size)]
+        if args.mixed_precision:
+            cmd.append("--mixed-precision")
+        if args.random_init:
+            cmd.append("--random-init")
+        if cpu_sets[index]:
+            cmd += ["--cpus", ",".join(map(str, cpu_sets[index]))]
+        processes.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, text=True))
+
+    outputs = [p.communicate()[0] for p in processes]
+    if any(p.returncode for p in processes):
+        raise RuntimeError(f"{num_workers}-worker run failed")
+    return json.loads(outputs[0].strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MultiWorkerMirroredStrategy scaling on local CPU workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--steps", type=int, default=20, help="measured steps per run")
+    parser.add_argument("--warmup", type=int, default=3, help="steps skipped (tracing, first allreduce)")
+    parser.add_argument("--batch-size", type=int, default=8, help="batch size per worker")
+    parser.add_argument("--image-size", type=int, default=299, help="input side in pixels (min. 75)")
+    parser.add_argument("--random-init", action="store_true",
+                        help="same architecture without downloading ImageNet weights")
+    parser.add_argument("--mixed-precision", action="store_true")
+    parser.add_argument("--cores-per-worker", type=int,
+                        help="pin each worker to its own N cores (default: all workers share every core)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--num-workers", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--cpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    if args.cores_per_worker:
+        from worker_pool import available_cpus
+
+        needed = max(args.workers) * args.cores_per_worker
+        if needed > len(available_cpus()):
+            parser.error(f"{max(args.workers)} workers x {args.cores_per_worker} cores need {needed} CPUs, "
+                         f"only {len(available_cpus())} available")
+    cores = f"{args.cores_per_worker} pinned per worker" if args.cores_per_worker else "shared"
+    print(f"cpus: {os.cpu_count()} ({cores}), batch/worker: {args.batch_size}, image: {args.image_size}, "
+          f"mixed precision: {args.mixed_precision}")
+    print(f"\n{'workers':>8} {'global batch':>13} {'step s':>9} {'img/s':>9} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    for n in args.workers:
+        result = run_cluster(n, args)
+        baseline = baseline or result["images_per_second"]
+        speedup = result["images_per_second"] / baseline
+        print(f"{n:>8} {result['global_batch']:>13} {result['step_seconds']:>9.3f} "
+              f"{result['images_per_second']:>9.1f} {speedup:>8.2f} {speedup / n * args.workers[0]:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Opóźnienie zapytań i pamięć indeksu embeddingów (embedding_index.py) przy 1x, 10x i 100x rozmiarze.
+
+Rozmiar bazowy to liczba zdjęć w zbudowanym indeksie (--index) albo --base-size;
+wektory są syntetyczne: 101 skupień w 512 wymiarach z szumem, jak embeddingi klas.
+Dla każdej skali i typu wektorów (float16, int8) mierzone jest wyszukiwanie dokładne
+oraz IVF (nlist = 4 * sqrt(N)) dla kilku nprobe: pamięć, czas budowy, opóźnienie
+pojedynczego zapytania p50/p95 i recall@k względem dokładnego wyszukiwania float32.
+
+    python bench/bench_embedding_index.py --base-size 10000 --scales 1 10 100
+    python bench/bench_embedding_index.py --index model/embeddings --nprobe 4 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_index import EmbeddingIndex
+
+
+def synthetic_embeddings(n, dim=512, classes=101, noise=0.8, seed=0):
+    """Skupienia wokół losowych środków klas - generowane blokami float32."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((classes, dim), dtype=np.float32)
+    labels = rng.integers(0, classes, n)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 65536):
+        stop = min(start + 65536, n)
+        vectors[start:stop] = centers[labels[start:stop]] + noise * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    return vectors, labels, centers
+
+
+def latency_ms(index, queries, k, nprobe=None):
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q, k, nprobe)
+        times.append(time.perf_counter() - t0)
+    times = np.array(times) * 1000
+    return float(np.percentile(times, 50)), float(np.percentile(times, 95))
+
+
+def recall(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding index latency and memory at 1x / 10x / 100x scale")
+    parser.add_argument("--index", help="built index directory - its size is the 1x scale")
+    parser.add_argument("--base-size", type=int, default=10000, help="1x size without --index")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--dtypes", nargs="+", choices=["float16", "int8"], default=["float16", "int8"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--output", help="write all results as JSON")
+    args = parser.parse_args()
+
+    base = args.base_size
+    if args.index:
+        base = len(EmbeddingIndex.load(args.index))
+
+    results = []
+    print(f"{'N':>9} {'dtype':<8} {'search':<12} {'MB':>8} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for scale in args.scales:
+        n = base * scale
+        vectors, labels, centers = synthetic_embeddings(n)
+        rng = np.random.default_rng(1)
+        qlabels = rng.integers(0, len(centers), args.queries)
+        queries = centers[qlabels] + 0.8 * rng.standard_normal((args.queries, vectors.shape[1]), dtype=np.float32)
+        paths = np.arange(n).astype(str)
+
+        exact = EmbeddingIndex.build(vectors, labels, paths, "float32")
+        truth = exact.search(queries, args.k).paths
+        del exact
+
+        nlist = int(4 * np.sqrt(n))
+        for dtype in args.dtypes:
+            for ivf in (False, True):
+                t0 = time.perf_counter()
+                index = EmbeddingIndex.build(vectors, labels, paths, dtype, nlist if ivf else 0)
+                build_seconds = time.perf_counter() - t0
+                for nprobe in (args.nprobe if ivf else [None]):
+                    p50, p95 = latency_ms(index, queries, args.k, nprobe)
+                    r = {
+                        "n": n, "dtype": dtype, "search": f"ivf{nlist}/{nprobe}" if ivf else "exact",
+                        "mb": index.nbytes / 2**20, "build_seconds": build_seconds, "p50_ms": p50, "p95_ms": p95,
+                        "recall": recall(index.search(queries, args.k, nprobe).paths, truth),
+                    }
+                    results.append(r)
+                    print(f"{n:>9} {dtype:<8} {r['search']:<12} {r['mb']:>8.1f} {build_seconds:>8.1f} "
+                          f"{p50:>8.2f} {p95:>8.2f} {r['recall']:>7.3f}")
+                del index
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Czas epoki potoku wejściowego: ImageDataGenerator.flow_from_directory vs tf.data (data_pipeline.py)
+vs shardy zdekodowanych pikseli (shards.py).
+
+Mierzy samo dostarczanie batchy (bez modelu), czyli górną granicę szybkości treningu
+narzucaną przez dane. Dla tf.data mierzone są dwie epoki - druga korzysta z cache().
+Z --shards-dir mierzone są też dwie epoki ze shardów; jeśli katalog nie zawiera shardów,
+są najpierw budowane (czas budowy i rozmiar na dysku w wyniku).
+
+    python bench/bench_input_pipeline.py --train-dir /data/CNN_project/Species --target-size 299
+    python bench/bench_input_pipeline.py --train-dir /data/CNN_project/Species --shards-dir /data/shards/Species_299
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Models' code"))
+sys.path.insert(0, ROOT)
+
+
+def time_epoch(iterable, steps):
+    start = time.perf_counter()
+    images = 0
+    for step, (x, _) in enumerate(iterable):
+        images += len(x)
+        if step + 1 >= steps:
+            break
+    return time.perf_counter() - start, images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ImageDataGenerator vs tf.data epoch time")
+    parser.add_argument("--train-dir", required=True)
+    parser.add_argument("--target-size", type=int, default=299)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-batches", type=int, default=0, help="limit batches per epoch (0 = full epoch; a partial epoch leaves the tf.data cache incomplete)")
+    parser.add_argument("--shards-dir", help="shard directory to compare (built here if it has no index.json)")
+    args = parser.parse_args()
+
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from data_pipeline import make_dataset, steps_for
+    from preprocessing import preprocess_inception, preprocess_scratch
+
+    size = (args.target_size, args.target_size)
+    preprocessing = "inception" if args.target_size == 299 else "scratch"
+
+    datagen = ImageDataGenerator(
+        preprocessing_function=preprocess_inception if preprocessing == "inception" else preprocess_scratch,
+        shear_range=0.2, zoom_range=0.2, horizontal_flip=True, rotation_range=30,
+        width_shift_range=0.2, height_shift_range=0.2, brightness_range=[0.8, 1.2], channel_shift_range=10.0,
+    )
+    generator = datagen.flow_from_directory(args.train_dir, target_size=size, batch_size=args.batch_size,
+                                            class_mode="categorical")
+    dataset, info = make_dataset(args.train_dir, size, args.batch_size, training=True, preprocessing=preprocessing)
+
+    steps = steps_for(info, args.batch_size)
+    if args.max_batches:
+        steps = min(steps, args.max_batches)
+
+    results = [("ImageDataGenerator",) + time_epoch(generator, steps)]
+    results.append(("tf.data (epoch 1)",) + time_epoch(dataset, steps))
+    results.append(("tf.data (epoch 2, cached)",) + time_epoch(dataset, steps))
+
+    if args.shards_dir:
+        from shards import build_shards, is_shard_dir
+
+        if not is_shard_dir(args.shards_dir):
+            start = time.perf_counter()
+            count, nbytes = build_shards(args.train_dir, args.shards_dir, size)
+            print(f"Built {count} images into {args.shards_dir} in {time.perf_counter() - start:.1f} s, "
+                  f"{nbytes / 2**30:.2f} GB on disk")
+        shard_dataset, _ = make_dataset(args.shards_dir, size, args.batch_size, training=True,
+                                        preprocessing=preprocessing)
+        results.append(("shards (epoch 1)",) + time_epoch(shard_dataset, steps))
+        results.append(("shards (epoch 2)",) + time_epoch(shard_dataset, steps))
+
+    print(f"\n{'pipeline':<28} {'batches':>8} {'seconds':>9} {'img/s':>9}")
+    for name, seconds, images in results:
+        print(f"{name:<28} {steps:>8} {seconds:>9.1f} {images / seconds:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Koszt instrumentacji metrics.py na ścieżce predykcji.
+
+- pojedynczy pomiar etapu (with REGISTRY.stage(...)) i Histogram.observe w ns,
+- render() formatu Prometheus przy kilkunastu etapach,
+- pełne żądanie bez modelu (dekodowanie JPEG + preprocessing + top_k) bez instrumentacji,
+  z pomiarem etapów jak w app.py oraz dodatkowo z profilerem wolnych żądań (próbkowanie stosu),
+  czyli narzut w procentach czasu żądania. Warianty są przeplatane w każdej rundzie (losowa kolejność),
+  a narzut to mediana różnic czasu w parach z tej samej rundy - dryf zegara i obciążenia maszyny
+  dotyka wszystkich wariantów jednakowo.
+
+    python bench/bench_metrics.py --requests 200 --interval-ms 10
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import MetricsRegistry, SlowRequestProfiler
+from preprocessing import load_image, preprocess_inception
+from species_index import get_species_index
+
+STAGES = ["upload", "decode", "preprocess", "model", "postprocess", "render", "request"]
+
+
+def ns_per_call(fn, n):
+    start = time.perf_counter_ns()
+    fn(n)
+    return (time.perf_counter_ns() - start) / n
+
+
+def make_jpeg(megapixels, seed=0):
+    rng = np.random.default_rng(seed)
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (height, height * 4 // 3, 3), dtype=np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def request(data, probs, species, registry=None, profiler=None):
+    """Ścieżka predykcji z app.py bez modelu i Streamlit (probs zamiast wyniku modelu); z registry - z pomiarem etapów."""
+    if registry is None:
+        preprocess_inception(np.asarray(load_image(io.BytesIO(data))))[np.newaxis]
+        return species.top_k(probs, 3)
+    with registry.stage("request"), profiler.capture("prediction"):
+        with registry.stage("decode"):
+            image = load_image(io.BytesIO(data))
+        with registry.stage("preprocess"):
+            preprocess_inception(np.asarray(image))[np.newaxis]
+        with registry.stage("postprocess"):
+            return species.top_k(probs, 3)
+
+
+def time_interleaved(variants, data, rounds, seed=0):
+    """{nazwa: czasy ms}; w każdej rundzie każdy wariant raz, w losowej kolejności."""
+    rng = np.random.default_rng(seed)
+    names = list(variants)
+    times = {name: [] for name in names}
+    for _ in range(rounds):
+        for index in rng.permutation(len(names)):
+            start = time.perf_counter()
+            variants[names[index]](data)
+            times[names[index]].append(time.perf_counter() - start)
+    return {name: np.array(values) * 1000 for name, values in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overhead of the prediction-path metrics and slow-request profiler")
+    parser.add_argument("--iterations", type=int, default=200000, help="calls for the per-record microbenchmarks")
+    parser.add_argument("--requests", type=int, default=200, help="rounds; each runs every variant once")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="profiler sampling interval")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+
+    def empty_loop(n):
+        for _ in range(n):
+            pass
+
+    def stage_loop(n):
+        stage = registry.stage
+        for _ in range(n):
+            with stage("decode"):
+                pass
+
+    def observe_loop(n):
+        observe = registry.stage_seconds.observe
+        for _ in range(n):
+            observe(0.0123, "decode")
+
+    base = ns_per_call(empty_loop, args.iterations)
+    stage_ns = ns_per_call(stage_loop, args.iterations) - base
+    observe_ns = ns_per_call(observe_loop, args.iterations) - base
+    for name in STAGES:
+        registry.stage_seconds.observe(0.01, name)
+    start = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+    print(f"stage timer: {stage_ns:.0f} ns/stage · Histogram.observe: {observe_ns:.0f} ns · "
+          f"render(): {render_ms:.2f} ms ({len(text) / 1024:.0f} KiB, {len(STAGES)} stages)")
+
+    species = get_species_index()
+    data = make_jpeg(args.megapixels)
+    probs = np.random.default_rng(0).dirichlet(np.ones(len(species)))
+    off = SlowRequestProfiler(0)
+    sampling = SlowRequestProfiler(threshold_ms=1e-3, interval_ms=args.interval_ms)
+    variants = {
+        "no instrumentation": lambda d: request(d, probs, species),
+        "stage timers": lambda d: request(d, probs, species, registry, off),
+        f"timers + profiler ({args.interval_ms:g} ms)": lambda d: request(d, probs, species, registry, sampling),
+    }
+    time_interleaved(variants, data, 5)
+
+    times = time_interleaved(variants, data, args.requests)
+    baseline = times["no instrumentation"]
+    print(f"\n{'request path':<30} {'p50 ms':>9} {'mean ms':>9} {'overhead ms':>12} {'overhead':>9}")
+    for name, t in times.items():
+        # Mediana różnic w parach (ta sama runda) względem mediany żądania bez instrumentacji
+        diff = np.median(t - baseline)
+        print(f"{name:<30} {np.percentile(t, 50):>9.2f} {t.mean():>9.2f} {diff:>+12.3f} "
+              f"{diff / np.median(baseline):>+9.2%}")
+    captured = sampling.slow[-1] if sampling.slow else None
+    if captured:
+        print(f"\nlast captured request: {captured['seconds'] * 1000:.1f} ms, {captured['samples']} samples, "
+              f"top stack: {captured['stacks'][0][0] if captured['stacks'] else '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Czas ładowania i pamięć procesów dla formatów modelu: model.h5 (h5py), SavedModel
+i płaskie wagi mapowane do pamięci (flat_weights.py), przy 1, 4 i 8 procesach na hoście.
+
+Wszystkie procesy danej konfiguracji startują równocześnie, ładują model przez
+app.load_trained_model (z rozgrzewką) i dopiero gdy wszystkie są gotowe, odczytują
+/proc/self/smaps_rollup:
+- RSS - strony procesu w pamięci, także współdzielone (ta sama liczba przy współdzieleniu),
+- PSS - strony współdzielone podzielone przez liczbę procesów (suma PSS = zajętość hosta),
+- USS - strony prywatne procesu.
+
+Wymaga wcześniejszego eksportu (Linux, /proc):
+
+    python export_model.py --formats savedmodel keras-mmap
+    python bench/bench_model_formats.py --workers 1 4 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FORMATS = {"h5": "keras", "savedmodel": "savedmodel", "mmap": "keras-mmap"}
+
+
+def memory_mb():
+    """RSS, PSS i USS (Private_*) bieżącego procesu w MB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields["Rss"],
+        "pss_mb": fields["Pss"],
+        "uss_mb": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def run_worker(backend):
+    """Ładuje model, zgłasza gotowość i czeka na sygnał rodzica przed pomiarem pamięci."""
+    os.environ["MODEL_BACKEND"] = backend
+    os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+    import numpy as np
+    from app import load_trained_model
+
+    start = time.perf_counter()
+    engine = load_trained_model()
+    load_seconds = time.perf_counter() - start
+    engine.predict(np.zeros((1, 299, 299, 3), dtype=np.float32))
+
+    print("ready", flush=True)
+    sys.stdin.readline()
+    return {"load_seconds": load_seconds, **memory_mb()}
+
+
+def run_group(backend, workers):
+    """Uruchamia workers procesów naraz; zwraca ich wyniki po pomiarze przy wszystkich załadowanych."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--worker", backend]
+    procs = [subprocess.Popen(cmd, cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(workers)]
+    try:
+        for proc in procs:
+            line = proc.stdout.readline()
+            if line.strip() != "ready":
+                raise RuntimeError(f"{backend} worker failed to load the model (exit {proc.wait()})")
+        for proc in procs:
+            proc.stdin.write("\n")
+            proc.stdin.flush()
+        return [json.loads(proc.stdout.read().strip().splitlines()[-1]) for proc in procs]
+    finally:
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load time and per-process memory of h5 / SavedModel / mmap weights")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker)))
+        return
+
+    print(f"{'format':<11} {'workers':>7} {'load s':>7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'host MB':>8}")
+    for name in args.formats:
+        run_group(FORMATS[name], 1)  # pliki modelu w page cache - porównanie bez zimnego dysku
+        for workers in args.workers:
+            results = run_group(FORMATS[name], workers)
+
+            def mean(key):
+                return sum(r[key] for r in results) / len(results)
+
+            host_mb = sum(r["pss_mb"] for r in results)
+            print(f"{name:<11} {workers:>7} {mean('load_seconds'):>7.2f} {mean('rss_mb'):>8.0f} "
+                  f"{mean('pss_mb'):>8.0f} {mean('uss_mb'):>8.0f} {host_mb:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
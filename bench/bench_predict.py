@@ -0,0 +1,55 @@
+"""
+Porównanie opóźnienia predykcji na CPU: Keras model.predict vs PredictionEngine (tf.function).
+
+    python bench/bench_predict.py --batch-sizes 1 8 --repeats 50
+    TF_XLA_JIT=1 python bench/bench_predict.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")  # pomiar tylko na CPU
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import load_trained_model
+
+
+def measure(fn, img_array, repeats, warmup=3):
+    for _ in range(warmup):
+        fn(img_array)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(img_array)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="model.predict vs compiled prediction engine latency")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = load_trained_model()
+    paths = {
+        "model.predict": lambda x: engine.model.predict(x, verbose=0),
+        "tf.function" + (" + XLA" if engine.jit_compile else ""): engine.predict,
+    }
+
+    rng = np.random.default_rng(0)
+    print(f"{'path':<22} {'batch':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for batch_size in args.batch_sizes:
+        img_array = rng.uniform(-1.0, 1.0, size=(batch_size, 299, 299, 3)).astype(np.float32)
+        for name, fn in paths.items():
+            t = measure(fn, img_array, args.repeats)
+            print(f"{name:<22} {batch_size:>5} {t.mean():>9.2f} {np.percentile(t, 50):>9.2f} {np.percentile(t, 95):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Czas dekodowania i szczytowa pamięć: dotychczasowa ścieżka keras vs preprocessing.py.
+
+Ścieżka "keras" to image.load_img + img_to_array + expand_dims + astype + preprocess_input
+(bez TensorFlow używany jest jej odpowiednik w PIL/NumPy: pełne dekodowanie i te same kopie).
+Każda ścieżka działa w osobnym procesie, a pamięć to przyrost maksymalnego RSS.
+
+    python bench/bench_preprocessing.py --megapixels 12 24 --repeats 10
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PATHS = ["keras", "fast"]
+
+
+def make_jpeg(path, megapixels, seed=0):
+    """Syntetyczne zdjęcie 4:3 o zadanej liczbie megapikseli."""
+    from PIL import Image
+
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = height * 4 // 3
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    img.save(path, format="JPEG", quality=92)
+    return width, height
+
+
+def keras_path():
+    """Zwraca funkcję dotychczasowej ścieżki; importy odbywają się tutaj, poza pomiarem."""
+    try:
+        from tensorflow.keras.preprocessing import image
+        from tensorflow.keras.applications.inception_v3 import preprocess_input
+
+        def load(path):
+            return image.img_to_array(image.load_img(path, target_size=(299, 299)))
+    except ImportError:
+        from PIL import Image
+
+        def load(path):
+            img = Image.open(path).convert("RGB").resize((299, 299), Image.NEAREST)
+            return np.asarray(img, dtype=np.float32)
+
+        def preprocess_input(x):
+            x = x / 127.5
+            return x - 1.0
+
+    def run(path):
+        img_array = np.expand_dims(load(path), axis=0).astype(np.float32)
+        return preprocess_input(img_array)
+
+    return run
+
+
+def fast_path():
+    from preprocessing import load_inception_input
+
+    return load_inception_input
+
+
+def run_worker(name, path, repeats):
+    fn = keras_path() if name == "keras" else fast_path()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(path)
+        times.append(time.perf_counter() - start)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"path": name, "median_ms": float(np.median(times) * 1000), "peak_rss_delta_mb": (rss_after - rss_before) / 1024}
+
+
+def spawn(args):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__)] + args, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode + preprocess benchmark on large JPEGs")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--worker", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.image, args.repeats)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'image':>12} {'path':<6} {'median ms':>10} {'peak RSS +MB':>13}")
+        for mp in args.megapixels:
+            image_path = os.path.join(tmp, f"{mp}mp.jpg")
+            width, height = make_jpeg(image_path, mp)
+            for name in PATHS:
+                r = spawn(["--worker", name, "--image", image_path, "--repeats", str(args.repeats)])
+                print(f"{f'{width}x{height}':>12} {name:<6} {r['median_ms']:>10.1f} {r['peak_rss_delta_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Zestaw benchmarków opóźnienia i przepustowości predykcji ze śledzeniem regresji (tylko CPU).
+
+Etapy ścieżki z app.py mierzone osobno:
+- decode: preprocessing.load_image (JPEG/PNG z pamięci do 299x299, tryb draft),
+- preprocess: piksele uint8 -> float32 [-1, 1] do wiersza bufora batcha,
+- forward: PredictionEngine.predict dla batchy 1..64,
+- postprocess: species_index.top_k dla wyniku batcha,
+oraz załadowanie modelu w bieżącym procesie (load_trained_model, z rozgrzewką) i cold start
+w świeżym procesie (import app, model gotowy, pierwsza predykcja - bench/measure_startup.py).
+
+Obrazy syntetyczne (losowy JPEG --megapixels) i prawdziwe (--image-dir, losowa próbka).
+Wynik: JSON ze środowiskiem i metrykami (p50/p95/średnia w ms, obrazy/s). Z --baseline
+metryki p50 są porównywane z zapisanym wynikiem; wzrost ponad próg (--max-regression,
+per metryka/prefiks --threshold forward=0.2) kończy skrypt kodem 1.
+
+    python bench/bench_suite.py --output bench/results.json --save-baseline bench/baseline.json
+    python bench/bench_suite.py --image-dir path/to/test --baseline bench/baseline.json --max-regression 0.15
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")  # pomiar tylko na CPU
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from preprocessing import INCEPTION_SIZE, load_image, preprocess_inception
+from species_index import get_species_index
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# --- Pomiar ---
+
+def summarize(times_s, images_per_call=1):
+    """Czasy wywołań (s) -> p50/p95/średnia w ms i przepustowość w obrazach/s."""
+    ms = np.asarray(times_s) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "mean_ms": float(ms.mean()),
+        "images_per_s": float(images_per_call * 1000 / np.percentile(ms, 50)),
+        "samples": int(len(ms)),
+    }
+
+
+def timed(fn, args_list, warmup=1):
+    """Czas każdego wywołania fn(arg) po rozgrzewce na pierwszych argumentach."""
+    for arg in args_list[:warmup]:
+        fn(arg)
+    times = []
+    for arg in args_list:
+        start = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+# --- Obrazy ---
+
+def synthetic_images(count, megapixels, seed=0):
+    """JPEG-i z szumem o rozdzielczości zdjęcia z telefonu (4:3), trzymane w pamięci."""
+    rng = np.random.default_rng(seed)
+    height = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    width = int(height * 4 / 3)
+    base = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    images = []
+    for i in range(count):
+        # Gładki obraz z szumem - rozmiar pliku zbliżony do prawdziwego zdjęcia
+        pixels = np.asarray(Image.fromarray(np.roll(base, i, axis=1)).resize((width, height), Image.BILINEAR))
+        pixels = np.clip(pixels + rng.integers(-12, 13, pixels.shape), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+        images.append(buf.getvalue())
+    return images
+
+
+def real_images(directory, count, seed=0):
+    """Losowa próbka plików obrazów z katalogu (rekurencyjnie), wczytana do pamięci."""
+    paths = sorted(
+        os.path.join(dirpath, name)
+        for dirpath, _, names in os.walk(directory)
+        for name in names if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {directory}")
+    rng = np.random.default_rng(seed)
+    images = []
+    for path in rng.choice(paths, min(count, len(paths)), replace=False):
+        with open(path, "rb") as f:
+            images.append(f.read())
+    return images
+
+
+# --- Etapy ---
+
+def bench_input_stages(name, images, metrics):
+    """decode i preprocess dla każdego obrazu osobno; zwraca bufor float32 gotowy dla modelu."""
+    decoded = []
+    metrics[f"decode/{name}"] = summarize(timed(
+        lambda data: decoded.append(np.asarray(load_image(io.BytesIO(data), INCEPTION_SIZE))), images))
+    decoded = decoded[1:]  # bez obrazu z rozgrzewki
+    out = np.empty((len(decoded), *INCEPTION_SIZE[::-1], 3), dtype=np.float32)
+    rows = list(range(len(decoded)))
+    metrics[f"preprocess/{name}"] = summarize(timed(lambda i: preprocess_inception(decoded[i], out=out[i]), rows))
+    return out
+
+
+def bench_forward(engine, inputs, batch_sizes, repeats, metrics):
+    """forward i postprocess dla kolejnych rozmiarów batcha (wejście powtórzone do rozmiaru batcha)."""
+    species_index = get_species_index()
+    for batch_size in batch_sizes:
+        batch = np.ascontiguousarray(np.resize(inputs, (batch_size, *inputs.shape[1:])))
+        outputs = []
+        times = timed(lambda b: outputs.append(engine.predict(b)), [batch] * (repeats + 2), warmup=2)[2:]
+        metrics[f"forward/b{batch_size}"] = summarize(times, batch_size)
+        probs = np.asarray(outputs[-1])
+        metrics[f"postprocess/b{batch_size}"] = summarize(
+            timed(lambda p: species_index.top_k(p, 3), [probs] * max(repeats, 20)), batch_size)
+
+
+def bench_cold_start(repeats, metrics):
+    """Świeże procesy bench/measure_startup.py --worker predict; czasy liczone od uruchomienia procesu."""
+    from measure_startup import spawn
+
+    runs = [spawn(["--worker", "predict"]) for _ in range(repeats)]
+    for key, name in (("import_seconds", "import"), ("model_ready_seconds", "model_ready"),
+                      ("seconds", "first_prediction")):
+        metrics[f"cold_start/{name}"] = summarize([r[key] for r in runs])
+
+
+def environment():
+    import app
+
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "model_name": app.MODEL_NAME,
+        "model_version": app.MODEL_VERSION,
+        "model_backend": app.MODEL_BACKEND,
+        "xla_jit": app.XLA_JIT,
+    }
+    if "tensorflow" in sys.modules:
+        info["tensorflow"] = sys.modules["tensorflow"].__version__
+    try:
+        info["git_commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+# --- Porównanie z baseline ---
+
+def parse_thresholds(specs):
+    thresholds = {}
+    for spec in specs:
+        name, sep, value = spec.partition("=")
+        if not sep:
+            raise SystemExit(f"--threshold expects name=ratio, got '{spec}'")
+        thresholds[name] = float(value)
+    return thresholds
+
+
+def threshold_for(name, default, thresholds):
+    """Próg dla metryki: dokładna nazwa albo najdłuższy pasujący prefiks (np. 'forward', 'decode/real')."""
+    matches = [key for key in thresholds if name == key or name.startswith(key.rstrip("/") + "/")]
+    return thresholds[max(matches, key=len)] if matches else default
+
+
+def compare(results, baseline, max_regression, thresholds):
+    """Lista (metryka, baseline ms, obecnie ms, zmiana, próg, regresja) dla metryk obecnych w obu wynikach."""
+    rows = []
+    for name, metric in results["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if base is None or base["p50_ms"] <= 0:
+            continue
+        change = metric["p50_ms"] / base["p50_ms"] - 1
+        limit = threshold_for(name, max_regression, thresholds)
+        rows.append((name, base["p50_ms"], metric["p50_ms"], change, limit, change > limit))
+    return rows
+
+
+def print_results(metrics):
+    print(f"{'metric':<28} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10} {'img/s':>9}")
+    for name, m in metrics.items():
+        print(f"{name:<28} {m['p50_ms']:>10.2f} {m['p95_ms']:>10.2f} {m['mean_ms']:>10.2f} {m['images_per_s']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU inference latency/throughput suite with baseline regression check")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=10, help="timed forward passes per batch size")
+    parser.add_argument("--images", type=int, default=32, help="images per decode/preprocess measurement")
+    parser.add_argument("--megapixels", type=float, default=12.0, help="synthetic image resolution")
+    parser.add_argument("--image-dir", help="real images (searched recursively), e.g. the test split")
+    parser.add_argument("--cold-start-repeats", type=int, default=3, help="fresh processes (0 = skip)")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="allowed relative p50 slowdown vs the baseline (0.10 = 10%%)")
+    parser.add_argument("--threshold", action="append", default=[], metavar="NAME=RATIO",
+                        help="per-metric or prefix threshold, e.g. forward=0.2 or cold_start=0.3 (repeatable)")
+    args = parser.parse_args()
+    thresholds = parse_thresholds(args.threshold)
+
+    metrics = {}
+    inputs = {"synthetic": bench_input_stages(
+        "synthetic", synthetic_images(args.images + 1, args.megapixels), metrics)}
+    if args.image_dir:
+        inputs["real"] = bench_input_stages("real", real_images(args.image_dir, args.images + 1), metrics)
+
+    import app
+
+    start = time.perf_counter()
+    engine = app.load_trained_model()
+    metrics["model_load"] = summarize([time.perf_counter() - start])
+    bench_forward(engine, inputs.get("real", inputs["synthetic"]), args.batch_sizes, args.repeats, metrics)
+    if args.cold_start_repeats:
+        bench_cold_start(args.cold_start_repeats, metrics)
+
+    results = {"environment": environment(), "config": vars(args), "metrics": metrics}
+    print_results(metrics)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        base_env = baseline.get("environment", {})
+        for key in ("host", "cpu_count", "model_version", "model_backend"):
+            if base_env.get(key) != results["environment"][key]:
+                print(f"⚠️ baseline {key} differs: {base_env.get(key)} vs {results['environment'][key]}")
+        rows = compare(results, baseline, args.max_regression, thresholds)
+        print(f"\nvs baseline {args.baseline} (commit {base_env.get('git_commit')})")
+        print(f"{'metric':<28} {'base ms':>10} {'now ms':>10} {'change':>8} {'limit':>7}")
+        for name, base, now, change, limit, regressed in rows:
+            print(f"{name:<28} {base:>10.2f} {now:>10.2f} {change:>+8.1%} {limit:>7.0%}{'  REGRESSION' if regressed else ''}")
+        regressions = [row[0] for row in rows if row[5]]
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
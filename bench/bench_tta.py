@@ -0,0 +1,87 @@
+"""
+Koszt opóźnienia vs zysk dokładności test-time augmentation (tta.py) na zbiorze testowym.
+
+Dla każdej liczby widoków mierzy top-1 / top-3 oraz czas na zdjęcie: budowa widoków
+w NumPy i jedno wywołanie modelu z batchem wszystkich widoków. Dla porównania
+(--sequential) te same widoki podawane są osobnymi wywołaniami predict, jak przy
+naiwnym TTA w pętli.
+
+    python bench/bench_tta.py --test-dir /data/CNN_project/test --views 1 2 4 6 12 16 --limit 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def evaluate(engine, images, classes, tta, sequential=False):
+    """(top-1, top-3, ms na budowę widoków, ms na model) dla jednej konfiguracji."""
+    from tta import average_views
+
+    views_ms, model_ms, top1, top3 = [], [], 0, 0
+    out = np.empty((len(tta), 299, 299, 3), dtype=np.float32)
+    for pixels, true_class in zip(images, classes):
+        t0 = time.perf_counter()
+        batch = tta(pixels, out=out)
+        t1 = time.perf_counter()
+        if sequential:
+            probs = np.concatenate([engine.predict(batch[i:i + 1]) for i in range(len(batch))])
+        else:
+            probs = engine.predict(batch)
+        t2 = time.perf_counter()
+        probs = average_views(probs, len(tta))[0]
+        views_ms.append((t1 - t0) * 1000)
+        model_ms.append((t2 - t1) * 1000)
+        best = np.argpartition(probs, -3)[-3:]
+        top1 += int(np.argmax(probs) == true_class)
+        top3 += int(true_class in best)
+    n = len(classes)
+    return top1 / n, top3 / n, float(np.median(views_ms)), float(np.median(model_ms))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test-time augmentation: latency cost vs accuracy gain")
+    parser.add_argument("--test-dir", required=True)
+    parser.add_argument("--views", type=int, nargs="+", default=[1, 2, 4, 6, 12, 16])
+    parser.add_argument("--limit", type=int, default=0, help="evaluate only N test images (evenly spaced)")
+    parser.add_argument("--sequential", action="store_true", help="also time one predict call per view")
+    args = parser.parse_args()
+
+    from app import load_trained_model
+    from preprocessing import list_image_files, load_image
+    from tta import TTAViews
+
+    filepaths, classes, _ = list_image_files(args.test_dir)
+    if args.limit and args.limit < len(filepaths):
+        # Równomiernie po zbiorze - pliki są posortowane klasami
+        pick = np.linspace(0, len(filepaths) - 1, args.limit).astype(int)
+        filepaths, classes = [filepaths[i] for i in pick], classes[pick]
+
+    # Dekodowanie raz, poza pomiarem - porównujemy tylko TTA i model
+    images = [np.asarray(load_image(path)) for path in filepaths]
+    engine = load_trained_model()
+    for views in sorted(set(args.views) | {1}):
+        engine.predict(np.zeros((views, 299, 299, 3), dtype=np.float32))  # śledzenie kształtu batcha
+
+    print(f"images: {len(images)}, backend: {os.environ.get('MODEL_BACKEND', 'keras')}")
+    print(f"\n{'views':>6} {'mode':>11} {'top-1':>7} {'top-3':>7} {'views ms':>9} {'model ms':>9} {'total ms':>9}")
+    baseline = None
+    for views in args.views:
+        tta = TTAViews.from_views(views)
+        modes = ["batched", "sequential"] if args.sequential and views > 1 else ["batched"]
+        for mode in modes:
+            top1, top3, views_ms, model_ms = evaluate(engine, images, classes, tta, mode == "sequential")
+            total = views_ms + model_ms
+            baseline = baseline or (top1, total)
+            print(f"{views:>6} {mode:>11} {top1:>7.2%} {top3:>7.2%} {views_ms:>9.1f} {model_ms:>9.1f} {total:>9.1f}"
+                  f"   ({top1 - baseline[0]:+.2%} top-1, x{total / baseline[1]:.1f} latency)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Sprawdzenie model_artifacts.py na lokalnym serwerze HTTP udającym hosting modelu.
+
+Serwer obsługuje Range i potrafi zerwać połączenie po zadanej liczbie bajtów
+albo ignorować Range. Scenariusze: pierwsze pobranie, trafienie w cache, wznowienie
+po zerwaniu, serwer bez Range, zła suma SHA-256, równoczesny start kilku replik
+(procesów) - model ma zostać pobrany dokładnie raz.
+
+    python bench/check_artifacts.py --size-mb 64 --replicas 4
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_artifacts import ArtifactStore, ChecksumError
+
+
+class StandInServer:
+    """Serwer pliku z licznikami żądań i wstrzykiwaniem błędów."""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.drop_after = None    # zerwij pierwszą odpowiedź po tylu bajtach
+        self.ignore_range = False
+        self.requests = []        # (offset, wysłane bajty)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                offset = 0
+                header = self.headers.get("Range")
+                if header and not server.ignore_range:
+                    offset = int(header.split("=")[1].split("-")[0])
+                    if offset >= len(server.payload):
+                        self.send_response(416)
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {offset}-{len(server.payload) - 1}/{len(server.payload)}")
+                else:
+                    self.send_response(200)
+                body = server.payload[offset:]
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                with server._lock:
+                    drop, server.drop_after = server.drop_after, None
+                sent = body if drop is None else body[:drop]
+                self.wfile.write(sent)
+                with server._lock:
+                    server.requests.append((offset, len(sent)))
+                if drop is not None:
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/model.h5"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+
+def replica(cache_dir, url, sha256, results):
+    artifact = ArtifactStore(cache_dir, backoff=0.05).fetch(url, "v1", "model.h5", sha256)
+    results.put(artifact.cache_hit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise model_artifacts.py against a local HTTP stand-in")
+    parser.add_argument("--size-mb", type=float, default=32)
+    parser.add_argument("--replicas", type=int, default=4)
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.size_mb * 2**20))
+    sha256 = hashlib.sha256(payload).hexdigest()
+    server = StandInServer(payload)
+    failures = 0
+
+    def check(name, ok, artifact=None):
+        nonlocal failures
+        failures += not ok
+        detail = ""
+        if artifact is not None:
+            detail = (f"  size {artifact.size_bytes / 2**20:.1f} MB, {artifact.download_seconds * 1000:.0f} ms, "
+                      f"downloaded {artifact.bytes_downloaded / 2**20:.1f} MB, resumed from {artifact.resumed_from}, "
+                      f"attempts {artifact.attempts}, cache hit {artifact.cache_hit}")
+        print(f"{'PASS' if ok else 'FAIL'}  {name}{detail}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore(os.path.join(tmp, "fresh"), backoff=0.05)
+        a = store.fetch(server.url, "v1", "model.h5", sha256)
+        check("first download", not a.cache_hit and a.sha256 == sha256, a)
+        a = store.fetch(server.url, "v1", "model.h5", sha256)
+        check("cache hit", a.cache_hit and len(server.requests) == 1, a)
+
+        server.reset()
+        server.drop_after = len(payload) // 3
+        a = ArtifactStore(os.path.join(tmp, "resume"), backoff=0.05).fetch(server.url, "v1", "model.h5", sha256)
+        resumed = len(server.requests) == 2 and server.requests[1][0] == len(payload) // 3
+        check("resume after dropped connection", resumed and a.bytes_downloaded == len(payload), a)
+
+        server.reset()
+        server.ignore_range, server.drop_after = True, len(payload) // 2
+        a = ArtifactStore(os.path.join(tmp, "norange"), backoff=0.05).fetch(server.url, "v1", "model.h5", sha256)
+        server.ignore_range = False
+        check("server without Range support", a.sha256 == sha256 and a.attempts == 2, a)
+
+        bad_dir = os.path.join(tmp, "bad")
+        try:
+            ArtifactStore(bad_dir, backoff=0.05).fetch(server.url, "v1", "model.h5", "0" * 64)
+            check("checksum mismatch rejected", False)
+        except ChecksumError:
+            leftovers = [f for f in os.listdir(os.path.join(bad_dir, "v1")) if f.endswith((".h5", ".part"))]
+            check("checksum mismatch rejected, nothing left under the final name", not leftovers)
+
+        server.reset()
+        shared = os.path.join(tmp, "shared")
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=replica, args=(shared, server.url, sha256, results))
+                 for _ in range(args.replicas)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        hits = [results.get() for _ in procs]
+        check(f"{args.replicas} concurrent replicas download once",
+              len(server.requests) == 1 and hits.count(False) == 1 and all(p.exitcode == 0 for p in procs))
+        print(f"      full downloads: {len(server.requests)}, cache hits: {hits.count(True)}")
+
+    server.httpd.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
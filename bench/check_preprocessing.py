@@ -0,0 +1,87 @@
+"""
+Sprawdzenie zgodności potoku treningowego (Models' code/data_pipeline.py) z preprocessing.py.
+
+- skalowanie: data_pipeline.PREPROCESSING[...] na tensorach vs preprocess_inception /
+  preprocess_scratch na tablicach NumPy - dla wszystkich wartości 0-255 wynik ma być identyczny,
+- dekodowanie: każde rozszerzenie z IMAGE_EXTENSIONS przez make_dataset vs load_image (PIL, jak
+  flow_from_directory) - formaty bezstratne identycznie, JPEG z tolerancją (różne implementacje IDCT).
+
+    python bench/check_preprocessing.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Models' code"))
+sys.path.insert(0, ROOT)
+
+from preprocessing import IMAGE_EXTENSIONS, load_image, preprocess_inception, preprocess_scratch
+
+SHARED = {"inception": preprocess_inception, "scratch": preprocess_scratch}
+LOSSY = (".jpg", ".jpeg")
+
+
+def check_scaling():
+    import tensorflow as tf
+    from data_pipeline import PREPROCESSING
+
+    pixels = np.arange(256, dtype=np.uint8).reshape(1, 16, 16, 1).repeat(3, axis=3)
+    failures = []
+    for name, scale in PREPROCESSING.items():
+        ours = scale(tf.cast(tf.constant(pixels), tf.float32)).numpy()
+        shared = SHARED[name](pixels)
+        same = ours.dtype == shared.dtype and np.array_equal(ours, shared)
+        print(f"scale {name:<10} {'ok' if same else 'MISMATCH'} (max abs diff {np.abs(ours - shared).max():.2e})")
+        if not same:
+            failures.append(f"scale {name}")
+    return failures
+
+
+def check_decoding(jpeg_tolerance, size=(30, 40)):
+    from PIL import Image
+
+    from data_pipeline import make_dataset
+
+    failures = []
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as split_dir:
+        os.makedirs(os.path.join(split_dir, "class_a"))
+        source = rng.integers(0, 256, (*size, 3), dtype=np.uint8)
+        for ext in IMAGE_EXTENSIONS:
+            Image.fromarray(source).save(os.path.join(split_dir, "class_a", f"image{ext}"))
+
+        for name, preprocess in SHARED.items():
+            dataset, info = make_dataset(split_dir, size, batch_size=len(IMAGE_EXTENSIONS), training=False,
+                                         preprocessing=name, cache=False)
+            images, _ = next(iter(dataset))
+            for path, image in zip(info.filepaths, images.numpy()):
+                ext = os.path.splitext(path)[1].lower()
+                expected = preprocess(np.asarray(load_image(path, size, draft=False)))
+                # Tolerancja w jednostkach pikseli [0, 255]
+                diff = float(np.abs(image - expected).max()) * (255 if name == "scratch" else 127.5)
+                ok = diff <= (jpeg_tolerance if ext in LOSSY else 0)
+                print(f"decode {name:<9} {ext:<6} {'ok' if ok else 'MISMATCH'} (max diff {diff:.1f} levels)")
+                if not ok:
+                    failures.append(f"decode {name} {ext}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that data_pipeline.py matches preprocessing.py")
+    parser.add_argument("--jpeg-tolerance", type=float, default=8.0,
+                        help="allowed JPEG difference in pixel levels (TF and PIL use different IDCTs)")
+    args = parser.parse_args()
+
+    failures = check_scaling() + check_decoding(args.jpeg_tolerance)
+    if failures:
+        raise SystemExit(f"❌ data_pipeline.py differs from preprocessing.py: {', '.join(failures)}")
+    print("✅ data_pipeline.py matches preprocessing.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Raport dokładność / opóźnienie / pamięć (RSS) dla backendów inferencji na zbiorze testowym.
+
+Każdy backend działa w osobnym procesie, żeby pomiar RSS nie był zaburzony
+przez inne załadowane biblioteki (np. TensorFlow przy backendach TFLite/ONNX).
+
+    python bench/compare_backends.py --test-dir /data/CNN_project/test
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BACKEND_NAMES = ["keras", "tflite-fp16", "tflite-int8", "onnx"]
+
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def run_worker(backend, test_dir, limit):
+    """Ewaluacja jednego backendu w bieżącym procesie; wynik jako JSON na stdout."""
+    os.environ["MODEL_BACKEND"] = backend
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    from app import load_trained_model
+    from preprocessing import list_image_files, load_inception_input
+
+    engine = load_trained_model()
+    load_seconds = time.perf_counter() - start
+    tensorflow_loaded = "tensorflow" in sys.modules
+
+    filepaths, classes, _ = list_image_files(test_dir)
+    if limit:
+        filepaths, classes = filepaths[:limit], classes[:limit]
+
+    latencies, correct = [], 0
+    for path, true_class in zip(filepaths, classes):
+        img_array = load_inception_input(path)
+        t0 = time.perf_counter()
+        predictions = engine.predict(img_array)
+        latencies.append(time.perf_counter() - t0)
+        correct += int(np.argmax(predictions[0]) == true_class)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "images": len(filepaths),
+        "accuracy": correct / len(filepaths),
+        "latency_mean_ms": float(latencies.mean()),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "load_seconds": load_seconds,
+        "rss_before_mb": rss_before,
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tensorflow_imported": tensorflow_loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inference backends on the test split")
+    parser.add_argument("--test-dir", required=True)
+    parser.add_argument("--backends", nargs="+", choices=BACKEND_NAMES, default=BACKEND_NAMES)
+    parser.add_argument("--limit", type=int, default=0, help="evaluate only the first N test images")
+    parser.add_argument("--worker", choices=BACKEND_NAMES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.test_dir, args.limit)))
+        return
+
+    results = []
+    for backend in args.backends:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", backend,
+               "--test-dir", args.test_dir, "--limit", str(args.limit)]
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"⚠️ {backend} failed:\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'backend':<12} {'acc':>7} {'mean ms':>8} {'p95 ms':>8} {'load s':>7} {'RSS MB':>8} {'peak MB':>8} {'TF':>4}")
+    for r in results:
+        print(f"{r['backend']:<12} {r['accuracy']:>7.4f} {r['latency_mean_ms']:>8.2f} {r['latency_p95_ms']:>8.2f} "
+              f"{r['load_seconds']:>7.2f} {r['rss_mb']:>8.0f} {r['peak_rss_mb']:>8.0f} "
+              f"{'yes' if r['tensorflow_imported'] else 'no':>4}")
+
+
+if __name__ == "__main__":
+    main()
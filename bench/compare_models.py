@@ -0,0 +1,105 @@
+"""
+Porównanie modeli z app.MODELS (InceptionV3 vs destylowany student): rozmiar, dokładność, opóźnienie.
+
+Każdy model działa w osobnym procesie (MODEL_NAME ustawiane przed importem app),
+dane testowe są dekodowane przed pomiarem. Opóźnienie to PredictionEngine dla batcha 1
+oraz przepustowość dla batcha --batch-size.
+
+    python bench/compare_models.py --test-dir /data/CNN_project/test
+    python bench/compare_models.py --test-dir ... --models inception distilled --limit 500
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")  # pomiar tylko na CPU
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_worker(model_name, test_dir, limit, batch_size):
+    """Ewaluacja jednego modelu w bieżącym procesie; wynik jako JSON na stdout."""
+    os.environ["MODEL_NAME"] = model_name
+    os.environ["MODEL_BACKEND"] = "keras"
+    from app import download_model, load_trained_model
+    from preprocessing import list_image_files, load_inception_input
+
+    engine = load_trained_model()
+    filepaths, classes, _ = list_image_files(test_dir)
+    if limit and limit < len(filepaths):
+        pick = np.linspace(0, len(filepaths) - 1, limit).astype(int)
+        filepaths, classes = [filepaths[i] for i in pick], classes[pick]
+
+    images = np.empty((len(filepaths), 299, 299, 3), dtype=np.float32)
+    for i, path in enumerate(filepaths):
+        load_inception_input(path, out=images[i])
+
+    latencies, probs = [], []
+    for i in range(len(images)):
+        t0 = time.perf_counter()
+        probs.append(engine.predict(images[i:i + 1])[0])
+        latencies.append(time.perf_counter() - t0)
+    probs = np.stack(probs)
+    latencies = np.array(latencies) * 1000
+
+    engine.predict(images[:batch_size])  # trace kształtu batcha
+    t0 = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        engine.predict(images[start:start + batch_size])
+    throughput = len(images) / (time.perf_counter() - t0)
+
+    top3 = np.argpartition(probs, -3, axis=1)[:, -3:]
+    return {
+        "model": model_name,
+        "size_mb": os.path.getsize(download_model()) / 2**20,
+        "params_m": engine.model.count_params() / 1e6,
+        "images": len(images),
+        "top1": float(np.mean(np.argmax(probs, axis=1) == classes)),
+        "top3": float(np.mean((top3 == classes[:, None]).any(axis=1))),
+        "latency_mean_ms": float(latencies.mean()),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "throughput": throughput,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the served models (size, accuracy, CPU latency)")
+    parser.add_argument("--test-dir", required=True)
+    parser.add_argument("--models", nargs="+", default=["inception", "distilled"])
+    parser.add_argument("--limit", type=int, default=0, help="evaluate only N test images (evenly spaced)")
+    parser.add_argument("--batch-size", type=int, default=32, help="batch size for the throughput column")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.test_dir, args.limit, args.batch_size)))
+        return
+
+    results = []
+    for name in args.models:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", name, "--test-dir", args.test_dir,
+               "--limit", str(args.limit), "--batch-size", str(args.batch_size)]
+        proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"⚠️ {name} failed:\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'model':<11} {'size MB':>8} {'params M':>9} {'top-1':>7} {'top-3':>7} "
+          f"{'mean ms':>8} {'p95 ms':>8} {'img/s':>7} {'peak MB':>8}")
+    for r in results:
+        print(f"{r['model']:<11} {r['size_mb']:>8.1f} {r['params_m']:>9.2f} {r['top1']:>7.2%} {r['top3']:>7.2%} "
+              f"{r['latency_mean_ms']:>8.2f} {r['latency_p95_ms']:>8.2f} {r['throughput']:>7.1f} {r['peak_rss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Generator obciążenia dla inference_server.py.
+
+Dla każdego poziomu współbieżności (domyślnie 1/8/32 użytkowników) wysyła
+przez określony czas żądania z pojedynczym obrazem 1x299x299x3 i raportuje
+przepustowość, przepustowość na rdzeń i opóźnienia p50/p95.
+
+    python inference_server.py --port 8600 &
+    python bench/load_generator.py --url http://127.0.0.1:8600 --duration 20
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_server import RemoteClassifier
+
+
+def run_level(client, concurrency, duration, img_array):
+    """Uruchamia `concurrency` wątków klienckich na `duration` sekund."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def worker(idx):
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                client.predict(img_array)
+            except Exception:
+                errors[idx] += 1
+                continue
+            latencies[idx].append(time.perf_counter() - start)
+
+    stats_before = client.stats()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stats_after = client.stats()
+
+    all_latencies = np.array([lat for per_thread in latencies for lat in per_thread])
+    requests = len(all_latencies)
+    batches = stats_after["batches"] - stats_before["batches"]
+    images = stats_after["images"] - stats_before["images"]
+    cpu_seconds = stats_after["process_cpu_seconds"] - stats_before["process_cpu_seconds"]
+    throughput = requests / elapsed
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(errors),
+        "throughput": throughput,
+        "throughput_per_core": throughput / stats_after["cpu_count"],
+        "images_per_cpu_second": images / cpu_seconds if cpu_seconds > 0 else float("nan"),
+        "mean_batch_size": images / batches if batches else 0.0,
+        "p50_ms": float(np.percentile(all_latencies, 50) * 1000) if requests else float("nan"),
+        "p95_ms": float(np.percentile(all_latencies, 95) * 1000) if requests else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the micro-batching inference server")
+    parser.add_argument("--url", default="http://127.0.0.1:8600")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    args = parser.parse_args()
+
+    client = RemoteClassifier(args.url)
+    rng = np.random.default_rng(0)
+    img_array = rng.uniform(-1.0, 1.0, size=(1, 299, 299, 3)).astype(np.float32)
+
+    # Rozgrzewka - pierwsze wywołanie modelu jest zawsze wolniejsze
+    client.predict(img_array)
+
+    header = f"{'users':>6} {'req':>7} {'err':>4} {'req/s':>8} {'req/s/core':>11} {'img/cpu-s':>10} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8}"
+    print(header)
+    for concurrency in args.concurrency:
+        r = run_level(client, concurrency, args.duration, img_array)
+        print(f"{r['concurrency']:>6} {r['requests']:>7} {r['errors']:>4} {r['throughput']:>8.2f} "
+              f"{r['throughput_per_core']:>11.3f} {r['images_per_cpu_second']:>10.2f} {r['mean_batch_size']:>6.2f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
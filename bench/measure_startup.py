@@ -0,0 +1,104 @@
+"""
+Pomiar czasu startu aplikacji: time-to-first-render i time-to-first-prediction.
+
+Każdy pomiar działa w świeżym procesie Pythona i liczony jest od momentu jego
+uruchomienia (razem ze startem interpretera i importami).
+
+- first render: pierwsze wykonanie skryptu app.py (Streamlit AppTest) dla każdej strony,
+- first prediction: import app, załadowanie modelu i predykcja na syntetycznym zdjęciu.
+
+    python bench/measure_startup.py --repeats 3
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ["Prediction", "Species List", "Usage", "Credits"]
+
+
+def elapsed_since_spawn():
+    return time.time() - float(os.environ["STARTUP_SPAWN_TIME"])
+
+
+def worker_render(page):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    if page != PAGES[0]:
+        # Pierwszy run zawsze renderuje domyślną stronę; wybór strony wymaga ponownego runu
+        at.run()
+        at.sidebar.radio[0].set_value(page)
+    at.run()
+    render_seconds = elapsed_since_spawn()
+    return {"page": page, "seconds": render_seconds, "exception": bool(at.exception)}
+
+
+def worker_predict():
+    import numpy as np
+    from PIL import Image
+
+    sys.path.insert(0, ROOT)
+    import app
+    from preprocessing import load_inception_input
+
+    import_seconds = elapsed_since_spawn()
+    engine = app.get_model_loader().get()
+    load_seconds = elapsed_since_spawn()
+
+    buf = io.BytesIO()
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8)).save(buf, format="JPEG")
+    buf.seek(0)
+    engine.predict(load_inception_input(buf))
+    return {
+        "import_seconds": import_seconds,
+        "model_ready_seconds": load_seconds,
+        "seconds": elapsed_since_spawn(),
+        "tensorflow_imported": "tensorflow" in sys.modules,
+    }
+
+
+def spawn(args):
+    env = dict(os.environ, STARTUP_SPAWN_TIME=repr(time.time()))
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__)] + args,
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time-to-first-render and time-to-first-prediction")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--worker", choices=["render", "predict"], help=argparse.SUPPRESS)
+    parser.add_argument("--page", default=PAGES[0], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == "render":
+        print(json.dumps(worker_render(args.page)))
+        return
+    if args.worker == "predict":
+        print(json.dumps(worker_predict()))
+        return
+
+    print(f"{'measurement':<34} {'min s':>7} {'median s':>9}")
+    for page in PAGES:
+        times = sorted(spawn(["--worker", "render", "--page", page])["seconds"] for _ in range(args.repeats))
+        print(f"{'first render: ' + page:<34} {times[0]:>7.2f} {times[len(times) // 2]:>9.2f}")
+
+    results = [spawn(["--worker", "predict"]) for _ in range(args.repeats)]
+    for key, name in [("import_seconds", "import app"), ("model_ready_seconds", "model ready"),
+                      ("seconds", "first prediction")]:
+        times = sorted(r[key] for r in results)
+        print(f"{name:<34} {times[0]:>7.2f} {times[len(times) // 2]:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Przegląd konfiguracji puli inferencji: liczba procesów x wątki intra-op na proces.
+
+Dla każdej pary (workers, threads) z workers * threads <= liczba rdzeni (albo wszystkich
+par z --oversubscribe) uruchamia worker_pool.WorkerPool i obciąża go tak jak
+load_generator.py: --concurrency wątków klienckich wysyła pojedyncze obrazy 1x299x299x3
+przez --duration sekund. Na końcu podaje konfigurację o największej przepustowości.
+
+    python bench/sweep_workers.py --workers 1 2 4 8 --threads 1 2 4 8 --concurrency 32
+    MODEL_BACKEND=keras-mmap python bench/sweep_workers.py   # workery współdzielą wagi
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_generator import run_level
+from worker_pool import WorkerPool, available_cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep inference workers x intra-op threads for throughput")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8], help="intra-op threads per worker")
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per configuration")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--oversubscribe", action="store_true", help="also run configs with workers x threads > cores")
+    parser.add_argument("--output", help="write all results as JSON")
+    args = parser.parse_args()
+
+    cores = len(available_cpus())
+    configs = [(w, t) for w in args.workers for t in args.threads if args.oversubscribe or w * t <= cores]
+    rng = np.random.default_rng(0)
+    img_array = rng.uniform(-1.0, 1.0, size=(1, 299, 299, 3)).astype(np.float32)
+
+    print(f"{cores} cores available, concurrency {args.concurrency}, {args.duration:.0f} s per config")
+    print(f"{'workers':>7} {'threads':>7} {'req/s':>8} {'img/cpu-s':>10} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8} {'err':>4}")
+    results = []
+    for workers, threads in configs:
+        # WorkerPool wraca, gdy każdy worker odpowiada, a workery rozgrzewają model przy ładowaniu (engine.warmup)
+        with WorkerPool(workers, threads, args.inter_op_threads, args.max_batch_size, args.max_wait_ms) as pool:
+            r = run_level(pool, args.concurrency, args.duration, img_array)
+        r.update(workers=workers, threads=threads)
+        results.append(r)
+        print(f"{workers:>7} {threads:>7} {r['throughput']:>8.2f} {r['images_per_cpu_second']:>10.2f} "
+              f"{r['mean_batch_size']:>6.2f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['errors']:>4}")
+
+    if results:
+        best = max(results, key=lambda r: r["throughput"])
+        print(f"\nBest: INFERENCE_WORKERS={best['workers']} WORKER_INTRA_OP_THREADS={best['threads']} "
+              f"WORKER_INTER_OP_THREADS={args.inter_op_threads} ({best['throughput']:.2f} req/s, p95 {best['p95_ms']:.1f} ms)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Budowa indeksu embeddingów (embedding_index.py) dla zdjęć treningowych serwowanego modelu.
+
+Embeddingi z przedostatniej warstwy modelu wybranego w app.py (MODEL_NAME, backend keras
+albo keras-mmap) są liczone batchami dla całego zbioru treningowego. Próg OOD jest kalibrowany
+na zbiorze testowym: kwantyl odległości zdjęcia testowego do najbliższego zdjęcia treningowego.
+
+    python build_embedding_index.py --train-dir /data/CNN_project/train --test-dir /data/CNN_project/test
+    python build_embedding_index.py --train-dir ... --test-dir ... --dtype int8 --nlist 100
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from embedding_index import EmbeddingIndex, embedding_model
+from preprocessing import list_image_files, load_inception_input
+
+
+def compute_embeddings(engine, filepaths, batch_size=32):
+    """Embeddingi (N x dim) dla listy plików; dekodowanie do jednego bufora batcha."""
+    batch = np.empty((batch_size, 299, 299, 3), dtype=np.float32)
+    chunks = []
+    for start in range(0, len(filepaths), batch_size):
+        paths = filepaths[start:start + batch_size]
+        for i, path in enumerate(paths):
+            load_inception_input(path, out=batch[i])
+        chunks.append(engine.predict(batch[:len(paths)]))
+        if (start // batch_size + 1) % 20 == 0:
+            print(f"{start + len(paths)}/{len(filepaths)}", file=sys.stderr)
+    return np.concatenate(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the nearest-neighbour embedding index of the training images")
+    parser.add_argument("--train-dir", required=True, help="training split (class subfolders) - reference photos")
+    parser.add_argument("--test-dir", help="test split for the out-of-distribution threshold")
+    parser.add_argument("--out", help="index directory (default: EMBEDDING_INDEX from app.py)")
+    parser.add_argument("--dtype", choices=["float16", "int8"], default="float16")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = exact search only)")
+    parser.add_argument("--quantile", type=float, default=0.95,
+                        help="test images closer than the OOD threshold (in-distribution acceptance rate)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    import app
+    from engine import PredictionEngine
+
+    engine = PredictionEngine(embedding_model(app.load_trained_model().model))
+    start = time.perf_counter()
+    filepaths, classes, _ = list_image_files(args.train_dir)
+    embeddings = compute_embeddings(engine, filepaths, args.batch_size)
+    index = EmbeddingIndex.build(embeddings, classes, filepaths, args.dtype, args.nlist)
+    print(f"Indexed {len(index)} training images ({index.meta['dim']}-d, {args.dtype}, "
+          f"{index.nbytes / 2**20:.1f} MB) in {time.perf_counter() - start:.0f} s")
+
+    if args.test_dir:
+        test_paths, test_classes, _ = list_image_files(args.test_dir)
+        test_embeddings = compute_embeddings(engine, test_paths, args.batch_size)
+        threshold = index.calibrate_ood(test_embeddings, args.quantile)
+        neighbours = index.search(test_embeddings, k=1)
+        print(f"OOD threshold (distance, {args.quantile:.0%} of test images accepted): {threshold:.4f}; "
+              f"nearest-neighbour top-1 accuracy on test: {np.mean(neighbours.classes[:, 0] == test_classes):.2%}")
+
+    out = args.out or app.EMBEDDING_INDEX
+    index.save(out, model_version=app.MODEL_VERSION)
+    print(f"✅ Embedding index saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
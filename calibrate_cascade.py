@@ -0,0 +1,141 @@
+"""
+Dobór progów kaskady (cascade.py) na zbiorze testowym i raport jej kosztu.
+
+Oba modele klasyfikują każde zdjęcie testowe raz - zapisywane są prawdopodobieństwa
+oraz czas (ścienny i CPU) dekodowania i predykcji każdego stopnia. Potem dla siatki
+progów (confidence x margin) liczona jest wektorowo dokładność kaskady i odsetek
+eskalacji; wybierane są progi z najmniejszą liczbą wywołań InceptionV3, przy których
+dokładność nie spada poniżej celu.
+
+    python calibrate_cascade.py --test-dir /data/CNN_project/test --scratch-model model/model_scratch.h5
+    python calibrate_cascade.py --test-dir ... --target-accuracy 0.97 --out model/cascade.json
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from cascade import confidence_margin, save_thresholds
+from preprocessing import SCRATCH_SIZE, list_image_files, load_image, load_inception_input, preprocess_scratch
+
+
+def timed(fn, *args):
+    """(wynik, sekundy ścienne, sekundy CPU procesu)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def run_models(filepaths, scratch, full):
+    """Prawdopodobieństwa obu modeli i koszt każdego stopnia dla każdego zdjęcia."""
+    n = len(filepaths)
+    cost = {name: np.zeros(n) for name in ("scratch_ms", "scratch_cpu_ms", "full_ms", "full_cpu_ms")}
+    scratch_probs, full_probs = [], []
+
+    def scratch_stage(path):
+        return scratch.predict(preprocess_scratch(np.asarray(load_image(path, SCRATCH_SIZE)))[np.newaxis])[0]
+
+    def full_stage(path):
+        return full.predict(load_inception_input(path))[0]
+
+    for i, path in enumerate(filepaths):
+        probs, wall, cpu = timed(scratch_stage, path)
+        scratch_probs.append(probs)
+        cost["scratch_ms"][i], cost["scratch_cpu_ms"][i] = wall * 1000, cpu * 1000
+        probs, wall, cpu = timed(full_stage, path)
+        full_probs.append(probs)
+        cost["full_ms"][i], cost["full_cpu_ms"][i] = wall * 1000, cpu * 1000
+        if (i + 1) % 200 == 0:
+            print(f"{i + 1}/{n}", file=sys.stderr)
+    return np.stack(scratch_probs), np.stack(full_probs), cost
+
+
+def search_thresholds(scratch_probs, full_probs, classes, target_accuracy, steps=101):
+    """Progi (confidence, margin) z najmniejszym odsetkiem eskalacji przy dokładności >= target.
+
+    Zwraca (confidence, margin, dokładność, odsetek eskalacji) albo None, jeśli cel jest nieosiągalny.
+    """
+    scratch_correct = np.argmax(scratch_probs, axis=1) == classes
+    full_correct = np.argmax(full_probs, axis=1) == classes
+    confidence, margin = confidence_margin(scratch_probs)
+    grid = np.linspace(0.0, 1.0, steps)
+
+    best = None
+    for conf_threshold in grid:
+        # Wszystkie progi margin naraz: (progi, zdjęcia)
+        escalate = (confidence < conf_threshold)[None, :] | (margin[None, :] < grid[:, None])
+        accuracy = np.where(escalate, full_correct, scratch_correct).mean(axis=1)
+        rate = escalate.mean(axis=1)
+        ok = np.flatnonzero(accuracy >= target_accuracy)
+        if len(ok) == 0:
+            continue
+        j = ok[np.argmin(rate[ok])]
+        if best is None or rate[j] < best[3]:
+            best = (float(conf_threshold), float(grid[j]), float(accuracy[j]), float(rate[j]))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate scratch-CNN -> InceptionV3 cascade thresholds")
+    parser.add_argument("--test-dir", required=True)
+    parser.add_argument("--scratch-model", default=None, help="scratch CNN .h5 (default: SCRATCH_MODEL_PATH)")
+    parser.add_argument("--target-accuracy", type=float, default=None,
+                        help="required cascade top-1 accuracy (default: InceptionV3 accuracy minus --max-drop)")
+    parser.add_argument("--max-drop", type=float, default=0.005)
+    parser.add_argument("--out", default=None, help="thresholds JSON (default: CASCADE_THRESHOLDS)")
+    parser.add_argument("--limit", type=int, default=0, help="use only N test images (evenly spaced)")
+    args = parser.parse_args()
+
+    from app import CASCADE_THRESHOLDS, SCRATCH_MODEL_PATH, load_scratch_model, load_trained_model
+
+    filepaths, classes, _ = list_image_files(args.test_dir)
+    if args.limit and args.limit < len(filepaths):
+        pick = np.linspace(0, len(filepaths) - 1, args.limit).astype(int)
+        filepaths, classes = [filepaths[i] for i in pick], classes[pick]
+
+    scratch = load_scratch_model(args.scratch_model or SCRATCH_MODEL_PATH)
+    full = load_trained_model()
+    scratch_probs, full_probs, cost = run_models(filepaths, scratch, full)
+
+    scratch_acc = float(np.mean(np.argmax(scratch_probs, axis=1) == classes))
+    full_acc = float(np.mean(np.argmax(full_probs, axis=1) == classes))
+    target = args.target_accuracy if args.target_accuracy is not None else full_acc - args.max_drop
+    best = search_thresholds(scratch_probs, full_probs, classes, target)
+    if best is None:
+        raise SystemExit(f"target accuracy {target:.2%} is not reachable (InceptionV3 alone: {full_acc:.2%})")
+    conf_threshold, margin_threshold, accuracy, rate = best
+
+    # Koszt kaskady na zdjęcie: model autorski zawsze, InceptionV3 (z dekodowaniem 299x299) przy eskalacji
+    confidence, margin = confidence_margin(scratch_probs)
+    escalate = (confidence < conf_threshold) | (margin < margin_threshold)
+    cascade_ms = cost["scratch_ms"] + escalate * cost["full_ms"]
+    cascade_cpu_ms = cost["scratch_cpu_ms"] + escalate * cost["full_cpu_ms"]
+
+    print(f"\nimages: {len(filepaths)}, target accuracy: {target:.2%}")
+    print(f"thresholds: confidence >= {conf_threshold:.2f}, margin >= {margin_threshold:.2f}")
+    print(f"\n{'mode':<14} {'top-1':>7} {'escalated':>10} {'mean ms':>9} {'p95 ms':>9} {'CPU ms':>9}")
+    rows = [
+        ("scratch only", scratch_acc, 0.0, cost["scratch_ms"], cost["scratch_cpu_ms"]),
+        ("InceptionV3", full_acc, 1.0, cost["full_ms"], cost["full_cpu_ms"]),
+        ("cascade", accuracy, rate, cascade_ms, cascade_cpu_ms),
+    ]
+    for name, acc, esc, ms, cpu_ms in rows:
+        print(f"{name:<14} {acc:>7.2%} {esc:>10.1%} {ms.mean():>9.1f} {np.percentile(ms, 95):>9.1f} {cpu_ms.mean():>9.1f}")
+    print(f"\nshort-circuited by the scratch CNN: {1 - rate:.1%} of requests")
+
+    out = args.out or CASCADE_THRESHOLDS
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    save_thresholds(
+        out, conf_threshold, margin_threshold,
+        target_accuracy=target, accuracy=accuracy, escalation_rate=rate,
+        scratch_accuracy=scratch_acc, full_accuracy=full_acc, images=len(filepaths),
+        mean_ms=float(cascade_ms.mean()), mean_cpu_ms=float(cascade_cpu_ms.mean()),
+    )
+    print(f"✅ thresholds saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Kaskada modeli: najpierw mały model autorski (224x224), InceptionV3 tylko gdy ten jest niepewny.
+
+Model autorski odpowiada sam, jeśli jego najwyższe prawdopodobieństwo (confidence)
+i przewaga nad drugą klasą (margin) są nie mniejsze niż progi. Progi dobiera
+calibrate_cascade.py na zbiorze testowym tak, żeby osiągnąć zadaną dokładność przy
+jak najmniejszej liczbie wywołań InceptionV3. Oba modele mają tę samą kolejność klas
+(flow_from_directory na tym samym katalogu Species).
+"""
+
+import json
+import threading
+
+import numpy as np
+
+from preprocessing import SCRATCH_SIZE, load_image, load_inception_input, preprocess_scratch
+
+
+def confidence_margin(probs):
+    """Najwyższe prawdopodobieństwo i różnica do drugiego; probs (C,) albo (N, C)."""
+    top2 = np.partition(np.asarray(probs), -2, axis=-1)[..., -2:]
+    return top2[..., 1], top2[..., 1] - top2[..., 0]
+
+
+def should_escalate(probs, confidence_threshold, margin_threshold):
+    """True tam, gdzie predykcja modelu autorskiego wymaga InceptionV3."""
+    confidence, margin = confidence_margin(probs)
+    return (confidence < confidence_threshold) | (margin < margin_threshold)
+
+
+def load_thresholds(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_thresholds(path, confidence, margin, **report):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"confidence": confidence, "margin": margin, **report}, f, indent=2)
+
+
+class CascadeClassifier:
+    """Klasyfikacja pojedynczego zdjęcia kaskadą; predict_fn-y przyjmują gotowe batche."""
+
+    def __init__(self, scratch_predict, full_predict, confidence_threshold, margin_threshold=0.0):
+        self.scratch_predict = scratch_predict
+        self.full_predict = full_predict
+        self.confidence_threshold = confidence_threshold
+        self.margin_threshold = margin_threshold
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "escalated": 0}
+
+    @classmethod
+    def from_file(cls, scratch_predict, full_predict, thresholds_path):
+        thresholds = load_thresholds(thresholds_path)
+        return cls(scratch_predict, full_predict, thresholds["confidence"], thresholds["margin"])
+
+    def classify(self, source, full_predict=None):
+        """Zwraca (prawdopodobieństwa, czy użyto InceptionV3).
+
+        Obraz 299x299 dla InceptionV3 jest dekodowany tylko przy eskalacji;
+        full_predict nadpisuje funkcję drugiego stopnia dla tego wywołania.
+        """
+        pixels = np.asarray(load_image(source, SCRATCH_SIZE))
+        probs = self.scratch_predict(preprocess_scratch(pixels)[np.newaxis])[0]
+        escalated = bool(should_escalate(probs, self.confidence_threshold, self.margin_threshold))
+        if escalated:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            probs = (full_predict or self.full_predict)(load_inception_input(source))[0]
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["escalated"] += int(escalated)
+        return probs, escalated
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["short_circuit_rate"] = (
+            1 - stats["escalated"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
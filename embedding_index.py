@@ -0,0 +1,218 @@
+"""
+Indeks embeddingów zdjęć referencyjnych: najbliżsi sąsiedzi i odrzucanie spoza zbioru klas.
+
+Embedding to 512-wymiarowe wyjście przedostatniej warstwy serwowanego modelu
+(Dense(512) -> BN), znormalizowane do długości 1 - odległość to 1 - podobieństwo cosinusowe.
+
+- wektory przechowywane jako float16 albo int8 (skala na wektor), wczytywane przez mmap,
+- wyszukiwanie dokładne (brute force, mnożenie macierzy blokami float32) albo IVF:
+  wektory posortowane według listy k-means, przeszukiwane tylko nprobe najbliższych list,
+- flaga OOD: odległość do najbliższego zdjęcia referencyjnego większa niż kwantyl
+  tej odległości dla zdjęć testowych (z klas znanych modelowi).
+
+Indeks buduje build_embedding_index.py; katalog indeksu:
+vectors.npy, scales.npy (int8), classes.npy, paths.txt, centroids.npy + offsets.npy (IVF), meta.json.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+CHUNK_ROWS = 16384  # wiersze konwertowane naraz do float32 przy wyszukiwaniu
+
+# Wynik search(): tablice (zapytania, k)
+Neighbours = namedtuple("Neighbours", ["indices", "distances", "classes", "paths"])
+
+
+def embedding_model(model, with_probs=False):
+    """Model Keras zwracający embedding z przedostatniej warstwy (z with_probs: [prawdopodobieństwa | embedding])."""
+    import tensorflow as tf
+
+    embedding = model.layers[-2].output
+    outputs = tf.keras.layers.Concatenate()([model.output, embedding]) if with_probs else embedding
+    return tf.keras.Model(model.inputs, outputs)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype):
+    """float32 -> (wektory w dtype, skale na wektor albo None)."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if dtype == "float32":
+        return vectors.astype(np.float32), None
+    raise ValueError(f"Unknown index dtype '{dtype}'")
+
+
+def kmeans(vectors, nlist, iterations=10, sample_size=None, seed=0):
+    """Sferyczny k-means (centroidy o długości 1) na próbce wektorów; zwraca centroidy nlist x dim."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or 256 * nlist)
+    sample = normalize(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids):
+    """Numer listy IVF dla każdego wektora (blokami - bez macierzy N x nlist w pamięci)."""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), CHUNK_ROWS):
+        block = np.asarray(vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+class EmbeddingIndex:
+    """Wektory zdjęć referencyjnych z klasami i ścieżkami; opcjonalnie podzielone na listy IVF."""
+
+    def __init__(self, vectors, classes, paths, scales=None, centroids=None, offsets=None,
+                 ood_threshold=None, meta=None):
+        self.vectors = vectors
+        self.classes = classes
+        self.paths = paths
+        self.scales = scales
+        self.centroids = centroids
+        self.offsets = offsets  # lista i zajmuje wiersze offsets[i]:offsets[i + 1]
+        self.ood_threshold = ood_threshold
+        self.meta = meta or {}
+
+    @classmethod
+    def build(cls, embeddings, classes, paths, dtype="float16", nlist=0, seed=0):
+        """Indeks z embeddingów float32 (N x dim); nlist > 0 - z listami IVF."""
+        vectors = normalize(embeddings)
+        classes = np.asarray(classes, dtype=np.int16)
+        paths = np.asarray(paths, dtype=object)
+        centroids = offsets = None
+        if nlist:
+            centroids = kmeans(vectors, nlist, seed=seed)
+            assign = assign_lists(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            vectors, classes, paths = vectors[order], classes[order], paths[order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        vectors, scales = quantize(vectors, dtype)
+        return cls(vectors, classes, paths, scales, centroids, offsets,
+                   meta={"dtype": dtype, "dim": int(vectors.shape[1]), "nlist": int(nlist)})
+
+    @property
+    def nbytes(self):
+        """Pamięć tablic indeksu (bez ścieżek)."""
+        arrays = (self.vectors, self.classes, self.scales, self.centroids, self.offsets)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    # --- Zapis / odczyt ---
+
+    def save(self, directory, **meta):
+        """Zapisuje indeks do katalogu; meta (np. model_version) trafia do meta.json."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "classes.npy"), self.classes)
+        for name in ("scales", "centroids", "offsets"):
+            path = os.path.join(directory, f"{name}.npy")
+            if getattr(self, name) is not None:
+                np.save(path, getattr(self, name))
+            elif os.path.exists(path):
+                os.remove(path)
+        with open(os.path.join(directory, "paths.txt"), "w", encoding="utf-8") as f:
+            f.writelines(f"{path}\n" for path in self.paths)
+        self.meta.update(meta, format_version=FORMAT_VERSION, count=len(self), ood_threshold=self.ood_threshold)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Wczytuje indeks; z mmap wektory są mapowane tylko do odczytu (wspólne strony dla procesów)."""
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{directory}: unsupported embedding index format {meta.get('format_version')}")
+
+        def optional(name):
+            path = os.path.join(directory, f"{name}.npy")
+            return np.load(path) if os.path.exists(path) else None
+
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None)
+        with open(os.path.join(directory, "paths.txt"), encoding="utf-8") as f:
+            paths = np.array(f.read().splitlines(), dtype=object)
+        return cls(vectors, np.load(os.path.join(directory, "classes.npy")), paths, optional("scales"),
+                   optional("centroids"), optional("offsets"), meta.get("ood_threshold"), meta)
+
+    # --- Wyszukiwanie ---
+
+    def _similarities(self, queries, start, stop):
+        """Podobieństwa cosinusowe zapytań (n x dim, float32) do wierszy start:stop."""
+        out = np.empty((len(queries), stop - start), dtype=np.float32)
+        for s in range(start, stop, CHUNK_ROWS):
+            e = min(s + CHUNK_ROWS, stop)
+            np.matmul(queries, np.asarray(self.vectors[s:e], dtype=np.float32).T, out=out[:, s - start:e - start])
+            if self.scales is not None:
+                out[:, s - start:e - start] *= self.scales[s:e]
+        return out
+
+    def _top_k(self, similarities, k, row_ids=None):
+        k = min(k, similarities.shape[1])
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        top, top_sims = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_sims, order, axis=1)
+        if row_ids is not None:
+            top = row_ids[top]
+        return top, 1.0 - top_sims
+
+    def search(self, queries, k=5, nprobe=None):
+        """k najbliższych zdjęć referencyjnych dla każdego zapytania (embedding albo batch embeddingów).
+
+        nprobe: liczba przeszukiwanych list IVF (None - dokładnie, cały indeks).
+        """
+        queries = normalize(np.atleast_2d(queries))
+        if nprobe is None or self.centroids is None:
+            indices, distances = self._top_k(self._similarities(queries, 0, len(self)), k)
+        else:
+            indices = np.empty((len(queries), min(k, len(self))), dtype=np.int64)
+            distances = np.empty(indices.shape, dtype=np.float32)
+            nearest_lists = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+            for q, lists in enumerate(nearest_lists):
+                ranges = [(self.offsets[i], self.offsets[i + 1]) for i in lists if self.offsets[i + 1] > self.offsets[i]]
+                row_ids = np.concatenate([np.arange(a, b) for a, b in ranges])
+                sims = np.concatenate([self._similarities(queries[q:q + 1], a, b) for a, b in ranges], axis=1)
+                top, dist = self._top_k(sims, indices.shape[1], row_ids)
+                # Za mało kandydatów w nprobe listach - brakujące miejsca jako -1 / inf
+                indices[q], distances[q] = -1, np.inf
+                indices[q, :top.shape[1]], distances[q, :top.shape[1]] = top[0], dist[0]
+        valid = indices >= 0
+        safe = np.where(valid, indices, 0)
+        return Neighbours(indices, distances, np.where(valid, self.classes[safe], -1), self.paths[safe])
+
+    # --- Odrzucanie spoza zbioru klas ---
+
+    def calibrate_ood(self, queries, quantile=0.95, nprobe=None):
+        """Próg OOD: kwantyl odległości do najbliższego sąsiada dla zdjęć ze znanych klas (np. zbiór testowy)."""
+        nearest = self.search(queries, k=1, nprobe=nprobe).distances[:, 0]
+        self.ood_threshold = float(np.quantile(nearest, quantile))
+        self.meta["ood_quantile"] = quantile
+        return self.ood_threshold
+
+    def is_ood(self, neighbours):
+        """True dla zapytań dalszych od najbliższego zdjęcia referencyjnego niż próg OOD."""
+        if self.ood_threshold is None:
+            return np.zeros(len(neighbours.distances), dtype=bool)
+        return neighbours.distances[:, 0] > self.ood_threshold
@@ -0,0 +1,51 @@
+"""
+Predykcja modelem Keras przez tf.function - wspólna dla app.py, serwera inferencji i skryptów offline.
+
+Tylko TensorFlow i NumPy: import nie uruchamia konfiguracji aplikacji (Streamlit, zmienne środowiskowe,
+ArtifactStore, indeks gatunków), więc narzędzia treningowe mogą mierzyć opóźnienie tak jak przy serwowaniu.
+"""
+
+import numpy as np
+
+INPUT_SHAPE = (299, 299, 3)
+
+
+class PredictionEngine:
+    """Predykcja przez skompilowany tf.function zamiast pętli model.predict.
+
+    model.predict przy każdym wywołaniu buduje adapter danych i całą pętlę predykcji,
+    co dla pojedynczego obrazu na CPU kosztuje więcej niż sam forward pass.
+    Stała sygnatura (None, 299, 299, 3) oznacza jeden graf dla każdego rozmiaru batcha.
+    """
+
+    def __init__(self, model, jit_compile=False, input_shape=INPUT_SHAPE):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = model
+        self.jit_compile = jit_compile
+        self.input_shape = input_shape
+        self._forward = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None,) + input_shape, dtype=tf.float32)],
+            jit_compile=jit_compile,
+        )
+
+    def warmup(self, batch_size=1):
+        """Wymusza trace (i kompilację XLA) przed pierwszym żądaniem użytkownika."""
+        self.predict(np.zeros((batch_size,) + self.input_shape, dtype=np.float32))
+
+    def predict(self, img_array):
+        return self._forward(self._tf.convert_to_tensor(img_array, dtype=self._tf.float32)).numpy()
+
+
+def set_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """Pule wątków TensorFlow - tylko przed pierwszą operacją TF w procesie (worker inference_server.py)."""
+    if not (intra_op_threads or inter_op_threads):
+        return
+    import tensorflow as tf
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
@@ -0,0 +1,123 @@
+"""
+Eksport modelu model.h5 do TFLite (float16, pełne INT8), ONNX, SavedModel
+i płaskiego formatu wag mapowanego do pamięci (flat_weights.py).
+
+Kwantyzacja INT8 wymaga reprezentatywnego zbioru - próbka obrazów ze zbioru
+testowego (ten sam katalog 'test' co w CNN_model_inception.py).
+
+    python export_model.py --formats tflite-fp16 tflite-int8 onnx --test-dir /data/CNN_project/test
+    python export_model.py --formats savedmodel keras-mmap
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from backends import BACKEND_FILES
+from flat_weights import bin_path, save_flat_weights
+from preprocessing import list_image_files, load_inception_input
+
+MODEL_DIR = "model"
+MODEL_PATH = os.path.join(MODEL_DIR, "model.h5")
+
+
+def representative_dataset(test_dir, num_samples=200, seed=0):
+    """Losowa (powtarzalna) próbka obrazów testowych do kalibracji zakresów INT8."""
+    filepaths, _, _ = list_image_files(test_dir)
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(filepaths), size=min(num_samples, len(filepaths)), replace=False)
+
+    def generator():
+        for idx in chosen:
+            yield [load_inception_input(filepaths[idx])]
+
+    return generator
+
+
+def export_tflite(model, out_path, quantization, test_dir=None, num_samples=200):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if test_dir is None:
+            raise ValueError("INT8 quantization needs --test-dir for the representative dataset")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(test_dir, num_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    else:
+        raise ValueError(f"Unknown quantization '{quantization}'")
+
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, out_path, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, 299, 299, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=out_path)
+
+
+def export_savedmodel(model, out_path):
+    """SavedModel z jedną sygnaturą serving_default: input (None, 299, 299, 3) -> output."""
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec((None, 299, 299, 3), tf.float32, name="input")])
+    def serve(x):
+        return {"output": model(x, training=False)}
+
+    tf.saved_model.save(model, out_path, signatures={"serving_default": serve})
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model.h5 to TFLite / ONNX / SavedModel / flat mmap weights")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out-dir", default=MODEL_DIR)
+    parser.add_argument("--formats", nargs="+", choices=list(BACKEND_FILES),
+                        help="default: all formats (tflite-int8 only with --test-dir)")
+    parser.add_argument("--test-dir", help="test split directory (class subfolders), needed for INT8")
+    parser.add_argument("--num-samples", type=int, default=200, help="representative images for INT8")
+    args = parser.parse_args()
+
+    # Walidacja przed eksportem - błąd w połowie zostawiałby część plików nowej, a część starej wersji
+    if args.formats is None:
+        args.formats = [fmt for fmt in BACKEND_FILES if fmt != "tflite-int8" or args.test_dir]
+        if not args.test_dir:
+            print("ℹ️ tflite-int8 skipped - pass --test-dir to export it")
+    elif "tflite-int8" in args.formats and not args.test_dir:
+        parser.error("tflite-int8 needs --test-dir for the representative dataset")
+
+    from tensorflow.keras.models import load_model
+
+    model = load_model(args.model)
+    for fmt in args.formats:
+        out_path = os.path.join(args.out_dir, BACKEND_FILES[fmt])
+        if fmt == "tflite-fp16":
+            export_tflite(model, out_path, "float16")
+        elif fmt == "tflite-int8":
+            export_tflite(model, out_path, "int8", args.test_dir, args.num_samples)
+        elif fmt == "onnx":
+            export_onnx(model, out_path)
+        elif fmt == "savedmodel":
+            export_savedmodel(model, out_path)
+        else:
+            save_flat_weights(model, out_path)
+            out_path = bin_path(out_path)
+        print(f"✅ {fmt}: {out_path} ({dir_size(out_path) / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Płaski format wag mapowany do pamięci - szybsza alternatywa dla model.h5.
+
+- <nazwa>.json: architektura (model.to_json() z inicjalizatorami zamienionymi na Zeros)
+  i lista wag w kolejności model.weights: nazwa, kształt, dtype, offset w pliku .bin,
+- <nazwa>.bin: surowe wagi little-endian jedna po drugiej, każda wyrównana do 64 bajtów.
+
+Przy ładowaniu .bin jest mapowany copy-on-write (np.memmap mode="c" - nikt do niego nie pisze),
+a zmienne warstw są podmieniane na stałe tensory nad zmapowanymi tablicami. Tensory powstają
+przez DLPack, który przejmuje bufor bez kopii (tf.convert_to_tensor / tf.constant kopiują tablicę),
+więc procesy na jednym hoście korzystają z tych samych stron page cache zamiast trzymać własną
+kopię wag (h5py: odczyt + kopia w każdym procesie).
+"""
+
+import json
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+ALIGNMENT = 64  # EIGEN_MAX_ALIGN_BYTES - wyrównanie wymagane od bufora tensora TensorFlow
+
+
+def bin_path(path):
+    return os.path.splitext(path)[0] + ".bin"
+
+
+def _zero_initializers(config):
+    """Inicjalizatory w konfiguracji -> Zeros: wagi i tak zostaną podmienione, a losowanie kosztuje."""
+    if isinstance(config, dict):
+        return {key: {"class_name": "Zeros", "config": {}}
+                if key.endswith("_initializer") and isinstance(value, dict) and "class_name" in value
+                else _zero_initializers(value)
+                for key, value in config.items()}
+    if isinstance(config, list):
+        return [_zero_initializers(value) for value in config]
+    return config
+
+
+def save_flat_weights(model, path):
+    """Zapisuje model Keras jako <path> (.json) i wagi obok (.bin); zwraca rozmiar .bin w bajtach."""
+    entries = []
+    offset = 0
+    with open(bin_path(path), "wb") as f:
+        for variable in model.weights:
+            array = np.ascontiguousarray(variable.numpy())
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+            padding = -offset % ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            entries.append({"name": variable.name, "shape": list(array.shape),
+                            "dtype": array.dtype.name, "offset": offset})
+            f.write(array.tobytes())
+            offset += array.nbytes
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "architecture": _zero_initializers(json.loads(model.to_json())),
+        "weights": entries,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return offset
+
+
+def map_weights(path):
+    """Manifest i lista (nazwa, tablica) - tablice to widoki na plik .bin zmapowany copy-on-write.
+
+    Nie tylko do odczytu: DLPack nie eksportuje tablic read-only. Niezapisane strony mapowania
+    prywatnego to nadal strony page cache wspólne dla procesów, a plik na dysku się nie zmienia.
+    """
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported flat weights format {manifest.get('format_version')}")
+
+    data = np.memmap(bin_path(path), dtype=np.uint8, mode="c")
+    arrays = []
+    for entry in manifest["weights"]:
+        dtype = np.dtype(entry["dtype"]).newbyteorder("<")
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+        arrays.append((entry["name"], array))
+    return manifest, arrays
+
+
+def load_flat_model(path):
+    """Model Keras z wagami wskazującymi na zmapowany plik .bin.
+
+    Zwraca (model, liczba skopiowanych wag). Wagi, których nie da się podmienić na stały
+    tensor (zmienna poza atrybutem warstwy, mixed precision), są kopiowane do zmiennych.
+    """
+    import tensorflow as tf
+
+    manifest, arrays = map_weights(path)
+    model = tf.keras.models.model_from_json(json.dumps(manifest["architecture"]))
+    variables = model.weights
+    if len(variables) != len(arrays):
+        raise ValueError(f"{path}: {len(arrays)} weights for a model with {len(variables)} variables")
+    for variable, (name, array) in zip(variables, arrays):
+        if tuple(variable.shape) != array.shape:
+            raise ValueError(f"{path}: weight {name} has shape {array.shape}, model expects {tuple(variable.shape)}")
+
+    by_variable = {id(variable): array for variable, (_, array) in zip(variables, arrays)}
+    bound = set()
+    for layer in model.submodules:
+        if not isinstance(layer, tf.keras.layers.Layer):
+            continue
+        for attr, value in list(vars(layer).items()):
+            # AutoCastVariable (mixed precision) rzutuje wagi przy odczycie - zostaje zmienną
+            if (isinstance(value, tf.Variable) and id(value) in by_variable
+                    and type(value).__name__ != "AutoCastVariable"):
+                setattr(layer, attr, tf.experimental.dlpack.from_dlpack(by_variable[id(value)].__dlpack__()))
+                bound.add(id(value))
+
+    copied = 0
+    for variable in variables:
+        if id(variable) not in bound:
+            variable.assign(by_variable[id(variable)])
+            copied += 1
+    return model, copied
@@ -0,0 +1,273 @@
+"""
+Serwer inferencji z mikro-batchowaniem.
+
+Pojedyncze żądania (obrazy 299x299x3 po preprocess_input) trafiają do kolejki,
+a osobny wątek łączy je w batche ograniczone maksymalnym rozmiarem batcha
+i maksymalnym czasem oczekiwania. Każde żądanie dostaje z powrotem tylko
+swój fragment wyników.
+
+Uruchomienie serwera:
+    python inference_server.py --port 8600 --max-batch-size 32 --max-wait-ms 5
+
+/metrics zwraca czasy etapów (metrics.py) w formacie Prometheus.
+
+Z --workers N serwer jest tylko dispatcherem przed N procesami inferencji
+przypiętymi do rozłącznych rdzeni (worker_pool.py).
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from metrics import REGISTRY as METRICS
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+INPUT_SHAPE = (299, 299, 3)
+NPY_CONTENT_TYPE = "application/x-npy"
+
+
+def _to_npy_bytes(array):
+    buf = io.BytesIO()
+    np.save(buf, array, allow_pickle=False)
+    return buf.getvalue()
+
+
+def _from_npy_bytes(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+class MicroBatcher:
+    """Łączy współbieżne żądania w dynamiczne batche dla jednej funkcji predict."""
+
+    def __init__(self, predict_fn, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "images": 0, "batches": 0}
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array):
+        """Dodaje żądanie do kolejki i zwraca Future z tablicą predykcji."""
+        img_array = np.asarray(img_array, dtype=np.float32)
+        if img_array.ndim == 3:
+            img_array = img_array[np.newaxis]
+        future = Future()
+        self._queue.put((img_array, future))
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Blokujący odpowiednik model.predict dla jednego żądania."""
+        return self.submit(img_array).result(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch_size"] = stats["images"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        pending = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is None:
+                return
+
+            items = [item]
+            size = len(item[0])
+            deadline = time.perf_counter() + self.max_wait
+            stop = False
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                if size + len(nxt[0]) > self.max_batch_size:
+                    # Nie mieści się - trafi jako pierwsze do następnego batcha
+                    pending = nxt
+                    break
+                items.append(nxt)
+                size += len(nxt[0])
+
+            self._execute(items)
+            if stop:
+                return
+
+    def _execute(self, items):
+        arrays = [array for array, _ in items]
+        # Błąd (także niezgodny kształt przy łączeniu) kończy tylko futures tego batcha, nie wątek micro-batchera
+        try:
+            batch = arrays[0] if len(arrays) == 1 else np.concatenate(arrays, axis=0)
+            with METRICS.stage("batch_forward"):
+                predictions = np.asarray(self.predict_fn(batch))
+        except Exception as exc:
+            for _, future in items:
+                future.set_exception(exc)
+            return
+
+        with self._lock:
+            self._stats["requests"] += len(items)
+            self._stats["images"] += len(batch)
+            self._stats["batches"] += 1
+
+        offset = 0
+        for array, future in items:
+            future.set_result(predictions[offset:offset + len(array)])
+            offset += len(array)
+
+
+class RemoteClassifier:
+    """Klient serwera inferencji o tym samym interfejsie co MicroBatcher.predict."""
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def predict(self, img_array, timeout=None):
+        img_array = np.asarray(img_array, dtype=np.float32)
+        request = urllib.request.Request(
+            f"{self.url}/predict",
+            data=_to_npy_bytes(img_array),
+            headers={"Content-Type": NPY_CONTENT_TYPE},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return _from_npy_bytes(response.read())
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+def make_handler(batcher, extra_stats=None):
+    """Tworzy klasę handlera HTTP związaną z danym batcherem; extra_stats() dopisuje pola do /stats."""
+
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status, payload):
+            self._send(status, json.dumps(payload).encode("utf-8"))
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                stats = batcher.stats()
+                stats["cpu_count"] = os.cpu_count()
+                # Pula workerów raportuje już czas CPU swoich procesów - dochodzi czas dispatchera
+                stats["process_cpu_seconds"] = stats.get("process_cpu_seconds", 0.0) + time.process_time()
+                if extra_stats:
+                    stats.update(extra_stats())
+                self._send_json(200, stats)
+            elif self.path == "/metrics":
+                self._send(200, METRICS.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                img_array = _from_npy_bytes(self.rfile.read(length))
+                if img_array.ndim == 3:
+                    img_array = img_array[np.newaxis]
+                if img_array.shape[1:] != INPUT_SHAPE:
+                    raise ValueError(f"expected (n, 299, 299, 3) input, got {img_array.shape}")
+            except ValueError as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            try:
+                predictions = batcher.predict(img_array)
+            except Exception as exc:
+                self._send_json(500, {"error": str(exc)})
+                return
+            self._send(200, _to_npy_bytes(predictions.astype(np.float32)), NPY_CONTENT_TYPE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return InferenceHandler
+
+
+def serve(host="127.0.0.1", port=8600, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+          workers=0, cpus=None, intra_op_threads=None, inter_op_threads=None):
+    """Wczytuje model z app.py i uruchamia serwer HTTP z mikro-batchowaniem.
+
+    workers > 0: zamiast modelu w tym procesie - dispatcher przed pulą procesów (worker_pool.WorkerPool).
+    cpus / intra_op_threads / inter_op_threads: przypięcie procesu do rdzeni i pule wątków modelu.
+    """
+    if workers:
+        from worker_pool import WorkerPool
+
+        batcher = WorkerPool(workers, intra_op_threads, inter_op_threads or 1, max_batch_size, max_wait_ms)
+        handler = make_handler(batcher)
+        mode = f"dispatcher for {workers} workers"
+    else:
+        if cpus:
+            from worker_pool import pin_to_cpus
+            pin_to_cpus(cpus)
+        from app import artifact_store, load_trained_model
+
+        engine = load_trained_model(num_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+        batcher = MicroBatcher(engine.predict, max_batch_size, max_wait_ms)
+        handler = make_handler(batcher, lambda: {"model_artifacts": artifact_store.stats()})
+        mode = f"max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}"
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Inference server listening on http://{host}:{port} ({mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batching inference server for the InceptionV3 model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run N pinned inference processes behind this server (0 = serve the model in-process)")
+    parser.add_argument("--cpus", help="pin this process to CPUs, e.g. '0-3,8'")
+    parser.add_argument("--intra-op-threads", type=int, help="threads per op (per worker with --workers)")
+    parser.add_argument("--inter-op-threads", type=int, help="ops run concurrently (per worker with --workers)")
+    args = parser.parse_args()
+    cpus = None
+    if args.cpus:
+        from worker_pool import parse_cpus
+        cpus = parse_cpus(args.cpus)
+    serve(args.host, args.port, args.max_batch_size, args.max_wait_ms,
+          args.workers, cpus, args.intra_op_threads, args.inter_op_threads)
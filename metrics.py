@@ -0,0 +1,328 @@
+"""
+Lekkie metryki ścieżki predykcji: histogramy czasów etapów, liczniki i format Prometheus.
+
+- Histogram: stałe kubełki rosnące geometrycznie (x sqrt(2), od 0.1 ms do ~100 s);
+  zapis to bisect + inkrementacja pod blokadą, p50/p95/p99 liczone z kubełków przy odczycie,
+- REGISTRY.stage("decode") - context manager mierzący etap (histogram stage_seconds{stage=...},
+  wyjątki w etapie zliczane w stage_errors_total),
+- REGISTRY.render() - tekst w formacie ekspozycji Prometheus (/metrics),
+- SlowRequestProfiler - opcjonalny profiler próbkujący stos wątku żądania; żądania dłuższe od progu
+  zostawiają zwinięte stosy (format flamegraph) do obejrzenia na stronie administracyjnej,
+- start_http_server(port) - /metrics i /slow w wątku w tle (Streamlit nie obsługuje własnych ścieżek).
+
+Koszt pomiaru: bench/bench_metrics.py.
+"""
+
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "cnn_app_"
+BUCKETS = tuple(1e-4 * 2 ** (i / 2) for i in range(41))  # 0.1 ms ... ~105 s
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Histogram wartości (sekund) z osobnymi kubełkami dla każdej wartości etykiety."""
+
+    def __init__(self, name, help, label=None, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # wartość etykiety -> [liczniki kubełków (+Inf na końcu), suma, liczba, max]
+
+    def observe(self, value, label_value=None):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if value > series[3]:
+                series[3] = value
+
+    def _copy(self):
+        with self._lock:
+            return {key: (list(counts), total, count, peak) for key, (counts, total, count, peak) in self._series.items()}
+
+    def quantile(self, counts, count, peak, q):
+        """Kwantyl z kubełków - interpolacja liniowa w kubełku, w którym wypada."""
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else peak
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, peak)
+            cumulative += bucket_count
+        return peak
+
+    def summary(self):
+        """{wartość etykiety: {count, mean, p50, p95, p99, max}} - sekundy."""
+        result = {}
+        for key, (counts, total, count, peak) in self._copy().items():
+            row = {"count": count, "mean": total / count if count else 0.0, "max": peak}
+            for q in QUANTILES:
+                row[f"p{round(q * 100)}"] = self.quantile(counts, count, peak, q)
+            result[key] = row
+        return result
+
+    def render(self):
+        lines = [f"# HELP {PREFIX}{self.name} {self.help}", f"# TYPE {PREFIX}{self.name} histogram"]
+        for key, (counts, total, count, _) in sorted(self._copy().items(), key=lambda item: str(item[0])):
+            labels = f'{self.label}="{key}",' if self.label else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+                lines.append(f'{PREFIX}{self.name}_bucket{{{labels}le="{le}"}} {cumulative}')
+            suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{PREFIX}{self.name}_sum{suffix} {total:.9g}")
+            lines.append(f"{PREFIX}{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, label_value=None, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {PREFIX}{self.name} {self.help}", f"# TYPE {PREFIX}{self.name} counter"]
+        for key, value in sorted(self.values().items(), key=lambda item: str(item[0])):
+            labels = f'{{{self.label}="{key}"}}' if self.label else ""
+            lines.append(f"{PREFIX}{self.name}{labels} {value}")
+        return lines
+
+
+class _StageTimer:
+    """Context manager jednego pomiaru etapu (obiekt na wywołanie, bez generatora contextmanager)."""
+
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.stage_seconds.observe(time.perf_counter() - self.start, self.stage)
+        if exc_type is not None:
+            self.registry.stage_errors.inc(self.stage)
+        return False
+
+
+class MetricsRegistry:
+    """Metryki jednego procesu: histogram etapów, błędy etapów, liczniki i wskaźniki (gauge) z funkcji."""
+
+    def __init__(self):
+        self.stage_seconds = Histogram("stage_seconds", "Time spent in each prediction stage.", "stage")
+        self.stage_errors = Counter("stage_errors_total", "Exceptions raised inside a stage.", "stage")
+        self._metrics = [self.stage_seconds, self.stage_errors]
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def timed(self, name):
+        """Dekorator mierzący całe wywołanie funkcji jako etap name."""
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = fn.__name__, fn.__doc__, fn
+            return wrapper
+        return decorator
+
+    def counter(self, name, help, label=None):
+        with self._lock:
+            for metric in self._metrics:
+                if metric.name == name:
+                    return metric
+            metric = Counter(name, help, label)
+            self._metrics.append(metric)
+            return metric
+
+    def gauge(self, name, help, fn, label=None):
+        """Wskaźnik odczytywany przy render(): fn() zwraca liczbę albo {wartość etykiety: liczba}."""
+        with self._lock:
+            self._gauges = [g for g in self._gauges if g[0] != name] + [(name, help, fn, label)]
+
+    def stages(self):
+        return self.stage_seconds.summary()
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for name, help, fn, label in list(self._gauges):
+            try:
+                value = fn()
+            except Exception:
+                continue  # np. zasób jeszcze niezaładowany - wskaźnik pomijany w tym odczycie
+            lines += [f"# HELP {PREFIX}{name} {help}", f"# TYPE {PREFIX}{name} gauge"]
+            values = value.items() if isinstance(value, dict) else [(None, value)]
+            for key, number in values:
+                labels = f'{{{label}="{key}"}}' if label and key is not None else ""
+                lines.append(f"{PREFIX}{name}{labels} {float(number):.9g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# --- Profiler wolnych żądań ---
+
+def _collapsed_stack(frame, limit=64):
+    """Stos od korzenia do liścia jako 'plik:funkcja;plik:funkcja' (format collapsed stacks)."""
+    parts = []
+    while frame is not None and len(parts) < limit:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class _Capture:
+    __slots__ = ("profiler", "name", "thread_id", "samples", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.samples = StackCounter()
+        self.start = time.perf_counter()
+        self.profiler._begin(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler._end(self, time.perf_counter() - self.start)
+        return False
+
+
+class _NullCapture:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class SlowRequestProfiler:
+    """Próbkuje stos wątku każdego trwającego żądania co interval_ms; zachowuje tylko żądania > threshold_ms.
+
+    threshold_ms <= 0 wyłącza profiler (capture() nic nie robi). Wątek próbkujący śpi, gdy nie ma żądań.
+    """
+
+    def __init__(self, threshold_ms=0.0, interval_ms=10.0, keep=20, top_stacks=15):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.top_stacks = top_stacks
+        self.slow = deque(maxlen=keep)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def capture(self, name):
+        return _Capture(self, name) if self.enabled else _NullCapture()
+
+    def _begin(self, capture):
+        with self._lock:
+            self._active[id(capture)] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _end(self, capture, seconds):
+        with self._lock:
+            self._active.pop(id(capture), None)
+        if seconds >= self.threshold:
+            self.slow.append({
+                "name": capture.name,
+                "seconds": seconds,
+                "time": time.time(),
+                "samples": sum(capture.samples.values()),
+                "stacks": capture.samples.most_common(self.top_stacks),
+            })
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wake.clear()
+            if not active:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for capture in active:
+                frame = frames.get(capture.thread_id)
+                if frame is not None:
+                    capture.samples[_collapsed_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+# --- Endpoint HTTP ---
+
+def start_http_server(port, registry=REGISTRY, profiler=None, host="127.0.0.1"):
+    """/metrics (Prometheus) i /slow (JSON wolnych żądań) w wątku w tle; zwraca serwer.
+
+    Domyślnie tylko localhost - /slow zawiera stosy wywołań; inny interfejs trzeba podać jawnie.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/slow":
+                slow = list(profiler.slow) if profiler is not None else []
+                body, content_type = json.dumps(slow).encode("utf-8"), "application/json"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,241 @@
+"""
+Pobieranie i cache plików modelu.
+
+- wspólny katalog cache z podkatalogiem na wersję modelu: <cache_dir>/<wersja>/<plik>,
+- blokada pliku (fcntl / msvcrt) - repliki startujące równocześnie pobierają model raz,
+- pobieranie kawałkami do <plik>.part, wznawiane nagłówkiem Range po zerwaniu połączenia,
+- weryfikacja SHA-256 (i długości z Content-Length) przed atomowym os.replace na docelową nazwę,
+- metryki: rozmiar, czas pobierania, liczba pobranych bajtów, wznowienia, trafienia w cache.
+
+Pliki niepełne albo z błędną sumą nigdy nie trafiają pod docelową nazwę.
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+
+CHUNK_SIZE = 1 << 20
+
+# Błędy, po których pobieranie jest wznawiane (HTTP 4xx poza 429 - nie)
+RETRYABLE = (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError, OSError)
+
+# Wynik fetch(): ścieżka pliku i metryki pobierania (dla trafienia w cache - zerowe)
+Artifact = namedtuple("Artifact", [
+    "path", "size_bytes", "sha256", "cache_hit", "download_seconds", "bytes_downloaded", "resumed_from", "attempts",
+])
+
+
+class ChecksumError(Exception):
+    """Pobrany plik ma inną sumę SHA-256 albo długość niż oczekiwana."""
+
+
+class FileLock:
+    """Wyłączna blokada pliku między procesami (fcntl na Linux/macOS, msvcrt na Windows)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        try:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except ImportError:
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+def direct_url(url):
+    """Link Google Drive 'uc?export=download' -> bezpośredni adres z obsługą Range (bez strony potwierdzenia)."""
+    match = re.match(r"https://drive\.google\.com/uc\?.*\bid=([\w-]+)", url)
+    if match:
+        return f"https://drive.usercontent.google.com/download?id={match.group(1)}&export=download&confirm=t"
+    return url
+
+
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path):
+    if os.name == "posix":
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class ArtifactStore:
+    """Cache plików modelu w katalogu współdzielonym przez procesy/kontenery."""
+
+    def __init__(self, cache_dir, max_retries=5, timeout=30.0, backoff=1.0):
+        self.cache_dir = cache_dir
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._history = []
+
+    def path_for(self, version, filename):
+        return os.path.join(self.cache_dir, version, filename)
+
+    def fetch(self, url, version, filename, sha256=None):
+        """Zwraca Artifact z plikiem z cache; pobiera go (pod blokadą), jeśli go brak."""
+        path = self.path_for(version, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        artifact = self._cached(path, sha256)
+        if artifact is None:
+            with FileLock(path + ".lock"):
+                # Inna replika mogła pobrać plik, gdy czekaliśmy na blokadę
+                artifact = self._cached(path, sha256) or self._download(url, path, sha256)
+        with self._lock:
+            self._history.append(artifact)
+        return artifact
+
+    def stats(self):
+        """Metryki wszystkich wywołań fetch() w tym procesie."""
+        with self._lock:
+            history = list(self._history)
+        return {
+            "fetches": len(history),
+            "cache_hits": sum(a.cache_hit for a in history),
+            "bytes_downloaded": sum(a.bytes_downloaded for a in history),
+            "download_seconds": sum(a.download_seconds for a in history),
+            "artifacts": [a._asdict() for a in history],
+        }
+
+    # --- Weryfikacja pliku w cache ---
+
+    def _cached(self, path, sha256):
+        """Artifact dla poprawnego pliku w cache albo None.
+
+        Suma jest liczona raz i zapisywana obok pliku (<plik>.sha256 z rozmiarem i mtime),
+        więc kolejne starty nie czytają całego modelu.
+        """
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        meta_path = path + ".sha256"
+        digest = None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+                digest = meta["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+        if digest is None:
+            digest = sha256_file(path)
+            self._write_meta(path, digest)
+        if sha256 and digest != sha256.lower():
+            return None
+        return Artifact(path, stat.st_size, digest, True, 0.0, 0, 0, 0)
+
+    def _write_meta(self, path, digest):
+        stat = os.stat(path)
+        with open(path + ".sha256", "w", encoding="utf-8") as f:
+            json.dump({"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, f)
+
+    # --- Pobieranie ---
+
+    def _download(self, url, path, sha256):
+        part = path + ".part"
+        start = time.perf_counter()
+        resumed_from = os.path.getsize(part) if os.path.exists(part) else 0
+        state = {"total": None, "received": 0}
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self._download_range(url, part, state)
+                break
+            except RETRYABLE as exc:
+                if isinstance(exc, urllib.error.HTTPError) and exc.code < 500 and exc.code != 429:
+                    raise
+                if attempts > self.max_retries:
+                    raise
+                time.sleep(self.backoff * 2 ** (attempts - 1))
+
+        size = os.path.getsize(part)
+        if state["total"] is not None and size != state["total"]:
+            os.remove(part)
+            raise ChecksumError(f"{url}: expected {state['total']} bytes, got {size}")
+        digest = sha256_file(part)
+        if sha256 and digest != sha256.lower():
+            os.remove(part)
+            raise ChecksumError(f"{url}: sha256 {digest} does not match expected {sha256}")
+
+        os.replace(part, path)
+        _fsync_dir(os.path.dirname(path))
+        self._write_meta(path, digest)
+        return Artifact(path, size, digest, False, time.perf_counter() - start, state["received"], resumed_from, attempts)
+
+    def _download_range(self, url, part, state):
+        """Dopisuje do .part brakującą część pliku; state: pełna długość (total) i licznik pobranych bajtów."""
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if state["total"] is not None and offset == state["total"]:
+            return
+        request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 416 and offset:
+                # .part z poprzedniego startu jest już kompletny - sprawdzi go suma kontrolna
+                return
+            raise
+        with response:
+            if response.headers.get_content_type() == "text/html":
+                raise ChecksumError(f"{url} returned an HTML page instead of the model file")
+            if offset and response.status == 206:
+                # Content-Range: bytes start-end/total
+                state["total"] = int(response.headers["Content-Range"].rsplit("/", 1)[1])
+                mode = "ab"
+            else:
+                # Pierwsze żądanie albo serwer zignorował Range - pobieranie od początku
+                length = response.headers.get("Content-Length")
+                state["total"] = int(length) if length else None
+                mode = "wb"
+            with open(part, mode) as f:
+                try:
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        f.write(chunk)
+                        state["received"] += len(chunk)
+                finally:
+                    f.flush()
+                    os.fsync(f.fileno())
+        current = os.path.getsize(part)
+        if state["total"] is not None and current < state["total"]:
+            # Połączenie zamknięte przed końcem - wznowienie w kolejnej próbie
+            raise ConnectionError(f"{url}: connection closed at {current}/{state['total']} bytes")
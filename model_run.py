@@ -0,0 +1,271 @@
+"""
+Klasyfikacja folderów / list zdjęć bez Streamlit.
+
+Używa tych samych etykiet i modelu co app.py. Dekodowanie odbywa się równolegle
+w puli wątków, gotowe batche trafiają do ograniczonej kolejki (prefetch), a wyniki
+są zapisywane strumieniowo do CSV lub JSONL - pamięć nie rośnie z liczbą zdjęć.
+Przerwany przebieg można wznowić (--resume): wyniki są zapisywane w kolejności wejścia, a wejście
+jest czytane zawsze tak samo (katalogi posortowane, lista plików po kolei), więc pomijanych jest
+tyle pierwszych ścieżek, ile wierszy ma już wynik - bez zbioru ścieżek w pamięci. Wejście musi być
+to samo co w przerwanym przebiegu (sprawdzana jest ostatnia zapisana ścieżka).
+
+    py model_run.py zdjecia/ --output wyniki.csv --top-k 3
+    py model_run.py --file-list lista.txt --output wyniki.jsonl --resume
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from preprocessing import IMAGE_EXTENSIONS, load_image, load_inception_input
+from tta import TTAViews, average_views
+
+BATCH_SHAPE = (299, 299, 3)
+TAIL_BLOCK = 64 * 1024
+
+
+def iter_image_paths(inputs, file_list=None):
+    """Generator ścieżek zdjęć z katalogów (rekurencyjnie), pojedynczych plików i listy plików."""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for fname in sorted(files):
+                    if fname.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, fname)
+        else:
+            yield item
+    if file_list:
+        with open(file_list, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def read_done_count(output_path):
+    """(liczba wierszy, ostatnia ścieżka) z poprzedniego przebiegu; ucina niedokończoną ostatnią linię."""
+    count, last_path = 0, None
+    if not os.path.exists(output_path):
+        return count, last_path
+
+    # Ostatni znak nowej linii szukany od końca pliku blokami - bez wczytywania całego wyniku
+    with open(output_path, "rb+") as f:
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(TAIL_BLOCK, position)
+            position -= step
+            f.seek(position)
+            last_newline = f.read(step).rfind(b"\n")
+            if last_newline >= 0:
+                position += last_newline + 1
+                break
+        if position != end:
+            f.truncate(position)
+
+    with open(output_path, encoding="utf-8", newline="") as f:
+        if output_path.endswith(".jsonl"):
+            for line in f:
+                count, last_path = count + 1, json.loads(line)["path"]
+        else:
+            for row in csv.DictReader(f):
+                count, last_path = count + 1, row["path"]
+    return count, last_path
+
+
+def skip_done(paths, count, last_path):
+    """Pomija count pierwszych ścieżek; ostatnia pominięta musi być ostatnią zapisaną."""
+    skipped = None
+    for skipped in itertools.islice(paths, count):
+        pass
+    if count and skipped != last_path:
+        raise SystemExit(f"--resume: input differs from the interrupted run (row {count} of the output is "
+                         f"{last_path!r}, input has {skipped!r}); rerun without --resume")
+    return paths
+
+
+class CsvWriter:
+    def __init__(self, path, top_k, append):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        if not exists:
+            header = ["path"]
+            for i in range(1, top_k + 1):
+                header += [f"label_{i}", f"prob_{i}", f"link_{i}"]
+            self.writer.writerow(header + ["error"])
+        self.top_k = top_k
+
+    def write(self, path, predictions, error=""):
+        row = [path]
+        for label, prob, link in predictions:
+            row += [label, f"{prob:.6f}", link]
+        row += [""] * (1 + 3 * self.top_k - len(row))
+        self.writer.writerow(row + [error])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, top_k, append):
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, path, predictions, error=""):
+        record = {
+            "path": path,
+            "predictions": [{"label": label, "probability": round(float(prob), 6), "link": link}
+                            for label, prob, link in predictions],
+        }
+        if error:
+            record["error"] = error
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def decode_stage(paths, batch_size, workers, prefetch, out_queue, tta=None):
+    """Wątek producenta: dekoduje równolegle kolejne batche do puli buforów i wkłada je do kolejki.
+
+    Z tta (TTAViews) każde zdjęcie zajmuje len(tta) kolejnych wierszy bufora - wszystkie jego widoki.
+    """
+    views = len(tta) if tta else 1
+    # prefetch batchy w kolejce + jeden przetwarzany przez model + jeden dekodowany
+    free_buffers = queue.Queue()
+    for _ in range(prefetch + 2):
+        free_buffers.put(np.empty((batch_size, views) + BATCH_SHAPE, dtype=np.float32))
+
+    def decode(args):
+        path, slot = args
+        try:
+            if tta:
+                tta(load_image(path), out=slot)
+            else:
+                load_inception_input(path, out=slot[0])
+            return ""
+        except Exception as exc:
+            return f"{type(exc).__name__}: {exc}"
+
+    def emit(chunk):
+        buf = free_buffers.get()
+        errors = list(pool.map(decode, zip(chunk, buf)))
+        out_queue.put((chunk, buf, errors, free_buffers))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunk = []
+            for path in paths:
+                chunk.append(path)
+                if len(chunk) == batch_size:
+                    emit(chunk)
+                    chunk = []
+            if chunk:
+                emit(chunk)
+    except Exception as exc:
+        # Np. brak pliku --file-list (czytany leniwie w tym wątku) - wyjątek przekazany do pętli głównej
+        out_queue.put(exc)
+    finally:
+        out_queue.put(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a directory tree or a list of tarantula photos")
+    parser.add_argument("inputs", nargs="*", help="image files and/or directories (searched recursively)")
+    parser.add_argument("--file-list", help="text file with one image path per line")
+    parser.add_argument("--output", default="predictions.csv", help="output file (.csv or .jsonl)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32, help="images per model call (times --tta views)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="decode threads")
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches waiting for the model")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip as many leading inputs as --output has rows (same inputs as the interrupted run)")
+    parser.add_argument("--backend", help="MODEL_BACKEND override (keras, tflite-fp16, tflite-int8, onnx)")
+    parser.add_argument("--tta", type=int, default=0, metavar="VIEWS",
+                        help="test-time augmentation views per image (see tta.TTA_PRESETS; 0 = off)")
+    args = parser.parse_args()
+
+    if not args.inputs and not args.file_list:
+        parser.error("give at least one input path or --file-list")
+    if args.backend:
+        os.environ["MODEL_BACKEND"] = args.backend
+
+    from app import load_trained_model
+    from species_index import get_species_index
+
+    species = get_species_index()
+    paths = iter_image_paths(args.inputs, args.file_list)
+    if args.resume:
+        paths = skip_done(paths, *read_done_count(args.output))
+
+    writer_cls = JsonlWriter if args.output.endswith(".jsonl") else CsvWriter
+    writer = writer_cls(args.output, args.top_k, append=args.resume)
+
+    tta = TTAViews.from_views(args.tta) if args.tta > 1 else None
+    views = len(tta) if tta else 1
+    engine = load_trained_model()
+
+    batches = queue.Queue(maxsize=args.prefetch)
+    producer = threading.Thread(
+        target=decode_stage, args=(paths, args.batch_size, args.workers, args.prefetch, batches, tta), daemon=True
+    )
+    producer.start()
+
+    processed, start, last_report = 0, time.perf_counter(), time.perf_counter()
+    try:
+        while True:
+            item = batches.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            chunk, buf, errors, free_buffers = item
+            ok = [i for i, err in enumerate(errors) if not err]
+            if len(ok) == len(chunk):
+                probs = engine.predict(buf[:len(chunk)].reshape((-1,) + BATCH_SHAPE))
+            else:
+                probs = engine.predict(buf[ok].reshape((-1,) + BATCH_SHAPE)) if ok else None
+            free_buffers.put(buf)
+            if probs is not None and views > 1:
+                probs = average_views(probs, views)
+
+            if probs is not None:
+                top = species.top_k(probs, args.top_k)
+                results = dict(zip(ok, zip(top.labels, top.probs, top.links)))
+            for i, path in enumerate(chunk):
+                if errors[i]:
+                    writer.write(path, [], errors[i])
+                    continue
+                writer.write(path, list(zip(*results[i])))
+            writer.flush()
+
+            processed += len(chunk)
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                print(f"{processed} images, {processed / (now - start):.1f} img/s", file=sys.stderr)
+                last_report = now
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"✅ {processed} images in {elapsed:.1f} s ({rate:.1f} img/s) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Cache predykcji adresowany treścią przesłanego pliku.
+
+Klucz to SHA-256 surowych bajtów obrazu + wersja modelu, wartość to pełny
+wektor prawdopodobieństw. Pierwszy poziom to ograniczony LRU w pamięci,
+drugi (opcjonalny) to plik SQLite, który przetrwa restart aplikacji.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def make_key(data, model_version):
+    """Klucz cache: hash bajtów obrazu powiązany z wersją modelu."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{model_version}:{digest}"
+
+
+class PredictionCache:
+    """LRU w pamięci z opcjonalnym poziomem dyskowym (SQLite)."""
+
+    def __init__(self, max_entries=256, db_path=None, max_disk_entries=100_000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        self._db = None
+        self._disk_entries = 0  # liczba wierszy w SQLite - COUNT(*) tylko przy otwarciu i przy usuwaniu
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, probs BLOB NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.commit()
+            (self._disk_entries,) = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+
+    def get(self, key):
+        """Zwraca zapisany wektor prawdopodobieństw albo None."""
+        with self._lock:
+            probs = self._memory.get(key)
+            if probs is not None:
+                self._memory.move_to_end(key)
+                self._counters["hits"] += 1
+                return probs
+
+            if self._db is not None:
+                row = self._db.execute("SELECT probs FROM predictions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE predictions SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    probs = np.frombuffer(row[0], dtype=np.float32)
+                    self._counters["disk_hits"] += 1
+                    self._put_memory(key, probs)
+                    return probs
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key, probs):
+        probs = np.array(probs, dtype=np.float32).ravel()
+        probs.setflags(write=False)
+        with self._lock:
+            self._put_memory(key, probs)
+            if self._db is not None:
+                now = time.time()
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO predictions (key, probs, accessed) VALUES (?, ?, ?)",
+                    (key, probs.tobytes(), now),
+                ).rowcount
+                if inserted:
+                    self._disk_entries += 1
+                else:
+                    self._db.execute("UPDATE predictions SET probs = ?, accessed = ? WHERE key = ?",
+                                     (probs.tobytes(), now, key))
+                if self._disk_entries > self.max_disk_entries:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _put_memory(self, key, probs):
+        self._memory[key] = probs
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self):
+        # Licznik w pamięci tylko wyzwala usuwanie; dokładna liczba z bazy (plik może współdzielić kilka replik)
+        (count,) = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+            self._counters["disk_evictions"] += excess
+            count -= excess
+        self._disk_entries = count
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._memory)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,78 @@
+"""
+Wczytywanie i preprocessing obrazów bez importowania TensorFlow.
+
+Odpowiednik keras image.load_img + img_to_array + preprocess_input, wspólny
+dla app.py i skryptów treningowych. Duże zdjęcia JPEG (12+ MP z telefonu) są
+dekodowane w trybie draft - biblioteka libjpeg skaluje je już w dziedzinie DCT
+(1/2, 1/4, 1/8), więc pełna rozdzielczość nigdy nie trafia do pamięci.
+Skalowanie pikseli odbywa się w miejscu, w prealokowanym buforze float32.
+"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+INCEPTION_SIZE = (299, 299)
+SCRATCH_SIZE = (224, 224)
+
+# Rozszerzenia akceptowane przez flow_from_directory
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".ppm", ".tif", ".tiff")
+
+
+def load_image(source, target_size=INCEPTION_SIZE, draft=True):
+    """Wczytuje obraz jako RGB o rozmiarze target_size (jak keras load_img, interpolacja nearest).
+
+    draft=True pozwala dekoderowi JPEG zmniejszyć obraz przy dekodowaniu
+    do najmniejszej skali nie mniejszej niż target_size.
+    """
+    img = Image.open(source)
+    width_height = (target_size[1], target_size[0])
+    if draft and img.format == "JPEG":
+        img.draft("RGB", width_height)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != width_height:
+        img = img.resize(width_height, Image.NEAREST)
+    return img
+
+
+def preprocess_inception(x, out=None):
+    """Skalowanie InceptionV3: piksele [0, 255] -> [-1, 1] (identyczne z keras preprocess_input).
+
+    Z out=x (float32) działa w miejscu, bez dodatkowych kopii.
+    """
+    out = np.divide(x, 127.5, out=out, dtype=np.float32)
+    return np.subtract(out, 1.0, out=out)
+
+
+def preprocess_scratch(x, out=None):
+    """Skalowanie modelu autorskiego: piksele [0, 255] -> [0, 1] (rescale=1./255)."""
+    return np.multiply(x, 1.0 / 255, out=out, dtype=np.float32)
+
+
+def load_inception_input(source, target_size=INCEPTION_SIZE, out=None, draft=True):
+    """Zwraca batch 1xHxWx3 gotowy do podania modelowi InceptionV3.
+
+    Jeśli podano out (HxWx3 float32, np. wiersz prealokowanego batcha), wynik trafia do niego.
+    """
+    pixels = np.asarray(load_image(source, target_size, draft))
+    if out is None:
+        return preprocess_inception(pixels)[np.newaxis]
+    return preprocess_inception(pixels, out=out)
+
+
+def list_image_files(split_dir):
+    """Lista plików w kolejności flow_from_directory: (ścieżki, indeksy klas, nazwy klas)."""
+    class_names = sorted(
+        d for d in os.listdir(split_dir) if os.path.isdir(os.path.join(split_dir, d))
+    )
+    filepaths, classes = [], []
+    for class_idx, class_name in enumerate(class_names):
+        class_dir = os.path.join(split_dir, class_name)
+        for root, _, files in sorted(os.walk(class_dir, followlinks=True), key=lambda x: x[0]):
+            for fname in sorted(files):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    filepaths.append(os.path.join(root, fname))
+                    classes.append(class_idx)
+    return filepaths, np.array(classes, dtype=np.int64), class_names
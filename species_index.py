@@ -0,0 +1,85 @@
+"""
+Indeks gatunków budowany raz z species_list.txt.
+
+Kolejność linii w pliku = kolejność wyjść modelu (klasy alfabetycznie, jak w flow_from_directory).
+Etykiety, rodzaje, linki do tarantupedia.com i nazwy do wyświetlenia są liczone przy starcie
+i trzymane w tablicach NumPy, więc top_k() dla pojedynczego wektora i dla batcha to tylko
+argpartition + indeksowanie - bez operacji na napisach przy każdej predykcji.
+Z SPECIES_UPDATE (katalog z Models' code/add_species.py) etykiety pochodzą z listy
+zapisanej razem z modelem rozszerzonym o nowe gatunki.
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+
+SPECIES_UPDATE = os.environ.get("SPECIES_UPDATE")
+SPECIES_LIST_PATH = os.path.join(SPECIES_UPDATE or os.path.dirname(os.path.abspath(__file__)), "species_list.txt")
+TARANTUPEDIA_URL = "https://www.tarantupedia.com/theraphosinae/"
+
+# Pola mają kształt (k,) dla jednego wektora albo (N, k) dla batcha
+TopK = namedtuple("TopK", ["indices", "probs", "labels", "links", "display_names"])
+
+
+def tarantupedia_link(name):
+    """Generuje link do tarantupedia.com.
+    Jeśli w nazwie występuje 'or', przekierowuje tylko do rodzaju (genus).
+    """
+    parts = name.strip().lower().split()
+    if " or " in name.lower() or len(parts) != 2:
+        # Zawsze bierzemy tylko pierwszy wyraz jako genus
+        return TARANTUPEDIA_URL + parts[0]
+    return TARANTUPEDIA_URL + f"{parts[0]}-{parts[1]}"
+
+
+def display_name(name):
+    """Nazwa do wyświetlenia: etykiety z samym rodzajem dostają 'sp.'."""
+    name = name.strip()
+    return f"{name} sp." if len(name.split()) == 1 else name
+
+
+class SpeciesIndex:
+    """Etykiety klas z metadanymi w tablicach zgodnych z indeksami wyjść modelu."""
+
+    def __init__(self, labels):
+        self.labels = np.array(labels)
+        self.genera = np.array([label.split()[0] for label in labels])
+        self.links = np.array([tarantupedia_link(label) for label in labels])
+        self.display_names = np.array([display_name(label) for label in labels])
+
+    @classmethod
+    def from_file(cls, path=SPECIES_LIST_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls([line.strip() for line in f if line.strip()])
+
+    def __len__(self):
+        return len(self.labels)
+
+    def top_k(self, probs, k=3):
+        """k najbardziej prawdopodobnych gatunków malejąco; probs (C,) albo (N, C)."""
+        probs = np.asarray(probs)
+        k = min(k, probs.shape[-1])
+        # argpartition wybiera k najlepszych w O(C), sortowane jest już tylko k wartości
+        part = np.argpartition(probs, -k, axis=-1)[..., -k:]
+        part_probs = np.take_along_axis(probs, part, axis=-1)
+        order = np.argsort(-part_probs, axis=-1, kind="stable")
+        indices = np.take_along_axis(part, order, axis=-1)
+        return TopK(
+            indices,
+            np.take_along_axis(part_probs, order, axis=-1),
+            self.labels[indices],
+            self.links[indices],
+            self.display_names[indices],
+        )
+
+
+_default_index = None
+
+
+def get_species_index():
+    """Wspólny indeks z species_list.txt (albo listy SPECIES_UPDATE), wczytywany przy pierwszym użyciu."""
+    global _default_index
+    if _default_index is None:
+        _default_index = SpeciesIndex.from_file()
+    return _default_index
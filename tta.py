@@ -0,0 +1,103 @@
+"""
+Test-time augmentation (TTA) wykonywane jednym przejściem modelu.
+
+Wszystkie widoki (odbicie poziome, wycinki, małe rotacje) to przekształcenia
+geometryczne tego samego obrazu 299x299, więc dla danej konfiguracji raz liczona
+jest tablica indeksów (widoki x piksele) do spłaszczonego obrazu źródłowego.
+Zbudowanie batcha widoków to jedno indeksowanie NumPy + skalowanie do bufora float32,
+a model dostaje wszystkie widoki jako jeden batch. Wynik to średnia prawdopodobieństw.
+Interpolacja nearest i wypełnianie brzegów 'nearest' - jak przy wczytywaniu i w augmentacjach treningu.
+"""
+
+import math
+
+import numpy as np
+
+from preprocessing import INCEPTION_SIZE, preprocess_inception
+
+# Liczba widoków -> konfiguracja. Zawsze jest pełny obraz, crops dodaje wycinki (1 - środek, 5 - środek i rogi),
+# angles rotacje w stopniach, a flip podwaja wszystkie widoki o ich odbicia poziome.
+TTA_PRESETS = {
+    1: dict(flip=False, crops=0, angles=()),
+    2: dict(flip=True, crops=0, angles=()),
+    4: dict(flip=True, crops=1, angles=()),
+    6: dict(flip=True, crops=0, angles=(-10, 10)),
+    12: dict(flip=True, crops=5, angles=()),
+    16: dict(flip=True, crops=5, angles=(-10, 10)),
+}
+
+
+class TTAViews:
+    """Generator batcha widoków jednego obrazu HxWx3 (uint8 lub float, piksele [0, 255])."""
+
+    def __init__(self, flip=True, crops=0, angles=(), crop_scale=0.875, size=INCEPTION_SIZE):
+        if crops not in (0, 1, 5):
+            raise ValueError(f"crops must be 0, 1 or 5, got {crops}")
+        self.size = size
+        transforms = [self._identity()]
+        transforms += [self._crop(crop_scale, pos) for pos in ["center", "tl", "tr", "bl", "br"][:crops]]
+        transforms += [self._rotation(angle) for angle in angles]
+        if flip:
+            transforms += [m @ self._flip() for m in transforms]
+        self.transforms = np.stack(transforms)
+        self.index = self._source_index(self.transforms)
+
+    def __len__(self):
+        return len(self.transforms)
+
+    @classmethod
+    def from_views(cls, views):
+        """Konfiguracja z TTA_PRESETS dla zadanej liczby widoków."""
+        if views not in TTA_PRESETS:
+            raise ValueError(f"views must be one of {sorted(TTA_PRESETS)}, got {views}")
+        return cls(**TTA_PRESETS[views])
+
+    # --- Macierze 3x3 mapujące współrzędne wyjścia (wiersz, kolumna, 1) na współrzędne źródła ---
+
+    def _identity(self):
+        return np.eye(3)
+
+    def _flip(self):
+        width = self.size[1]
+        return np.array([[1, 0, 0], [0, -1, width - 1], [0, 0, 1]])
+
+    def _crop(self, scale, pos):
+        height, width = self.size
+        dy = {"center": 0.5, "tl": 0.0, "tr": 0.0, "bl": 1.0, "br": 1.0}[pos] * (1 - scale) * (height - 1)
+        dx = {"center": 0.5, "tl": 0.0, "tr": 1.0, "bl": 0.0, "br": 1.0}[pos] * (1 - scale) * (width - 1)
+        return np.array([[scale, 0, dy], [0, scale, dx], [0, 0, 1]])
+
+    def _rotation(self, degrees):
+        height, width = self.size
+        cy, cx = (height - 1) / 2, (width - 1) / 2
+        cos_t, sin_t = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+        return np.array([
+            [cos_t, -sin_t, cy - cos_t * cy + sin_t * cx],
+            [sin_t, cos_t, cx - sin_t * cy - cos_t * cx],
+            [0, 0, 1],
+        ])
+
+    def _source_index(self, transforms):
+        """Indeksy (widoki, H*W) do spłaszczonego obrazu; poza obrazem - najbliższy piksel brzegu."""
+        height, width = self.size
+        rows, cols = np.meshgrid(np.arange(height), np.arange(width), indexing="ij")
+        grid = np.stack([rows.ravel(), cols.ravel(), np.ones(height * width)])
+        src = transforms @ grid
+        src_rows = np.clip(np.rint(src[:, 0]), 0, height - 1).astype(np.intp)
+        src_cols = np.clip(np.rint(src[:, 1]), 0, width - 1).astype(np.intp)
+        return src_rows * width + src_cols
+
+    def __call__(self, image, out=None):
+        """Batch widoków (V, H, W, 3) po preprocessingu InceptionV3; out - prealokowany bufor float32."""
+        height, width = self.size
+        pixels = np.ascontiguousarray(image).reshape(height * width, 3)
+        # Piksel RGB jako jeden element typu void - indeksowanie kopiuje piksele, nie pojedyncze kanały
+        packed = pixels.view(np.dtype((np.void, 3 * pixels.itemsize))).ravel()
+        views = packed[self.index].view(pixels.dtype).reshape(len(self), height, width, 3)
+        return preprocess_inception(views, out=out)
+
+
+def average_views(probs, views):
+    """Średnia prawdopodobieństw (N * views, C) -> (N, C)."""
+    probs = np.asarray(probs)
+    return probs.reshape(-1, views, probs.shape[-1]).mean(axis=1)
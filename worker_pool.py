@@ -0,0 +1,252 @@
+"""
+Pula procesów inferencji na jednym hoście z lokalnym dispatcherem.
+
+Każdy worker to osobny proces inference_server.py (własny model i MicroBatcher)
+przypięty do rozłącznego podzbioru rdzeni, z jawną liczbą wątków intra-op
+i inter-op. Procesy nie dzielą pul wątków TensorFlow, więc współbieżne sesje
+nie konkurują o te same wątki. Dispatcher wysyła każde żądanie do workera z najmniejszą
+liczbą żądań w toku i ma ten sam interfejs predict/stats co MicroBatcher.
+Worker, który zakończy się po starcie, wypada z rotacji (żądanie w toku jest ponawiane na innym)
+i jest uruchamiany ponownie w tle; do rotacji wraca, gdy znów odpowiada. Gdy nie działa żaden
+worker, żądanie czeka na następcę (do swojego timeoutu, domyślnie start_timeout).
+
+    python inference_server.py --port 8600 --workers 4 --intra-op-threads 4
+    INFERENCE_WORKERS=4 streamlit run app.py
+
+Przy MODEL_BACKEND=keras-mmap workery współdzielą strony wag modelu (flat_weights.py).
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+
+import numpy as np
+
+from inference_server import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, RemoteClassifier
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_server.py")
+
+
+def available_cpus():
+    """Rdzenie dostępne dla procesu (z uwzględnieniem affinity / cgroup cpuset na Linuksie)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(cpus, workers):
+    """Dzieli rdzenie na workers ciągłych, rozłącznych podzbiorów (przy nadmiarze workerów - po jednym rdzeniu)."""
+    if workers > len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    return [chunk.tolist() for chunk in np.array_split(np.array(cpus), workers)]
+
+
+def pin_to_cpus(cpus):
+    """Przypina bieżący proces (i wątki tworzone później) do podanych rdzeni; False, gdy system nie wspiera."""
+    if not hasattr(os, "sched_setaffinity"):
+        return False
+    os.sched_setaffinity(0, cpus)
+    return True
+
+
+def parse_cpus(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.split(","):
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def exited(proc, grace=1.0):
+    """True, gdy proces zakończył się (lub zakończy w ciągu grace sekund)."""
+    try:
+        proc.wait(timeout=grace)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
+class WorkerPool:
+    """N procesów inference_server.py na lokalnych portach i dispatcher least-outstanding-requests."""
+
+    def __init__(self, workers, intra_op_threads=None, inter_op_threads=1,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, start_timeout=600.0):
+        self.cpu_sets = split_cpus(available_cpus(), workers)
+        # Domyślnie tyle wątków intra-op, ile rdzeni ma worker
+        self.intra_op_threads = [intra_op_threads or len(cpus) for cpus in self.cpu_sets]
+        self.inter_op_threads = inter_op_threads
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.start_timeout = start_timeout
+        self._procs = []
+        self._clients = []
+        self._in_flight = [0] * workers
+        self._alive = [False] * workers
+        self._restarts = [0] * workers
+        self._restarting = set()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+        try:
+            for idx in range(workers):
+                proc, client = self._spawn(idx)
+                self._procs.append(proc)
+                self._clients.append(client)
+            deadline = time.perf_counter() + start_timeout
+            for proc, client in zip(self._procs, self._clients):
+                self._wait_ready(proc, client, deadline)
+            self._alive = [True] * workers
+        except BaseException:
+            self.close()
+            raise
+
+    def _spawn(self, idx):
+        """Uruchamia proces workera idx na nowym porcie; zwraca (proces, klient)."""
+        port = free_port()
+        cmd = [sys.executable, SERVER_SCRIPT, "--port", str(port),
+               "--cpus", ",".join(map(str, self.cpu_sets[idx])),
+               "--intra-op-threads", str(self.intra_op_threads[idx]),
+               "--inter-op-threads", str(self.inter_op_threads),
+               "--max-batch-size", str(self.max_batch_size), "--max-wait-ms", str(self.max_wait_ms)]
+        proc = subprocess.Popen(cmd, cwd=os.path.dirname(SERVER_SCRIPT), stdout=subprocess.DEVNULL)
+        return proc, RemoteClassifier(f"http://127.0.0.1:{port}")
+
+    def _wait_ready(self, proc, client, deadline):
+        """Czeka, aż worker wczyta model i odpowie na /stats."""
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"inference worker exited with code {proc.returncode} during startup")
+            try:
+                client.stats()
+                return
+            except (urllib.error.URLError, ConnectionError):
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"inference worker {client.url} not ready after {self.start_timeout:.0f} s")
+                time.sleep(0.2)
+
+    def _mark_dead(self, idx):
+        """Wyjmuje zakończony proces z rotacji i uruchamia jego następcę w tle (raz na śmierć procesu)."""
+        with self._lock:
+            if not self._alive[idx] or self._closed:
+                return
+            self._alive[idx] = False
+            self._restarting.add(idx)
+        threading.Thread(target=self._restart, args=(idx,), name=f"restart-worker-{idx}", daemon=True).start()
+
+    def _restart(self, idx):
+        try:
+            proc, client = self._spawn(idx)
+            with self._lock:
+                if self._closed:
+                    proc.kill()
+                    proc.wait()
+                    return
+                self._procs[idx] = proc
+            try:
+                self._wait_ready(proc, client, time.perf_counter() + self.start_timeout)
+            except (RuntimeError, TimeoutError) as exc:
+                # Następca też nie wstał - worker zostaje poza rotacją, reszta puli obsługuje żądania
+                print(f"⚠️ inference worker {idx} could not be restarted: {exc}", file=sys.stderr)
+                if proc.poll() is None:
+                    proc.kill()
+                return
+            with self._lock:
+                if not self._closed:
+                    self._clients[idx] = client
+                    self._restarts[idx] += 1
+                    self._alive[idx] = True
+        finally:
+            with self._changed:
+                self._restarting.discard(idx)
+                self._changed.notify_all()
+
+    @property
+    def workers(self):
+        return len(self._clients)
+
+    def predict(self, img_array, timeout=None):
+        deadline = time.perf_counter() + (timeout or self.start_timeout)
+        tried = set()  # procesy, które zerwały to żądanie - następca tego samego workera może je przejąć
+        while True:
+            for idx, proc in enumerate(list(self._procs)):
+                if self._alive[idx] and proc.poll() is not None:
+                    self._mark_dead(idx)
+            with self._changed:
+                while True:
+                    candidates = [i for i, up in enumerate(self._alive) if up and self._procs[i] not in tried]
+                    remaining = deadline - time.perf_counter()
+                    if candidates or not self._restarting or remaining <= 0:
+                        break
+                    # Żaden worker nie działa - czekamy na następcę, który właśnie wczytuje model
+                    self._changed.wait(remaining)
+                if not candidates:
+                    raise RuntimeError("no inference worker available")
+                idx = min(candidates, key=self._in_flight.__getitem__)
+                self._in_flight[idx] += 1
+                proc, client = self._procs[idx], self._clients[idx]
+            try:
+                return client.predict(img_array, timeout)
+            except (urllib.error.URLError, ConnectionError):
+                # Zerwane połączenie z procesem, który właśnie się kończy - żądanie idzie do innego workera.
+                # HTTPError (np. 500) od żywego workera jest zwracany bez ponawiania.
+                if not exited(proc):
+                    raise
+                self._mark_dead(idx)
+                tried.add(proc)
+            finally:
+                with self._lock:
+                    self._in_flight[idx] -= 1
+
+    def stats(self):
+        """Suma liczników żywych workerów (pola jak w /stats pojedynczego serwera) i liczniki per worker.
+
+        Liczniki procesu zaczynają się od zera po restarcie workera.
+        """
+        with self._lock:
+            alive = list(self._alive)
+            clients = list(self._clients)
+        per_worker = [client.stats() if up else None for client, up in zip(clients, alive)]
+        live = [s for s in per_worker if s]
+        stats = {key: sum(s[key] for s in live) for key in ("requests", "images", "batches", "process_cpu_seconds")}
+        stats["mean_batch_size"] = stats["images"] / stats["batches"] if stats["batches"] else 0.0
+        stats["cpu_count"] = os.cpu_count()
+        stats["workers"] = [
+            {"cpus": cpus, "intra_op_threads": threads, "inter_op_threads": self.inter_op_threads,
+             "alive": up, "restarts": restarts,
+             "requests": s["requests"] if s else 0, "mean_batch_size": s["mean_batch_size"] if s else 0.0}
+            for cpus, threads, up, restarts, s in zip(self.cpu_sets, self.intra_op_threads, alive,
+                                                       self._restarts, per_worker)
+        ]
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        for proc in self._procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in self._procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+        self._procs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()